@@ -0,0 +1,320 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from commands import CommandHandler
+from deliveries import DeliveryLog, delivering, resuming
+from digest import DigestBuffer
+from engine import (
+    BaseEngine, create_bot, expose_metrics, load_subscriptions,
+    plan_notifications
+)
+from homework import (
+    check_response, check_tokens, get_api_answer_for, send_message_to
+)
+from history import StatusHistory
+from http_session import get_session
+from leases import hold_lease
+from records import decode_api_answer
+from response_cache import ResponseCache
+from send_queue import SendQueue
+from single_flight import AsyncSingleFlight
+from settings import (
+    ASYNC_MAX_IN_FLIGHT, CHECKPOINT_FLUSH_INTERVAL, CHECKPOINTS_RESTORED,
+    COMMANDS_ENABLED, DIGEST_WINDOW, HEADERS, POLL_CYCLE_FINISHED,
+    PRACTICUM_TOKEN, STARTUP_SPREAD, SUBSCRIPTIONS_FILE, TELEGRAM_CHAT_ID
+)
+from scheduler import dominant_status, token_random
+from storage import create_checkpoint_store, restore_checkpoints
+from subscriptions import SubscriptionRegistry
+from tracing import TRACER
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Пул для блокирующих вызовов requests и telegram.Bot."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=ASYNC_MAX_IN_FLIGHT, thread_name_prefix='async-io'
+        )
+    return _executor
+
+
+async def run_blocking(func, *args):
+    """Выполняет блокирующую функцию, не останавливая event loop.
+
+    Контекст (текущая трасса) передаётся в поток пула.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(context.run, func, *args)
+    )
+
+
+async def async_get_api_answer(timestamp) -> dict:
+    """Асинхронный запрос к эндпоинту API-сервиса."""
+    return await async_get_api_answer_for(HEADERS, timestamp)
+
+
+async def async_get_api_answer_for(headers, timestamp, session=None,
+                                   cache=None, decode=None) -> dict:
+    """Асинхронный запрос к API-сервису с заголовками подписчика."""
+    return await run_blocking(
+        get_api_answer_for, headers, timestamp, session, cache, decode
+    )
+
+
+async def async_send_message(bot, message) -> bool:
+    """Асинхронно отправляет сообщение в Telegram чат."""
+    return await async_send_message_to(bot, TELEGRAM_CHAT_ID, message)
+
+
+async def async_send_message_to(bot, chat_id, message) -> bool:
+    """Асинхронно отправляет сообщение в указанный Telegram чат."""
+    return await run_blocking(send_message_to, bot, chat_id, message)
+
+
+class AsyncPollingEngine(BaseEngine):
+    """Опрос всех подписок на одном event loop.
+
+    Чекпоинты из save_checkpoint только копятся в памяти, на диск
+    их пишет flush_checkpoints в пуле потоков.
+    """
+
+    flush_on_save = False
+
+    def __init__(self, bot, registry, max_in_flight=ASYNC_MAX_IN_FLIGHT,
+                 flights=None, **kwargs):
+        super().__init__(
+            bot, registry, flights or AsyncSingleFlight(), **kwargs
+        )
+        self.max_in_flight = max_in_flight
+        self._loop = None
+        self._semaphore = None
+        self._running = None
+        self._stopping = False
+
+    async def poll(self, subscription):
+        """Один цикл опроса подписки, как PollingEngine.poll."""
+        with TRACER.trace('poll'):
+            return await self._poll(subscription)
+
+    async def _poll(self, subscription):
+        try:
+            response = await self.flights.do(
+                (subscription.token, subscription.timestamp),
+                self.fetch, subscription
+            )
+            homeworks = check_response(response)
+            changed = {}
+            if homeworks:
+                changed = await self.notify(subscription, homeworks, response)
+            # Инцидент закончен, только если весь опрос прошёл без сбоев.
+            self.errors.clear(subscription.key)
+            return dominant_status(changed)
+        except Exception as error:
+            await self.handle_error(subscription, error)
+        return None
+
+    async def notify(self, subscription, homeworks, response) -> dict:
+        """Отправляет уведомления страницами и сдвигает подписку."""
+        changed = {}
+        for page, message, page_changed, keys in plan_notifications(
+            subscription, homeworks, self.deliveries
+        ):
+            changed.update(page_changed)
+            with delivering(self.deliveries, keys):
+                sent = message is None or await self.deliver_notification(
+                    subscription.chat_id, message
+                )
+            if not sent:
+                break
+            self.commit_delivered(subscription, page, page_changed)
+        else:
+            self.commit_response(subscription, response)
+        self.save_checkpoint(subscription)
+        return changed
+
+    async def fetch(self, subscription) -> dict:
+        """Запрос к API для подписки под автоматом по сбоям."""
+        with self.breaker.guard():
+            return await async_get_api_answer_for(
+                subscription.headers, subscription.timestamp,
+                self.session, self.cache, self.decode
+            )
+
+    async def deliver_notification(self, chat_id, message) -> bool:
+        """Уведомление о статусах: в дайджест чата, если он включён."""
+        if self.digest is not None:
+            self.digest.add(chat_id, message)
+            return True
+        return await self.deliver(chat_id, message)
+
+    async def flush_digests(self, force=False) -> None:
+        """Отправляет дайджесты с закрывшимся окном, как PollingEngine."""
+        for digest in self.digest.pop_due(force=force):
+            parts = list(digest.deliveries())
+            for index, (part, pending) in enumerate(parts):
+                with resuming(pending):
+                    sent = await self.deliver(digest.chat_id, part)
+                if not sent:
+                    self.digest.requeue(digest, parts[index:])
+                    break
+            else:
+                self.digest_delivered(digest)
+
+    async def deliver(self, chat_id, message) -> bool:
+        """Отправляет сообщение сразу или через очередь отправки."""
+        if self.send_queue is not None:
+            return self.send_queue.put(chat_id, message)
+        return await async_send_message_to(self.bot, chat_id, message)
+
+    async def flush_checkpoints(self) -> None:
+        """Периодически сбрасывает накопленные чекпоинты на диск."""
+        while True:
+            await asyncio.sleep(CHECKPOINT_FLUSH_INTERVAL)
+            await run_blocking(self.store.flush_if_due)
+
+    async def spill_history(self) -> None:
+        """Периодически дописывает историю статусов на диск."""
+        while True:
+            await asyncio.sleep(self.history.spill_interval)
+            await run_blocking(self.history.spill)
+
+    async def send_digests(self) -> None:
+        """Периодически отправляет дайджесты с закрывшимся окном."""
+        while True:
+            await asyncio.sleep(min(
+                self.digest.window, CHECKPOINT_FLUSH_INTERVAL
+            ))
+            await self.flush_digests()
+
+    async def handle_error(self, subscription, error) -> None:
+        """Логирует сбой подписки и один раз за инцидент сообщает о нём."""
+        message = self.error_report(subscription, error)
+        if message is not None and await self.deliver(
+            subscription.chat_id, message
+        ):
+            self.errors.remember(error, subscription.key)
+
+    async def poll_all(self) -> None:
+        """Опрашивает все подписки, не более max_in_flight одновременно."""
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async def limited(subscription):
+            async with semaphore:
+                await self.poll(subscription)
+
+        subscriptions = list(self.registry)
+        await asyncio.gather(*(limited(item) for item in subscriptions))
+        logging.debug(
+            POLL_CYCLE_FINISHED, len(subscriptions),
+            time.monotonic() - started
+        )
+
+    async def watch(self, subscription, semaphore) -> None:
+        """Опрашивает подписку, пока она есть в реестре.
+
+        Сроки опросов хранит таймерная куча event loop.
+        """
+        await asyncio.sleep(
+            token_random(subscription).uniform(0, STARTUP_SPREAD)
+        )
+        while self.registry.holds(subscription):
+            async with semaphore:
+                status = await self.poll(subscription)
+            await asyncio.sleep(
+                self.policy.next_delay(subscription, status)
+            )
+
+    def watch_threadsafe(self, subscription) -> None:
+        """Начинает опрос новой подписки из другого потока."""
+        asyncio.run_coroutine_threadsafe(
+            self.watch(subscription, self._semaphore), self._loop
+        )
+
+    async def run_forever(self) -> None:
+        """Опрос каждой подписки по расписанию политики до stop()."""
+        self._loop = asyncio.get_running_loop()
+        self._semaphore = semaphore = asyncio.Semaphore(self.max_in_flight)
+        tasks = [
+            self.watch(subscription, semaphore)
+            for subscription in self.registry
+        ]
+        if self.store is not None:
+            tasks.append(self.flush_checkpoints())
+        if self.history is not None:
+            tasks.append(self.spill_history())
+        if self.digest is not None:
+            tasks.append(self.send_digests())
+        self._running = asyncio.gather(*tasks)
+        try:
+            await self._running
+        except asyncio.CancelledError:
+            if not self._stopping:
+                raise
+
+    def stop(self) -> None:
+        """Завершает run_forever, вызывается из event loop."""
+        self._stopping = True
+        if self._running is not None:
+            self._running.cancel()
+
+
+def load_registry(shard=None) -> SubscriptionRegistry:
+    """Реестр из SUBSCRIPTIONS_FILE либо единственная подписка из env.
+
+    Для шарда (i, N) - только подписки шарда из файла.
+    """
+    if SUBSCRIPTIONS_FILE:
+        return load_subscriptions(shard)[1]
+    check_tokens()
+    registry = SubscriptionRegistry()
+    registry.add(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)
+    return registry
+
+
+async def async_main(shard=None) -> None:
+    """Асинхронная логика работы бота."""
+    await run_blocking(hold_lease, shard)
+    registry = load_registry(shard)
+    store = create_checkpoint_store()
+    logging.info(CHECKPOINTS_RESTORED.format(
+        restore_checkpoints(registry, store)
+    ))
+    bot = create_bot()
+    send_queue = SendQueue(bot).start()
+    history = StatusHistory()
+    expose_metrics(registry, send_queue, history)
+    engine = AsyncPollingEngine(
+        bot, registry, session=get_session(), cache=ResponseCache(),
+        decode=decode_api_answer, store=store,
+        send_queue=send_queue, deliveries=DeliveryLog(), history=history,
+        digest=DigestBuffer() if DIGEST_WINDOW else None
+    )
+    commands = None
+    if COMMANDS_ENABLED and shard is None:
+        commands = CommandHandler(
+            bot, registry, send_queue=send_queue,
+            on_subscribe=engine.watch_threadsafe
+        ).start()
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, engine.stop
+    )
+    try:
+        await engine.run_forever()
+    finally:
+        if commands is not None:
+            await run_blocking(commands.stop)
+        if engine.digest is not None:
+            await engine.flush_digests(force=True)
+        await run_blocking(send_queue.stop)
+        engine.close_state()
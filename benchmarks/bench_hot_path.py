@@ -0,0 +1,298 @@
+"""Бенчмарк пути опрос -> разбор -> уведомление.
+
+Поднимает локальные заглушки API Практикума и Telegram Bot API
+и замеряет get_api_answer, check_response, parse_status,
+send_message, одну итерацию main() и цикл опроса движка на 1,
+100 и 10000 подписках: пропускную способность, p50/p99 задержки
+и пиковую память (tracemalloc).
+
+    python benchmarks/bench_hot_path.py
+    python benchmarks/bench_hot_path.py --subscriptions 1 100 \\
+        --output bench_output.txt
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+# Состояние main() и движка - во временной папке, не в текущей.
+STATE_DIR = tempfile.mkdtemp()
+for variable, filename in (
+    ('CHECKPOINT_PATH', 'checkpoints.sqlite3'),
+    ('CHECKPOINT_LOG_PATH', 'checkpoints.jsonl'),
+    ('DELIVERY_LOG_PATH', 'deliveries.sqlite3'),
+    ('HISTORY_PATH', 'history.sqlite3'),
+):
+    os.environ.setdefault(variable, os.path.join(STATE_DIR, filename))
+os.environ.setdefault('PRACTICUM_TOKEN', 'bench-token')
+os.environ.setdefault('TELEGRAM_TOKEN', '123456:bench')
+os.environ.setdefault('TELEGRAM_CHAT_ID', '1')
+
+import telegram  # noqa: E402
+
+import homework  # noqa: E402
+from engine import PollingEngine, create_bot  # noqa: E402
+from http_session import get_session  # noqa: E402
+from records import decode_api_answer  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+from send_queue import SendQueue  # noqa: E402
+from simulators.http_stub import Response, StubServer  # noqa: E402
+from simulators.telegram_api import TelegramSimulator  # noqa: E402
+from subscriptions import SubscriptionRegistry  # noqa: E402
+
+STATUSES = ('reviewing', 'approved', 'rejected')
+REQUESTS = itertools.count()
+STARTED = int(time.time())
+
+
+def changing_status(request) -> Response:
+    """Одна домашка, статус и date_updated меняются на каждый запрос.
+
+    Так каждый опрос заканчивается уведомлением: смена статуса
+    новая и для журнала доставок, и для водяных знаков.
+    """
+    number = next(REQUESTS)
+    return Response.json({
+        'homeworks': [{
+            'id': 1,
+            'homework_name': 'bench/homework.zip',
+            'status': STATUSES[number % len(STATUSES)],
+            'date_updated': time.strftime(
+                '%Y-%m-%dT%H:%M:%SZ', time.gmtime(STARTED + number)
+            ),
+        }],
+        'current_date': int(time.time()),
+    })
+
+
+class Result:
+    """Итог одного замера."""
+
+    def __init__(self, name, count, elapsed, latencies, peak_memory=None):
+        self.name = name
+        self.count = count
+        self.elapsed = elapsed
+        self.latencies = sorted(latencies)
+        self.peak_memory = peak_memory
+
+    def percentile(self, share) -> float:
+        if not self.latencies:
+            return 0.0
+        index = min(len(self.latencies) - 1, int(len(self.latencies) * share))
+        return self.latencies[index]
+
+    def as_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'count': self.count,
+            'throughput': self.count / self.elapsed if self.elapsed else 0,
+            'p50_ms': self.percentile(0.5) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'mean_ms': (
+                statistics.fmean(self.latencies) * 1000
+                if self.latencies else 0
+            ),
+            'peak_memory_kb': (
+                self.peak_memory / 1024 if self.peak_memory else None
+            ),
+        }
+
+    def __str__(self) -> str:
+        data = self.as_dict()
+        memory = (
+            f'{data["peak_memory_kb"]:>10.0f}'
+            if data['peak_memory_kb'] is not None else f'{"-":>10}'
+        )
+        return (
+            f'{self.name:<34}{self.count:>8}'
+            f'{data["throughput"]:>12.0f}{data["p50_ms"]:>10.3f}'
+            f'{data["p99_ms"]:>10.3f}{memory}'
+        )
+
+
+HEADER = (
+    f'{"benchmark":<34}{"count":>8}{"ops/s":>12}'
+    f'{"p50 ms":>10}{"p99 ms":>10}{"peak KB":>10}'
+)
+
+
+def measure(name, func, iterations, memory=True) -> Result:
+    """Вызывает func iterations раз, второй проход - под tracemalloc."""
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    peak = None
+    if memory:
+        tracemalloc.start()
+        for _ in range(min(iterations, 1000)):
+            func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return Result(name, iterations, elapsed, latencies, peak)
+
+
+class BreakLoop(Exception):
+    pass
+
+
+def main_iteration() -> None:
+    """Одна итерация main(): time.sleep прерывает бесконечный цикл."""
+    def interrupt(seconds):
+        raise BreakLoop
+
+    original_sleep = homework.time.sleep
+    homework.time.sleep = interrupt
+    try:
+        homework.main()
+    except BreakLoop:
+        pass
+    finally:
+        homework.time.sleep = original_sleep
+
+
+def measure_engine(subscriptions, telegram_url, memory=True) -> Result:
+    """Цикл опроса движка по всем подпискам."""
+    def build():
+        registry = SubscriptionRegistry()
+        for number in range(subscriptions):
+            registry.add(f'token-{number}', number, timestamp=0)
+        bot = create_bot()
+        bot.base_url = telegram_url + '/bot' + bot.token
+        send_queue = SendQueue(
+            bot, global_rate=10 ** 9, global_burst=10 ** 9,
+            chat_rate=10 ** 9, chat_burst=10 ** 9
+        ).start()
+        polling = PollingEngine(
+            bot, registry, session=get_session(),
+            cache=ResponseCache(), decode=decode_api_answer,
+            send_queue=send_queue
+        )
+        return polling, send_queue
+
+    def run(polling, send_queue, latencies):
+        poll = polling.poll
+
+        def timed_poll(subscription):
+            started = time.perf_counter()
+            poll(subscription)
+            latencies.append(time.perf_counter() - started)
+
+        polling.poll = timed_poll
+        started = time.perf_counter()
+        polling.poll_all()
+        send_queue.join()
+        elapsed = time.perf_counter() - started
+        polling.shutdown()
+        return elapsed
+
+    latencies = []
+    elapsed = run(*build(), latencies)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        run(*build(), [])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return Result(
+        f'engine poll cycle x{subscriptions}', subscriptions, elapsed,
+        latencies, peak
+    )
+
+
+def run_benchmarks(args) -> list:
+    practicum = StubServer(changing_status).start()
+    telegram_api = (
+        TelegramSimulator() if args.telegram_limits
+        else TelegramSimulator(chat_rate=0, group_rate=0, global_rate=0)
+    )
+    telegram_stub = StubServer(telegram_api).start()
+    homework.ENDPOINT = practicum.url + '/api/user_api/homework_statuses/'
+    telegram_url = telegram_stub.url
+    bot = telegram.Bot(
+        token=homework.TELEGRAM_TOKEN, base_url=telegram_url + '/bot'
+    )
+    homework_data = {
+        'homework_name': 'bench/homework.zip', 'status': 'approved'
+    }
+    response = {'homeworks': [homework_data], 'current_date': 0}
+    memory = not args.no_memory
+    results = [
+        measure(
+            'get_api_answer', lambda: homework.get_api_answer(0),
+            args.iterations, memory
+        ),
+        measure(
+            'get_api_answer (keep-alive)',
+            lambda: homework.get_api_answer_for(
+                homework.HEADERS, 0, get_session()
+            ),
+            args.iterations, memory
+        ),
+        measure(
+            'check_response', lambda: homework.check_response(response),
+            args.iterations * 100, memory
+        ),
+        measure(
+            'parse_status', lambda: homework.parse_status(homework_data),
+            args.iterations * 100, memory
+        ),
+        measure(
+            'send_message', lambda: homework.send_message(bot, 'bench'),
+            args.iterations, memory
+        ),
+    ]
+    original_bot = telegram.Bot
+    telegram.Bot = lambda token: original_bot(
+        token=token, base_url=telegram_url + '/bot'
+    )
+    try:
+        results.append(measure(
+            'main() iteration', main_iteration, args.iterations, memory
+        ))
+    finally:
+        telegram.Bot = original_bot
+    for subscriptions in args.subscriptions:
+        results.append(measure_engine(subscriptions, telegram_url, memory))
+    practicum.stop()
+    telegram_stub.stop()
+    return results, telegram_api.report()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--subscriptions', type=int, nargs='+', default=[1, 100, 10_000]
+    )
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument(
+        '--no-memory', action='store_true', help='без прохода tracemalloc'
+    )
+    parser.add_argument(
+        '--telegram-limits', action='store_true',
+        help='заглушка Telegram с лимитами настоящего Bot API'
+    )
+    parser.add_argument('--output', help='файл для JSON с результатами')
+    args = parser.parse_args()
+    results, telegram_report = run_benchmarks(args)
+    print(HEADER)
+    for result in results:
+        print(result)
+    print('telegram stand-in:', json.dumps(telegram_report))
+    if args.output:
+        with open(args.output, 'w', encoding='UTF-8') as file:
+            json.dump([result.as_dict() for result in results], file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram.error import TelegramError
+
+from homework import send_message_to
+from messages import render_verdict
+from settings import (
+    COMMAND_ALREADY_SUBSCRIBED, COMMAND_FAILED, COMMAND_HELP,
+    COMMAND_LANGUAGE_SET, COMMAND_LANGUAGE_USAGE,
+    COMMAND_NO_STATUSES, COMMAND_NO_SUBSCRIPTIONS, COMMAND_POLL_TIMEOUT,
+    COMMAND_RETRY_PERIOD, COMMAND_STATUS_LINE, COMMAND_SUBSCRIBE_USAGE,
+    COMMAND_SUBSCRIBED, COMMAND_UNKNOWN, COMMAND_UNSUBSCRIBED,
+    COMMAND_WORKERS, MESSAGE_LOCALES, SUBSCRIPTIONS_FILE,
+    UPDATES_FAILED
+)
+
+
+def parse_command(text):
+    """Имя команды и аргументы из текста сообщения или None.
+
+    '/status@homework_bot' -> ('status', []).
+    """
+    if not text or not text.startswith('/'):
+        return None
+    name, *args = text.split()
+    return name[1:].split('@')[0].lower(), args
+
+
+class CommandHandler:
+    """Команды чатов через long polling getUpdates.
+
+    Обновления читает один поток, обрабатывает пул workers
+    потоков. Ответы строятся из состояния реестра подписок,
+    к API Практикума команды не обращаются.
+    """
+
+    def __init__(self, bot, registry, workers=COMMAND_WORKERS,
+                 send_queue=None, on_subscribe=None,
+                 subscriptions_file=SUBSCRIPTIONS_FILE,
+                 timeout=COMMAND_POLL_TIMEOUT):
+        self.bot = bot
+        self.registry = registry
+        self.send_queue = send_queue
+        self.on_subscribe = on_subscribe
+        self.subscriptions_file = subscriptions_file
+        self.timeout = timeout
+        self.offset = None
+        self.commands = {
+            'start': self.help,
+            'help': self.help,
+            'status': self.status,
+            'subscribe': self.subscribe,
+            'unsubscribe': self.unsubscribe,
+            'language': self.language,
+        }
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='command'
+        )
+        self._save_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'CommandHandler':
+        """Запускает чтение обновлений в фоновом потоке."""
+        self._thread = threading.Thread(
+            target=self._run, name='updates', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Останавливает чтение и дожидается обработки команд.
+
+        Текущий getUpdates длится не дольше timeout секунд: после
+        него поток больше не отдаёт команд в пул, и ответы
+        успевают встать в очередь отправки до её остановки.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(self.timeout)
+        self._executor.shutdown(wait=True)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.poll_updates()
+            except TelegramError as error:
+                logging.error(UPDATES_FAILED, error)
+                self._stopped.wait(COMMAND_RETRY_PERIOD)
+
+    def poll_updates(self) -> int:
+        """Один запрос getUpdates, обновления уходят в пул."""
+        updates = self.bot.get_updates(
+            offset=self.offset, timeout=self.timeout,
+            allowed_updates=['message']
+        )
+        for update in updates:
+            self.offset = update.update_id + 1
+            self._executor.submit(self.dispatch, update)
+        return len(updates)
+
+    def dispatch(self, update) -> None:
+        """Выполняет команду из обновления и отвечает в чат."""
+        message = update.effective_message
+        command = parse_command(message and message.text)
+        if command is None:
+            return
+        name, args = command
+        chat_id = message.chat_id
+        try:
+            reply = self.commands.get(name, self.unknown)(chat_id, args)
+        except Exception as error:
+            logging.error(COMMAND_FAILED, name, chat_id, error)
+            return
+        self.reply(chat_id, reply)
+
+    def reply(self, chat_id, text) -> bool:
+        """Отправляет ответ через очередь отправки, если она есть."""
+        if self.send_queue is not None:
+            return self.send_queue.put(chat_id, text)
+        return send_message_to(self.bot, chat_id, text)
+
+    def help(self, chat_id, args) -> str:
+        return COMMAND_HELP
+
+    def unknown(self, chat_id, args) -> str:
+        return COMMAND_UNKNOWN
+
+    def status(self, chat_id, args) -> str:
+        """Последние статусы домашек, известные подпискам чата."""
+        subscriptions = self.registry.for_chat(chat_id)
+        if not subscriptions:
+            return COMMAND_NO_SUBSCRIPTIONS
+        lines = [
+            COMMAND_STATUS_LINE.format(
+                subscription.names.get(key, key),
+                render_verdict(subscription.locale, status)
+            )
+            for subscription in subscriptions
+            for key, status in list(subscription.statuses.items())
+        ]
+        return '\n'.join(lines) or COMMAND_NO_STATUSES
+
+    def subscribe(self, chat_id, args) -> str:
+        """Подписывает чат на домашки по токену Практикума."""
+        if len(args) != 1:
+            return COMMAND_SUBSCRIBE_USAGE
+        subscription = self.registry.add_new(args[0], chat_id)
+        if subscription is None:
+            return COMMAND_ALREADY_SUBSCRIBED
+        if self.on_subscribe is not None:
+            self.on_subscribe(subscription)
+        self.save_registry()
+        return COMMAND_SUBSCRIBED
+
+    def unsubscribe(self, chat_id, args) -> str:
+        """Отписывает чат от одного токена или от всех."""
+        tokens = args or [
+            subscription.token
+            for subscription in self.registry.for_chat(chat_id)
+        ]
+        removed = sum(
+            self.registry.remove(token, chat_id) for token in tokens
+        )
+        if not removed:
+            return COMMAND_NO_SUBSCRIPTIONS
+        self.save_registry()
+        return COMMAND_UNSUBSCRIBED.format(removed)
+
+    def language(self, chat_id, args) -> str:
+        """Меняет язык уведомлений о статусах для подписок чата."""
+        locale = args[0].lower() if len(args) == 1 else None
+        if locale not in MESSAGE_LOCALES:
+            return COMMAND_LANGUAGE_USAGE.format(', '.join(MESSAGE_LOCALES))
+        subscriptions = self.registry.for_chat(chat_id)
+        if not subscriptions:
+            return COMMAND_NO_SUBSCRIPTIONS
+        for subscription in subscriptions:
+            subscription.locale = locale
+        self.save_registry()
+        return COMMAND_LANGUAGE_SET.format(locale)
+
+    def save_registry(self) -> None:
+        """Сохраняет реестр, чтобы подписки пережили перезапуск."""
+        if self.subscriptions_file:
+            with self._save_lock:
+                self.registry.save(self.subscriptions_file)
@@ -0,0 +1,180 @@
+import contextvars
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import DUPLICATES_SUPPRESSED
+from records import homework_key
+from settings import (
+    DELIVERY_LOG_CAPACITY, DELIVERY_LOG_ERROR_RATE, DELIVERY_LOG_PATH,
+    DELIVERY_LOG_RETENTION
+)
+
+# Журнал и ключи уведомления, которое сейчас отправляется.
+_pending = contextvars.ContextVar('pending_delivery', default=None)
+
+
+def delivery_key(chat_id, homework) -> bytes:
+    """Ключ доставки: чат, домашка, статус и время его смены.
+
+    date_updated различает повторный переход в тот же статус.
+    """
+    raw = '\x00'.join(str(part) for part in (
+        chat_id, homework_key(homework), homework.get('status'),
+        homework.get('date_updated')
+    ))
+    return hashlib.blake2b(raw.encode(), digest_size=16).digest()
+
+
+class BloomFilter:
+    """Фильтр Блума фиксированного размера.
+
+    Размер считается по ожидаемому числу ключей и доле ложных
+    срабатываний и не растёт: при переполнении растёт только
+    доля ложных срабатываний. Ключи уже хэши, поэтому позиции
+    берутся из их половин двойным хэшированием.
+    """
+
+    def __init__(self, capacity=DELIVERY_LOG_CAPACITY,
+                 error_rate=DELIVERY_LOG_ERROR_RATE):
+        self.size = max(8, int(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        ))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        first = int.from_bytes(key[:8], 'big')
+        second = int.from_bytes(key[8:16], 'big') | 1
+        for index in range(self.hashes):
+            yield (first + index * second) % self.size
+
+    def add(self, key) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class DeliveryLog:
+    """Журнал доставленных уведомлений.
+
+    Ключи хранятся в SQLite, перед ней стоит фильтр Блума: для
+    новых уведомлений проверка обходится без чтения с диска,
+    на диск идут только совпадения фильтра. Записи старше
+    retention секунд удаляются при открытии. Для чатов из adopt()
+    фильтр не спрашивается: их ключи писал другой процесс.
+    """
+
+    def __init__(self, path=DELIVERY_LOG_PATH,
+                 capacity=DELIVERY_LOG_CAPACITY,
+                 error_rate=DELIVERY_LOG_ERROR_RATE,
+                 retention=DELIVERY_LOG_RETENTION):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS deliveries ('
+            'key BLOB PRIMARY KEY, delivered REAL) WITHOUT ROWID'
+        )
+        with self._connection:
+            self._connection.execute(
+                'DELETE FROM deliveries WHERE delivered < ?',
+                (time.time() - retention,)
+            )
+        self.bloom = BloomFilter(capacity, error_rate)
+        self._adopted = set()
+        for (key,) in self._connection.execute(
+            'SELECT key FROM deliveries'
+        ):
+            self.bloom.add(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self.bloom and self._on_disk(key)
+
+    def _on_disk(self, key) -> bool:
+        with self._lock:
+            return self._connection.execute(
+                'SELECT 1 FROM deliveries WHERE key = ?', (key,)
+            ).fetchone() is not None
+
+    def adopt(self, chat_id) -> None:
+        """Чат перешёл от другого процесса: проверять его по диску."""
+        self._adopted.add(chat_id)
+
+    def seen(self, chat_id):
+        """Проверка для parse_statuses: доставлена ли домашка в чат."""
+        check = (
+            self._on_disk if chat_id in self._adopted else self.__contains__
+        )
+
+        def delivered(homework) -> bool:
+            if not check(delivery_key(chat_id, homework)):
+                return False
+            DUPLICATES_SUPPRESSED.inc()
+            return True
+        return delivered
+
+    def record(self, keys) -> None:
+        """Записывает ключи доставленных уведомлений."""
+        if not keys:
+            return
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO deliveries VALUES (?, ?)',
+                [(key, now) for key in keys]
+            )
+        for key in keys:
+            self.bloom.add(key)
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def delivery_keys(chat_id, homeworks, changed) -> list:
+    """Ключи доставки домашек, чей статус вошёл в changed."""
+    return [
+        delivery_key(chat_id, homework) for homework in homeworks
+        if homework_key(homework) in changed
+    ]
+
+
+@contextmanager
+def delivering(log, keys):
+    """Отправки внутри блока записывают keys в журнал log.
+
+    Ключи записываются после отправки и после тайм-аута Telegram:
+    сообщение могло дойти, а повтор отправил бы дубль.
+    """
+    with resuming(None if log is None else (log, keys)):
+        yield
+
+
+@contextmanager
+def resuming(pending):
+    """Продолжает отправку, отложенную с pending_delivery()."""
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+
+
+def pending_delivery():
+    """(журнал, ключи) текущей отправки или None."""
+    return _pending.get()
+
+
+def confirm_delivery(pending) -> None:
+    """Записывает ключи отправки, полученной из pending_delivery."""
+    if pending is not None:
+        log, keys = pending
+        log.record(keys)
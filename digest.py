@@ -0,0 +1,153 @@
+import threading
+import time
+
+from deliveries import pending_delivery
+from settings import DIGEST_WINDOW, MESSAGES_SEPARATOR, TELEGRAM_MESSAGE_LIMIT
+
+
+def split_message(text, limit=TELEGRAM_MESSAGE_LIMIT) -> list:
+    """Делит текст на части не длиннее limit.
+
+    Режет по границам уведомлений, затем по строкам, и только
+    слишком длинную строку - посередине.
+    """
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind(MESSAGES_SEPARATOR, 0, limit + 1)
+        skip = len(MESSAGES_SEPARATOR)
+        if cut <= 0:
+            cut, skip = text.rfind('\n', 0, limit + 1), 1
+        if cut <= 0:
+            cut, skip = limit, 0
+        parts.append(text[:cut])
+        text = text[cut + skip:]
+    if text:
+        parts.append(text)
+    return parts
+
+
+class Digest:
+    """Накопленные уведомления одного чата.
+
+    checkpoints - чекпоинты подписок чата, которые можно
+    сохранить только после отправки дайджеста.
+    """
+
+    __slots__ = ('chat_id', 'opened', 'messages', 'log', 'keys',
+                 'checkpoints')
+
+    def __init__(self, chat_id, opened):
+        self.chat_id = chat_id
+        self.opened = opened
+        self.messages = []
+        self.log = None
+        self.keys = []
+        self.checkpoints = {}
+
+    def add(self, message, pending) -> None:
+        self.messages.append(message)
+        if pending is not None:
+            self.log, keys = pending
+            self.keys.extend(keys or ())
+
+    def merge(self, other) -> None:
+        """Дописывает уведомления и ключи более позднего дайджеста."""
+        self.messages.extend(other.messages)
+        if other.log is not None:
+            self.log = other.log
+        self.keys.extend(other.keys)
+        self.checkpoints.update(other.checkpoints)
+
+    def deliveries(self):
+        """(часть, ключи для delivering) в порядке отправки.
+
+        Ключи доставки едут с последней частью: дайджест
+        считается доставленным, когда дошёл целиком.
+        """
+        parts = split_message(MESSAGES_SEPARATOR.join(self.messages))
+        for index, part in enumerate(parts):
+            last = index == len(parts) - 1
+            yield part, (self.log, self.keys) if last and self.log else None
+
+
+class DigestBuffer:
+    """Копит уведомления чатов и отдаёт их одним сообщением.
+
+    Окно чата открывается первым уведомлением и закрывается
+    через window секунд: всё, что пришло за окно, уходит одним
+    сообщением, разбитым по лимиту длины Telegram. Пока дайджест
+    не отправлен, он держит чекпоинты подписок чата: иначе
+    уведомления потерялись бы при перезапуске.
+    """
+
+    def __init__(self, window=DIGEST_WINDOW):
+        self.window = window
+        self._digests = {}
+        self._sending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def add(self, chat_id, message, now=None) -> None:
+        """Добавляет уведомление в дайджест чата.
+
+        Ключи текущей отправки из delivering запоминаются вместе
+        с уведомлением.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            digest = self._digests.get(chat_id)
+            if digest is None:
+                digest = self._digests[chat_id] = Digest(chat_id, now)
+            digest.add(message, pending_delivery())
+
+    def pop_due(self, now=None, force=False) -> list:
+        """Дайджесты с закрывшимся окном, force - все."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            due = [
+                chat_id for chat_id, digest in self._digests.items()
+                if force or now - digest.opened >= self.window
+            ]
+            for chat_id in due:
+                self._sending[chat_id] = self._digests.pop(chat_id)
+            return [self._sending[chat_id] for chat_id in due]
+
+    def hold(self, chat_id, key, checkpoint) -> bool:
+        """Отдаёт чекпоинт дайджесту чата, False если дайджеста нет.
+
+        Чекпоинт сохранится после отправки дайджеста, который
+        копится или отправляется сейчас.
+        """
+        with self._lock:
+            digest = self._digests.get(chat_id) or self._sending.get(chat_id)
+            if digest is None:
+                return False
+            digest.checkpoints[key] = checkpoint
+            return True
+
+    def delivered(self, digest) -> dict:
+        """Дайджест отправлен: чекпоинты, которые теперь можно сохранить."""
+        with self._lock:
+            self._sending.pop(digest.chat_id, None)
+        return digest.checkpoints
+
+    def requeue(self, digest, deliveries, now=None) -> None:
+        """Возвращает неотправленные части в начало дайджеста чата.
+
+        deliveries - хвост digest.deliveries() с первой неудачной
+        части. Уведомления, пришедшие за время отправки, идут
+        после них, окно открывается заново.
+        """
+        now = time.monotonic() if now is None else now
+        retry = Digest(digest.chat_id, now)
+        retry.messages = [part for part, _ in deliveries]
+        retry.log, retry.keys = digest.log, list(digest.keys)
+        retry.checkpoints = dict(digest.checkpoints)
+        with self._lock:
+            self._sending.pop(digest.chat_id, None)
+            newer = self._digests.get(digest.chat_id)
+            if newer is not None:
+                retry.merge(newer)
+            self._digests[digest.chat_id] = retry
@@ -0,0 +1,437 @@
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import telegram
+from telegram.utils.request import Request
+
+from commands import CommandHandler
+from deliveries import (
+    DeliveryLog, delivering, delivery_keys, resuming
+)
+from digest import DigestBuffer
+from exceptions import CircuitOpenError, InvalidTokens
+from homework import (
+    check_response, get_api_answer_for, join_messages, parse_statuses,
+    send_message_to
+)
+from history import StatusHistory
+from http_session import get_session
+from leases import hold_lease
+from metrics import (
+    HISTORY_HOMEWORKS, POLL_ERRORS, SEND_QUEUE_DEPTH, SUBSCRIPTIONS,
+    start_metrics_server
+)
+from records import decode_api_answer
+from resilience import CircuitBreaker, ErrorDeduplicator
+from response_cache import ResponseCache
+from send_queue import SendQueue
+from sharding import Rebalancer, ShardAssignment
+from single_flight import SingleFlight
+from settings import (
+    ABSENCE_ENVIRONMENT_VARIABLES, CHECKPOINT_FLUSH_INTERVAL,
+    CHECKPOINTS_RESTORED, COMMANDS_ENABLED, DIGEST_WINDOW,
+    ENGINE_MAX_WORKERS, SEND_WORKERS,
+    ERROR_ENVIRONMENT_VARIABLES, LAST_FRONTIER_ERROR_MESSAGE, METRICS_PORT,
+    POLL_CYCLE_FINISHED, SCHEDULER_POLICY, STARTUP_SPREAD,
+    SUBSCRIPTION_ERROR, SUBSCRIPTIONS_FILE, SUBSCRIPTIONS_LOADED,
+    TELEGRAM_API_URL, TELEGRAM_TOKEN
+)
+from scheduler import (
+    POLICIES, PollScheduler, dominant_status, token_random
+)
+from storage import (
+    Checkpoint, create_checkpoint_store, restore_checkpoints
+)
+from subscriptions import SubscriptionRegistry
+from tracing import TRACER
+from watermarks import catch_up_pages, commit_page, commit_window
+
+
+def plan_notifications(subscription, homeworks, deliveries=None):
+    """Уведомления по страницам необработанных домашек ответа.
+
+    Генерирует (страница, сообщение, новые статусы, ключи
+    доставки). Сообщение None, если статусы страницы уже
+    известны подписке или доставлены по журналу deliveries;
+    ключи None без журнала.
+    """
+    seen = None
+    if deliveries is not None:
+        seen = deliveries.seen(subscription.chat_id)
+    for page in catch_up_pages(homeworks, subscription.watermarks):
+        messages, changed = parse_statuses(
+            page, subscription.statuses, subscription.locale, seen
+        )
+        keys = None
+        if deliveries is not None:
+            keys = delivery_keys(subscription.chat_id, page, changed)
+        message = join_messages(messages) if messages else None
+        yield page, message, changed, keys
+
+
+class BaseEngine:
+    """Общее состояние и шаги опроса синхронного и асинхронного движков.
+
+    Движки отличаются только тем, как ждут запросы и отправки:
+    разбор ответа, сдвиг подписки, чекпоинты, дайджесты и учёт
+    сбоев - здесь. flush_on_save - сбрасывать ли чекпоинты на
+    диск прямо из save_checkpoint.
+    """
+
+    flush_on_save = True
+
+    def __init__(self, bot, registry, flights, session=None, policy=None,
+                 store=None, send_queue=None, cache=None, decode=None,
+                 breaker=None, deliveries=None, history=None, digest=None):
+        self.bot = bot
+        self.registry = registry
+        self.session = session
+        self.cache = cache
+        self.decode = decode
+        self.store = store
+        self.deliveries = deliveries
+        self.history = history
+        self.digest = digest
+        self.send_queue = send_queue
+        self.policy = policy or POLICIES[SCHEDULER_POLICY]()
+        self.breaker = breaker or CircuitBreaker()
+        self.errors = ErrorDeduplicator()
+        self.flights = flights
+
+    def commit_delivered(self, subscription, page, changed) -> None:
+        """Сдвигает подписку за доставленную страницу уведомлений."""
+        commit_page(subscription, page, changed)
+        if self.history is not None:
+            self.history.record(page, changed)
+
+    def commit_response(self, subscription, response) -> None:
+        """Сдвигает подписку за ответ, все страницы которого доставлены."""
+        commit_window(subscription, response.get(
+            'current_date', subscription.timestamp
+        ))
+
+    def save_checkpoint(self, subscription) -> None:
+        """Передаёт состояние подписки в хранилище чекпоинтов.
+
+        Пока уведомления чата ждут в дайджесте, копию состояния
+        держит дайджест: в хранилище она попадёт после отправки.
+        """
+        if self.store is None:
+            return
+        if self.digest is not None and self.digest.hold(
+            subscription.chat_id, subscription.checkpoint_key,
+            Checkpoint.snapshot(subscription)
+        ):
+            return
+        self.write_checkpoint(subscription.checkpoint_key, subscription)
+
+    def write_checkpoint(self, key, state) -> None:
+        self.store.stage(
+            key, state.timestamp, state.statuses, state.watermarks,
+            state.names
+        )
+        if self.flush_on_save:
+            self.store.flush_if_due()
+
+    def digest_delivered(self, digest) -> None:
+        """Сохраняет чекпоинты, которые держал отправленный дайджест."""
+        checkpoints = self.digest.delivered(digest)
+        if self.store is not None:
+            for key, checkpoint in checkpoints.items():
+                self.write_checkpoint(key, checkpoint)
+
+    def error_report(self, subscription, error):
+        """Логирует сбой подписки, возвращает сообщение для чата.
+
+        None, если об инциденте уже сообщили. Пока автомат по
+        сбоям разомкнут, запрос не отправлялся, и в чат ничего
+        не пишется.
+        """
+        if isinstance(error, CircuitOpenError):
+            logging.debug(error)
+            return None
+        POLL_ERRORS.inc()
+        logging.error(SUBSCRIPTION_ERROR, subscription.chat_id, error)
+        if not self.errors.is_new(error, subscription.key):
+            return None
+        return LAST_FRONTIER_ERROR_MESSAGE.format(error)
+
+    def close_state(self) -> None:
+        """Сохраняет чекпоинты, журнал доставок и историю."""
+        for resource in (self.store, self.deliveries, self.history):
+            if resource is not None:
+                resource.close()
+
+
+class PollingEngine(BaseEngine):
+    """Опрашивает API Практикума для всех подписок одного процесса."""
+
+    def __init__(self, bot, registry, max_workers=ENGINE_MAX_WORKERS,
+                 flights=None, **kwargs):
+        super().__init__(bot, registry, flights or SingleFlight(), **kwargs)
+        self.scheduler = PollScheduler()
+        self._stopped = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='poller'
+        )
+
+    def poll(self, subscription):
+        """Один цикл опроса подписки: запрос, проверка, уведомление.
+
+        Возвращает новый статус домашки или None, если его нет.
+        """
+        with TRACER.trace('poll'):
+            return self._poll(subscription)
+
+    def _poll(self, subscription):
+        try:
+            response = self.flights.do(
+                (subscription.token, subscription.timestamp),
+                self.fetch, subscription
+            )
+            homeworks = check_response(response)
+            changed = {}
+            if homeworks:
+                changed = self.notify(subscription, homeworks, response)
+            # Инцидент закончен, только если весь опрос прошёл без сбоев.
+            self.errors.clear(subscription.key)
+            return dominant_status(changed)
+        except Exception as error:
+            self.handle_error(subscription, error)
+        return None
+
+    def notify(self, subscription, homeworks, response) -> dict:
+        """Отправляет уведомления страницами и сдвигает подписку.
+
+        После каждой доставленной страницы сдвигаются водяные знаки
+        и timestamp, после всех - timestamp становится current_date.
+        Возвращает новые статусы всех разобранных страниц.
+        """
+        changed = {}
+        for page, message, page_changed, keys in plan_notifications(
+            subscription, homeworks, self.deliveries
+        ):
+            changed.update(page_changed)
+            with delivering(self.deliveries, keys):
+                sent = message is None or self.deliver_notification(
+                    subscription.chat_id, message
+                )
+            if not sent:
+                break
+            self.commit_delivered(subscription, page, page_changed)
+        else:
+            self.commit_response(subscription, response)
+        self.save_checkpoint(subscription)
+        return changed
+
+    def fetch(self, subscription) -> dict:
+        """Запрос к API для подписки под автоматом по сбоям.
+
+        Подписки с тем же токеном и timestamp, опрашиваемые
+        одновременно, получают ответ одного запроса через flights.
+        """
+        with self.breaker.guard():
+            return get_api_answer_for(
+                subscription.headers, subscription.timestamp,
+                self.session, self.cache, self.decode
+            )
+
+    def deliver_notification(self, chat_id, message) -> bool:
+        """Уведомление о статусах: в дайджест чата, если он включён."""
+        if self.digest is not None:
+            self.digest.add(chat_id, message)
+            return True
+        return self.deliver(chat_id, message)
+
+    def flush_digests(self, force=False) -> None:
+        """Отправляет дайджесты с закрывшимся окном, force - все.
+
+        Отправка чата останавливается на первой неудачной части:
+        она и следующие возвращаются в дайджест, чтобы чат получил
+        их по порядку.
+        """
+        for digest in self.digest.pop_due(force=force):
+            parts = list(digest.deliveries())
+            for index, (part, pending) in enumerate(parts):
+                with resuming(pending):
+                    sent = self.deliver(digest.chat_id, part)
+                if not sent:
+                    self.digest.requeue(digest, parts[index:])
+                    break
+            else:
+                self.digest_delivered(digest)
+
+    def deliver(self, chat_id, message) -> bool:
+        """Отправляет сообщение сразу или через очередь отправки."""
+        if self.send_queue is not None:
+            return self.send_queue.put(chat_id, message)
+        return send_message_to(self.bot, chat_id, message)
+
+    def poll_and_reschedule(self, subscription) -> None:
+        """Опрашивает подписку и планирует её следующий опрос.
+
+        Подписка, которой уже нет в реестре, не опрашивается.
+        """
+        if not self.registry.holds(subscription):
+            return
+        status = self.poll(subscription)
+        if self.registry.holds(subscription):
+            self.schedule(subscription, self.policy.next_delay(
+                subscription, status
+            ))
+
+    def schedule(self, subscription, delay=0) -> None:
+        """Ставит подписку в очередь опросов."""
+        self.scheduler.schedule(subscription, delay)
+
+    def handle_error(self, subscription, error) -> None:
+        """Логирует сбой подписки и один раз за инцидент сообщает о нём."""
+        message = self.error_report(subscription, error)
+        if message is not None and self.deliver(subscription.chat_id, message):
+            self.errors.remember(error, subscription.key)
+
+    def poll_all(self) -> None:
+        """Опрашивает все подписки реестра конкурентно."""
+        started = time.monotonic()
+        count = 0
+        for _ in self._executor.map(self.poll, self.registry):
+            count += 1
+        logging.debug(
+            POLL_CYCLE_FINISHED, count, time.monotonic() - started
+        )
+
+    def run_forever(self) -> None:
+        """Цикл до stop(): опрашивает подписки по мере наступления срока.
+
+        Первые опросы размазываются по STARTUP_SPREAD секундам,
+        чтобы не отправлять все запросы одновременно. Между опросами
+        не реже CHECKPOINT_FLUSH_INTERVAL сбрасываются чекпоинты,
+        дайджесты отправляются по закрытии окна.
+        """
+        for subscription in self.registry:
+            self.schedule(
+                subscription, token_random(subscription).uniform(
+                    0, STARTUP_SPREAD
+                )
+            )
+        tick = CHECKPOINT_FLUSH_INTERVAL
+        if self.digest is not None:
+            tick = min(tick, self.digest.window)
+        while not self._stopped.is_set():
+            for subscription in self.scheduler.pop_due():
+                self._executor.submit(self.poll_and_reschedule, subscription)
+            self.scheduler.wait(tick)
+            if self.store is not None:
+                self.store.flush_if_due()
+            if self.history is not None:
+                self.history.spill_if_due()
+            if self.digest is not None:
+                self.flush_digests()
+
+    def stop(self) -> None:
+        """Завершает run_forever после текущего шага цикла."""
+        self._stopped.set()
+        self.scheduler.wake()
+
+    def shutdown(self) -> None:
+        """Останавливает пулы потоков и сохраняет чекпоинты."""
+        self._executor.shutdown(wait=True)
+        if self.digest is not None:
+            self.flush_digests(force=True)
+        if self.send_queue is not None:
+            self.send_queue.stop()
+        self.close_state()
+
+
+def expose_metrics(registry, send_queue, history=None) -> None:
+    """Привязывает gauges и поднимает /metrics, если задан METRICS_PORT."""
+    SUBSCRIPTIONS.set_function(lambda: len(registry))
+    SEND_QUEUE_DEPTH.set_function(lambda: len(send_queue))
+    if history is not None:
+        HISTORY_HOMEWORKS.set_function(lambda: len(history))
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+
+
+def stop_on_sigterm(engine) -> None:
+    """SIGTERM, например перезапуск дайно, завершает опрос штатно.
+
+    Тогда shutdown() отправит открытые дайджесты и сохранит
+    чекпоинты. Вызывается из основного потока.
+    """
+    signal.signal(signal.SIGTERM, lambda signum, frame: engine.stop())
+
+
+def create_bot(token=TELEGRAM_TOKEN) -> telegram.Bot:
+    """Бот с пулом соединений на всех отправителей очереди.
+
+    По умолчанию telegram.Bot держит одно соединение, и
+    отправители открывают новое на каждое сообщение. Ещё одно
+    соединение занимает long polling getUpdates.
+    """
+    return telegram.Bot(
+        token=token, base_url=TELEGRAM_API_URL,
+        request=Request(con_pool_size=SEND_WORKERS + 2)
+    )
+
+
+def load_subscriptions(shard=None) -> tuple:
+    """Все подписки из SUBSCRIPTIONS_FILE и реестр для опроса.
+
+    Для шарда (i, N) в реестр попадают только его подписки.
+    """
+    subscriptions = SubscriptionRegistry.from_file(SUBSCRIPTIONS_FILE)
+    logging.info(SUBSCRIPTIONS_LOADED.format(len(subscriptions)))
+    if shard is None:
+        return subscriptions, subscriptions, None
+    assignment = ShardAssignment(*shard)
+    return subscriptions, assignment.select(subscriptions), assignment
+
+
+def engine_main(shard=None, membership=None) -> None:
+    """Запуск опроса всех подписок из SUBSCRIPTIONS_FILE.
+
+    shard - (i, N): опрашивать только подписки шарда i из N.
+    membership - флаги живых шардов супервизора для перебалансировки.
+    """
+    if not TELEGRAM_TOKEN:
+        logging.critical(ABSENCE_ENVIRONMENT_VARIABLES.format(
+            ['TELEGRAM_TOKEN']
+        ))
+        raise InvalidTokens(ERROR_ENVIRONMENT_VARIABLES.format(
+            ['TELEGRAM_TOKEN']
+        ))
+    hold_lease(shard)
+    subscriptions, registry, assignment = load_subscriptions(shard)
+    store = create_checkpoint_store()
+    logging.info(CHECKPOINTS_RESTORED.format(
+        restore_checkpoints(registry, store)
+    ))
+    bot = create_bot()
+    send_queue = SendQueue(bot).start()
+    history = StatusHistory()
+    expose_metrics(registry, send_queue, history)
+    engine = PollingEngine(
+        bot, registry, session=get_session(), cache=ResponseCache(),
+        decode=decode_api_answer, store=store, send_queue=send_queue,
+        deliveries=DeliveryLog(), history=history,
+        digest=DigestBuffer() if DIGEST_WINDOW else None
+    )
+    commands = None
+    if COMMANDS_ENABLED and shard is None:
+        commands = CommandHandler(
+            bot, registry, send_queue=send_queue,
+            on_subscribe=engine.schedule
+        ).start()
+    if membership is not None:
+        Rebalancer(engine, subscriptions, assignment, membership).start()
+    stop_on_sigterm(engine)
+    try:
+        engine.run_forever()
+    finally:
+        if commands is not None:
+            commands.stop()
+        engine.shutdown()
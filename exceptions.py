@@ -13,3 +13,13 @@ class InvalidResponseCode(Exception):
 
 class TelegramBadRequest(Exception):
     pass
+
+
+class UpstreamUnavailable(InvalidResponseCode):
+    """API ответил ошибкой сервера 5xx."""
+    pass
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен: автомат по сбоям разомкнут."""
+    pass
@@ -0,0 +1,183 @@
+import enum
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from records import homework_key
+from settings import (
+    HISTORY_MAX_HOMEWORKS, HISTORY_PATH, HISTORY_SPILL_INTERVAL, HISTORY_TTL,
+    HOMEWORK_VERDICTS
+)
+from watermarks import updated_at
+
+# Статусы из HOMEWORK_VERDICTS: в истории байт вместо строки.
+Status = enum.IntEnum('Status', list(HOMEWORK_VERDICTS))
+
+
+class Transitions:
+    """Смены статуса одной домашки в двух массивах.
+
+    spilled - сколько первых смен уже записано на диск.
+    """
+
+    __slots__ = ('name', 'times', 'statuses', 'spilled', 'touched')
+
+    def __init__(self, name, touched):
+        self.name = name
+        self.times = array('q')
+        self.statuses = array('B')
+        self.spilled = 0
+        self.touched = touched
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, changed, status) -> None:
+        """Добавляет смену, повтор последней пропускается.
+
+        Повтор приходит, когда домашку видят несколько подписок
+        с одним токеном.
+        """
+        if self.times and (
+            self.times[-1], self.statuses[-1]
+        ) == (changed, status):
+            return
+        self.times.append(changed)
+        self.statuses.append(status)
+
+    def unspilled(self, key) -> list:
+        return [
+            (key, self.name, self.statuses[index], self.times[index])
+            for index in range(self.spilled, len(self))
+        ]
+
+
+class StatusHistory:
+    """История смен статусов домашек с ограниченной памятью.
+
+    В памяти держатся maxsize недавно менявшихся домашек, давно
+    не использованные и не менявшиеся дольше ttl секунд
+    вытесняются. Новые смены, в том числе вытесненных домашек,
+    дописываются в SQLite из spill_if_due() цикла опроса раз в
+    spill_interval секунд; transitions() читает историю целиком.
+    Запись на диск идёт под отдельной блокировкой, record() её
+    не ждёт.
+    """
+
+    def __init__(self, path=HISTORY_PATH, maxsize=HISTORY_MAX_HOMEWORKS,
+                 ttl=HISTORY_TTL, spill_interval=HISTORY_SPILL_INTERVAL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.spill_interval = spill_interval
+        self._entries = OrderedDict()
+        self._evicted = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._spilled_at = time.monotonic()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS history ('
+            'homework TEXT, name TEXT, status INTEGER, changed INTEGER, '
+            'PRIMARY KEY (homework, changed, status)) WITHOUT ROWID'
+        )
+        self._connection.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def record(self, homeworks, changed, now=None) -> None:
+        """Запоминает новые статусы changed домашек homeworks.
+
+        Время смены - date_updated домашки, без него - now.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            for homework in homeworks:
+                key = homework_key(homework)
+                if key not in changed:
+                    continue
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = Transitions(
+                        sys.intern(homework.get('homework_name', '')), now
+                    )
+                else:
+                    self._entries.move_to_end(key)
+                    entry.touched = now
+                updated = updated_at(homework)
+                entry.append(
+                    int(now if updated is None else updated),
+                    Status[changed[key]]
+                )
+            self._evict(now)
+
+    def _evict(self, now) -> None:
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.maxsize and (
+                now - entry.touched <= self.ttl
+            ):
+                return
+            del self._entries[key]
+            self._evicted.extend(entry.unspilled(key))
+
+    def spill_if_due(self) -> None:
+        """Сбрасывает смены на диск, если подошёл срок."""
+        if time.monotonic() - self._spilled_at >= self.spill_interval:
+            self.spill()
+
+    def spill(self) -> None:
+        """Дописывает на диск смены, которых там ещё нет."""
+        with self._write_lock:
+            with self._lock:
+                rows, self._evicted = self._evicted, []
+                for key, entry in self._entries.items():
+                    rows.extend(entry.unspilled(key))
+                    entry.spilled = len(entry)
+                self._spilled_at = time.monotonic()
+            if not rows:
+                return
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT OR IGNORE INTO history VALUES (?, ?, ?, ?)', rows
+                )
+
+    def transitions(self, key) -> list:
+        """Все смены домашки: [(время, статус)] от старых к новым."""
+        self.spill()
+        with self._write_lock:
+            rows = self._connection.execute(
+                'SELECT changed, status FROM history WHERE homework = ? '
+                'ORDER BY changed, status',
+                (str(key),)
+            ).fetchall()
+        return [(changed, Status(status).name) for changed, status in rows]
+
+    def close(self) -> None:
+        self.spill()
+        self._connection.close()
+
+
+def time_in_status(transitions, status, now=None) -> float:
+    """Секунд в статусе status, текущий отрезок считается до now."""
+    now = time.time() if now is None else now
+    total = 0
+    ends = [changed for changed, _ in transitions[1:]] + [now]
+    for (changed, current), end in zip(transitions, ends):
+        if current == status:
+            total += end - changed
+    return total
+
+
+def rejections_before_approval(transitions) -> int:
+    """Сколько раз работу вернули до первого принятия."""
+    rejections = 0
+    for _, status in transitions:
+        if status == 'approved':
+            break
+        rejections += status == 'rejected'
+    return rejections
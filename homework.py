@@ -1,26 +1,49 @@
+import argparse
+import asyncio
 import logging
 import time
+from contextlib import closing
 from http import HTTPStatus
 
 import requests
 import telegram
+from telegram.error import TimedOut
 
+from deliveries import (
+    DeliveryLog, confirm_delivery, delivering, delivery_keys,
+    pending_delivery
+)
 from exceptions import (
-    InvalidTokens, ResponseErrorException,
-    InvalidResponseCode
+    CircuitOpenError, InvalidTokens, ResponseErrorException,
+    InvalidResponseCode, UpstreamUnavailable
+)
+from http_session import get_session
+from leases import hold_lease
+from log_config import setup_logging
+from messages import render_status
+from records import homework_key
+from metrics import (
+    PRACTICUM_LATENCY, PRACTICUM_REQUESTS_FAILED, PRACTICUM_REQUESTS_OK,
+    TELEGRAM_LATENCY, TELEGRAM_SENDS_FAILED, TELEGRAM_SENDS_OK
 )
 from settings import (
     ABSENCE_ENVIRONMENT_VARIABLES, ABSENCE_HOMEWORK_KEY,
-    ABSENCE_HOMEWORKS_KEY, ALL_TOKENS_WAS_RECEIVED, ENDPOINT,
+    ABSENCE_HOMEWORKS_KEY, ALL_TOKENS_WAS_RECEIVED, DEFAULT_LOCALE, ENDPOINT,
     ERROR_ENVIRONMENT_VARIABLES,
-    HEADERS, HOMEWORK_VERDICTS,
-    LAST_FRONTIER_ERROR_MESSAGE, NEW_CHECK_HOMEWORK,
-    REQUEST_ERROR_MESSAGE, RETRY_PERIOD,
+    HEADERS, HOMEWORK_VERDICTS, HTTP_KEEP_ALIVE, HTTP_TIMEOUT,
+    LAST_FRONTIER_ERROR_MESSAGE, LOG_FILE, MESSAGES_SEPARATOR,
+    NEW_CHECK_HOMEWORK,
+    REQUEST_ERROR_MESSAGE, RETRY_PERIOD, SUBSCRIPTIONS_FILE,
     SUCCESSFUL_TELEGRAM_MESSAGE, TELEGRAM_CHAT_ID,
     TELEGRAM_TOKEN, TYPE_ERROR, UNKNOW_HOMEWORK_STATUS,
-    WORK_STATUS_CHANGED, JSON_ERROR,
+    JSON_ERROR,
     FILED_SEND_MESSAGE, PRACTICUM_TOKEN
 )
+from resilience import CircuitBreaker, ErrorDeduplicator
+from sharding import Supervisor, parse_shard, shard_from_env
+from storage import Checkpoint, checkpoint_key, create_checkpoint_store
+from tracing import TRACER, install_signal_handlers, span
+from watermarks import catch_up_pages, commit_page, commit_window
 
 
 def check_tokens() -> bool:
@@ -39,35 +62,81 @@ def check_tokens() -> bool:
 
 def send_message(bot, message) -> bool:
     """Отправляет сообщение в Telegram чат."""
+    return send_message_to(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_message_to(bot, chat_id, message) -> bool:
+    """Отправляет сообщение в указанный Telegram чат.
+
+    Внутри delivering ключи уведомления записываются в журнал
+    доставок после отправки и после тайм-аута.
+    """
+    pending = pending_delivery()
     try:
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-        logging.debug(SUCCESSFUL_TELEGRAM_MESSAGE.format(message))
-        return True
+        with TELEGRAM_LATENCY.time(), span('telegram'):
+            bot.send_message(chat_id=chat_id, text=message)
     except Exception as error:
-        logging.error(FILED_SEND_MESSAGE.format(message, error), exc_info=True)
+        TELEGRAM_SENDS_FAILED.inc()
+        logging.error(FILED_SEND_MESSAGE, message, error, exc_info=True)
+        if isinstance(error, TimedOut):
+            confirm_delivery(pending)
         return False
+    TELEGRAM_SENDS_OK.inc()
+    confirm_delivery(pending)
+    logging.debug(SUCCESSFUL_TELEGRAM_MESSAGE, message)
+    return True
 
 
 def get_api_answer(timestamp) -> dict:
     """Делает запрос к эндпоинту API-сервиса."""
+    session = get_session() if HTTP_KEEP_ALIVE else None
+    return get_api_answer_for(HEADERS, timestamp, session)
+
+
+def get_api_answer_for(headers, timestamp, session=None, cache=None,
+                       decode=None) -> dict:
+    """Делает запрос к API-сервису с заголовками подписчика.
+
+    Если передана сессия, запрос идёт через её пул соединений.
+    С кэшем запрос условный: при 304 или том же теле ответа
+    возвращается уже разобранный ответ без повторного json().
+    decode - разбор тела ответа вместо response.json().
+    """
     request_data = {
         'url': ENDPOINT,
-        'headers': HEADERS,
-        'params': {'from_date': timestamp}
+        'headers': headers,
+        'params': {'from_date': timestamp},
+        'timeout': HTTP_TIMEOUT
     }
-    try:
-        homework_statuses = requests.get(**request_data)
-    except requests.RequestException as error:
-        raise ConnectionError(
-            REQUEST_ERROR_MESSAGE.format(
-                exception=error, **request_data)
+    entry = None
+    if cache is not None:
+        entry = cache.get(headers['Authorization'], timestamp)
+        request_data['headers'] = {
+            **headers, **cache.conditional_headers(entry)
+        }
+    homework_statuses = request_api(request_data, session)
+    if entry is not None and (
+        homework_statuses.status_code == HTTPStatus.NOT_MODIFIED
+    ):
+        return entry.data
+    status_code = homework_statuses.status_code
+    if status_code != HTTPStatus.OK:
+        error_class = (
+            UpstreamUnavailable
+            if status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+            else InvalidResponseCode
         )
-    if homework_statuses.status_code != HTTPStatus.OK:
-        raise InvalidResponseCode(
-            REQUEST_ERROR_MESSAGE.format(
-                error=homework_statuses.status_code, **request_data)
+        raise error_class(
+            REQUEST_ERROR_MESSAGE.format(error=status_code, **request_data)
         )
-    homeworks_json = homework_statuses.json()
+    with span('json'):
+        if cache is None:
+            homeworks_json = decode_response(homework_statuses, decode)
+        else:
+            homeworks_json, _ = cache.decode(
+                headers['Authorization'], timestamp, entry,
+                homework_statuses, decode
+            )
     for key in ['error', 'code']:
         if key in homeworks_json:
             logging.debug(homeworks_json[key])
@@ -77,6 +146,34 @@ def get_api_answer(timestamp) -> dict:
     return homeworks_json
 
 
+def decode_response(response, decode=None):
+    """Тело ответа через decode либо response.json()."""
+    if decode is None:
+        return response.json()
+    return decode(response.content)
+
+
+def request_api(request_data, session=None):
+    """GET запрос к API, сетевые ошибки -> ConnectionError.
+
+    Ответы с кодом 4xx и 5xx считаются неудачными запросами.
+    """
+    http_get = requests.get if session is None else session.get
+    try:
+        with PRACTICUM_LATENCY.time(), span('http'):
+            response = http_get(**request_data)
+        if response.status_code < HTTPStatus.BAD_REQUEST:
+            PRACTICUM_REQUESTS_OK.inc()
+        else:
+            PRACTICUM_REQUESTS_FAILED.inc()
+        return response
+    except requests.RequestException as error:
+        PRACTICUM_REQUESTS_FAILED.inc()
+        raise ConnectionError(
+            REQUEST_ERROR_MESSAGE.format(error=error, **request_data)
+        ) from error
+
+
 def check_response(response) -> list:
     """Проверка ответ API на соответствие."""
     if not isinstance(response, dict):
@@ -86,12 +183,12 @@ def check_response(response) -> list:
     homeworks = response['homeworks']
     if not isinstance(homeworks, list):
         raise TypeError(TYPE_ERROR.format(type(homeworks)))
-    logging.debug(NEW_CHECK_HOMEWORK.format(len(homeworks)))
+    logging.debug(NEW_CHECK_HOMEWORK, len(homeworks))
     return homeworks
 
 
-def parse_status(homework) -> str:
-    """Провека статуса ДЗ."""
+def check_homework(homework) -> str:
+    """Проверка ключей и статуса ДЗ, возвращает статус."""
     homework_keys = [
         'homework_name',
         'status'
@@ -102,9 +199,66 @@ def parse_status(homework) -> str:
     current_status = homework['status']
     if current_status not in HOMEWORK_VERDICTS:
         raise ValueError(UNKNOW_HOMEWORK_STATUS.format(current_status))
-    return WORK_STATUS_CHANGED.format(
-        homework['homework_name'], HOMEWORK_VERDICTS.get(current_status)
-    )
+    return current_status
+
+
+def parse_status(homework) -> str:
+    """Провека статуса ДЗ."""
+    status = check_homework(homework)
+    return render_status(DEFAULT_LOCALE, homework['homework_name'], status)
+
+
+def parse_statuses(homeworks, statuses, locale=DEFAULT_LOCALE,
+                   seen=None) -> tuple:
+    """Сообщения по домашкам, чей статус отличается от известного.
+
+    Возвращает список сообщений на языке locale и словарь новых
+    статусов по ключам. Домашки, для которых seen(homework)
+    истинно, уже доставлены: статус обновляется без сообщения.
+    """
+    messages = []
+    changed = {}
+    with span('parse'):
+        for homework in homeworks:
+            key = homework_key(homework)
+            if key in statuses and statuses[key] == homework.get('status'):
+                continue
+            status = check_homework(homework)
+            changed[key] = status
+            if seen is not None and seen(homework):
+                continue
+            messages.append(render_status(
+                locale, homework['homework_name'], status
+            ))
+    return messages, changed
+
+
+def join_messages(messages) -> str:
+    """Объединяет несколько уведомлений в одно сообщение."""
+    return MESSAGES_SEPARATOR.join(messages)
+
+
+def notify_changes(bot, checkpoint, homeworks, current_date,
+                   deliveries) -> None:
+    """Отправляет изменения страницами, сдвигая чекпоинт после каждой.
+
+    Если отправка не удалась, следующий запрос начнётся после
+    последней доставленной страницы.
+    """
+    seen = deliveries.seen(TELEGRAM_CHAT_ID)
+    for page in catch_up_pages(homeworks, checkpoint.watermarks):
+        messages, changed = parse_statuses(
+            page, checkpoint.statuses, seen=seen
+        )
+        with delivering(deliveries, delivery_keys(
+            TELEGRAM_CHAT_ID, page, changed
+        )):
+            if messages and not send_message(
+                bot=bot, message=join_messages(messages)
+            ):
+                return
+        commit_page(checkpoint, page, changed)
+    commit_window(checkpoint, current_date)
 
 
 def main() -> None:
@@ -112,38 +266,68 @@ def main() -> None:
     check_tokens()
     logging.debug(check_tokens())
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    timestamp = int(time.time())
-    previous_error = ''
-    while True:
-        try:
-            request = get_api_answer(timestamp)
-            homeworks = check_response(request)
-            if homeworks:
-                homework_verdict = parse_status(homeworks[0])
-                if send_message(bot=bot, message=homework_verdict):
-                    timestamp = request.get('current_date', timestamp)
-        except Exception as error:
-            message = LAST_FRONTIER_ERROR_MESSAGE.format(error)
-            logging.error(message)
-            if str(previous_error) != error:
-                if send_message(bot=bot, message=message):
-                    previous_error = error
-        finally:
-            time.sleep(RETRY_PERIOD)
+    hold_lease()
+    store = create_checkpoint_store()
+    key = checkpoint_key(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)
+    checkpoint = store.load(key) or Checkpoint(int(time.time()))
+    deliveries = DeliveryLog()
+    breaker = CircuitBreaker()
+    errors = ErrorDeduplicator()
+    with closing(store), closing(deliveries):
+        while True:
+            try:
+                with TRACER.trace('poll'):
+                    with breaker.guard():
+                        request = get_api_answer(checkpoint.timestamp)
+                    homeworks = check_response(request)
+                    if homeworks:
+                        notify_changes(
+                            bot, checkpoint, homeworks,
+                            request.get('current_date', checkpoint.timestamp),
+                            deliveries
+                        )
+                        store.save(
+                            key, checkpoint.timestamp, checkpoint.statuses,
+                            checkpoint.watermarks, checkpoint.names
+                        )
+                    errors.clear()
+            except CircuitOpenError as error:
+                logging.warning(error)
+            except Exception as error:
+                message = LAST_FRONTIER_ERROR_MESSAGE.format(error)
+                logging.error(message)
+                if errors.is_new(error):
+                    if send_message(bot=bot, message=message):
+                        errors.remember(error)
+            finally:
+                time.sleep(RETRY_PERIOD)
 
 
 if __name__ == '__main__':
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format=(
-            '%(asctime)s [%(levelname)s] | '
-            '%(funcName)s:%(lineno)d | %(message)s'
-        ),
-        handlers=[
-            logging.FileHandler(
-                __file__ + '.log', mode='w', encoding='UTF-8',
-            ),
-            logging.StreamHandler()],
-    )
+    setup_logging(LOG_FILE or __file__ + '.log')
     logging.getLogger('urllib3').setLevel('CRITICAL')
-    main()
+    install_signal_handlers()
+    parser = argparse.ArgumentParser(description='Homework status bot')
+    parser.add_argument(
+        '--async', dest='use_async', action='store_true',
+        help='опрос на одном asyncio event loop'
+    )
+    parser.add_argument(
+        '--shard', type=parse_shard, default=shard_from_env(),
+        help='i/N: опрашивать только подписки шарда i из N'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=0,
+        help='запустить N процессов-шардов под супервизором'
+    )
+    args = parser.parse_args()
+    if args.workers:
+        Supervisor(args.workers).run_forever()
+    elif args.use_async:
+        from async_bot import async_main
+        asyncio.run(async_main(args.shard))
+    elif SUBSCRIPTIONS_FILE:
+        from engine import engine_main
+        engine_main(args.shard)
+    else:
+        main()
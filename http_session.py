@@ -0,0 +1,47 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from settings import (
+    HTTP_POOL_BLOCK, HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE
+)
+
+_session = None
+_lock = threading.Lock()
+
+
+def create_session() -> requests.Session:
+    """Сессия с keep-alive пулом соединений.
+
+    pool_connections - сколько хостов держать в пуле,
+    pool_maxsize - сколько соединений держать к одному хосту.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        pool_block=HTTP_POOL_BLOCK,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Общая для процесса сессия, создаётся при первом обращении."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def close_session() -> None:
+    """Закрывает общую сессию и её соединения."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,213 @@
+import _thread
+import atexit
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from settings import (
+    LEASE_ACQUIRED, LEASE_BACKEND, LEASE_FILE_UNAVAILABLE, LEASE_LOST,
+    LEASE_NAME, LEASE_PATH,
+    LEASE_RENEW_FAILED, LEASE_STANDBY, LEASE_TTL
+)
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def default_owner() -> str:
+    """Уникальный владелец: хост, pid и случайный суффикс."""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+class LeaseStore:
+    """Хранилище аренд: у имени не больше одного владельца.
+
+    Другие хранилища (Redis, Postgres) подключаются наследником
+    с теми же acquire/renew/release и записью в LEASE_BACKENDS.
+    """
+
+    def acquire(self, name, owner, ttl) -> bool:
+        """Берёт свободную или истёкшую аренду на ttl секунд."""
+        raise NotImplementedError
+
+    def renew(self, name, owner, ttl) -> bool:
+        """Продлевает свою аренду, False если её уже забрали."""
+        raise NotImplementedError
+
+    def release(self, name, owner) -> None:
+        raise NotImplementedError
+
+
+class SQLiteLeaseStore(LeaseStore):
+    """Аренды в SQLite: срок хранится в строке и проверяется в UPSERT."""
+
+    def __init__(self, path=LEASE_PATH):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, timeout=LEASE_TTL
+        )
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS leases ('
+            'name TEXT PRIMARY KEY, owner TEXT, expires REAL)'
+        )
+        self._connection.commit()
+
+    def acquire(self, name, owner, ttl) -> bool:
+        now = time.time()
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'INSERT INTO leases VALUES (?, ?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET '
+                'owner = excluded.owner, expires = excluded.expires '
+                'WHERE leases.expires < ? OR leases.owner = excluded.owner',
+                (name, owner, now + ttl, now)
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, name, owner, ttl) -> bool:
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'UPDATE leases SET expires = ? WHERE name = ? AND owner = ?',
+                (time.time() + ttl, name, owner)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, name, owner) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                'DELETE FROM leases WHERE name = ? AND owner = ?',
+                (name, owner)
+            )
+
+
+class FileLeaseStore(LeaseStore):
+    """Аренда как flock на файле рядом с path.
+
+    Блокировку держит ядро, поэтому при падении процесса она
+    освобождается сразу, без ожидания ttl.
+    """
+
+    def __init__(self, path=LEASE_PATH):
+        if fcntl is None:
+            raise RuntimeError(LEASE_FILE_UNAVAILABLE)
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, name, owner, ttl) -> bool:
+        with self._lock:
+            if name in self._files:
+                return True
+            file = open(os.path.join(self.directory, f'{name}.lock'), 'a')
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                file.close()
+                return False
+            self._files[name] = file
+            return True
+
+    def renew(self, name, owner, ttl) -> bool:
+        return name in self._files
+
+    def release(self, name, owner) -> None:
+        with self._lock:
+            file = self._files.pop(name, None)
+            if file is not None:
+                fcntl.flock(file, fcntl.LOCK_UN)
+                file.close()
+
+
+LEASE_BACKENDS = {
+    'sqlite': SQLiteLeaseStore,
+    'file': FileLeaseStore,
+}
+
+
+def interrupt_main(lease) -> None:
+    """Останавливает процесс, потерявший аренду."""
+    _thread.interrupt_main()
+
+
+class Lease:
+    """Аренда с фоновым продлением.
+
+    Продлевается каждые ttl / 3 секунд. Если продлить не удалось,
+    аренду уже мог взять резервный процесс: вызывается on_lost,
+    по умолчанию останавливающий процесс, чтобы не было двух
+    опрашивающих копий.
+    """
+
+    def __init__(self, store, name, owner=None, ttl=LEASE_TTL,
+                 on_lost=interrupt_main):
+        self.store = store
+        self.name = name
+        self.owner = owner or default_owner()
+        self.ttl = ttl
+        self.on_lost = on_lost
+        self.held = False
+        self._stopped = threading.Event()
+
+    def acquire(self, block=True) -> bool:
+        """Берёт аренду; с block ждёт в резерве, пока она не освободится."""
+        standby = False
+        while not self.store.acquire(self.name, self.owner, self.ttl):
+            if not block:
+                return False
+            if not standby:
+                logging.info(LEASE_STANDBY, self.name)
+                standby = True
+            time.sleep(self.ttl / 3)
+        self.held = True
+        logging.info(LEASE_ACQUIRED, self.name, self.owner)
+        threading.Thread(
+            target=self._renew, name='lease', daemon=True
+        ).start()
+        return True
+
+    def _renew(self) -> None:
+        while not self._stopped.wait(self.ttl / 3):
+            try:
+                renewed = self.store.renew(self.name, self.owner, self.ttl)
+            except Exception as error:
+                logging.error(LEASE_RENEW_FAILED, self.name, error)
+                continue
+            if not renewed:
+                self.held = False
+                logging.critical(LEASE_LOST, self.name)
+                self.on_lost(self)
+                return
+
+    def release(self) -> None:
+        """Отдаёт аренду, резервный процесс забирает её сразу."""
+        self._stopped.set()
+        if self.held:
+            self.held = False
+            self.store.release(self.name, self.owner)
+
+
+def lease_name(shard=None, name=LEASE_NAME) -> str:
+    """Имя аренды процесса: своя аренда у каждого шарда."""
+    if shard is None:
+        return name
+    return f'{name}-shard-{shard[0]}-of-{shard[1]}'
+
+
+def hold_lease(shard=None, backend=LEASE_BACKEND, path=LEASE_PATH):
+    """Ждёт аренду процесса и держит её до выхода.
+
+    None, если LEASE_BACKEND не задан и координация не нужна.
+    """
+    if not backend:
+        return None
+    lease = Lease(LEASE_BACKENDS[backend](path), lease_name(shard))
+    lease.acquire()
+    atexit.register(lease.release)
+    return lease
@@ -0,0 +1,85 @@
+import atexit
+import json
+import logging
+import queue
+from logging.handlers import (
+    QueueHandler, QueueListener, RotatingFileHandler
+)
+
+from settings import (
+    LOG_BACKUP_COUNT, LOG_FORMAT, LOG_JSON, LOG_LEVEL, LOG_MAX_BYTES
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON."""
+
+    def format(self, record) -> str:
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'function': record.funcName,
+            'line': record.lineno,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Кладёт запись в очередь без форматирования.
+
+    Стандартный QueueHandler собирает текст сообщения и traceback
+    в потоке, который пишет в лог. Здесь это делает поток
+    QueueListener, а вызывающему остаётся только put в очередь.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class BackgroundListener(QueueListener):
+    """QueueListener, который можно остановить повторно."""
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            super().stop()
+
+
+def create_handlers(path, json_output=LOG_JSON) -> list:
+    """Файл с ротацией по размеру и вывод в консоль."""
+    formatter = JsonFormatter() if json_output else logging.Formatter(
+        LOG_FORMAT
+    )
+    handlers = [logging.StreamHandler()]
+    if path:
+        handlers.append(RotatingFileHandler(
+            path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+            encoding='UTF-8'
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def setup_logging(path, level=LOG_LEVEL, json_output=LOG_JSON,
+                  handlers=None) -> QueueListener:
+    """Корневой логгер пишет в очередь, на диск - фоновый поток.
+
+    Возвращает запущенный QueueListener, он же останавливается
+    при выходе из процесса и дописывает оставшиеся записи.
+    """
+    records = queue.SimpleQueue()
+    listener = BackgroundListener(
+        records, *(handlers or create_handlers(path, json_output)),
+        respect_handler_level=True
+    )
+    logging.basicConfig(
+        level=level, handlers=[DeferredQueueHandler(records)], force=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
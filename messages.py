@@ -0,0 +1,66 @@
+import functools
+
+from settings import DEFAULT_LOCALE, MESSAGE_CACHE_SIZE, MESSAGE_LOCALES
+
+# Подставляется вместо названия домашки при компиляции шаблона.
+NAME_SLOT = '\x00'
+
+
+class StatusTemplate:
+    """Уведомление о статусе с уже подставленным вердиктом.
+
+    Остаётся только склеить название домашки с двумя готовыми
+    частями строки, без разбора шаблона str.format.
+    """
+
+    __slots__ = ('prefix', 'suffix')
+
+    def __init__(self, template, verdict):
+        self.prefix, _, self.suffix = template.format(
+            NAME_SLOT, verdict
+        ).partition(NAME_SLOT)
+
+    def render(self, homework_name) -> str:
+        return self.prefix + homework_name + self.suffix
+
+
+def compile_templates(locales=MESSAGE_LOCALES) -> dict:
+    """Шаблоны по (язык, статус) для всех языков и вердиктов."""
+    return {
+        (locale, status): StatusTemplate(texts['status_changed'], verdict)
+        for locale, texts in locales.items()
+        for status, verdict in texts['verdicts'].items()
+    }
+
+
+TEMPLATES = compile_templates()
+
+
+def normalize_locale(code) -> str:
+    """Поддерживаемый язык по коду Telegram: 'en-US' -> 'en'.
+
+    Для неизвестного или пустого кода - DEFAULT_LOCALE.
+    """
+    locale = (code or '').lower().replace('_', '-').split('-')[0]
+    return locale if locale in MESSAGE_LOCALES else DEFAULT_LOCALE
+
+
+@functools.lru_cache(maxsize=MESSAGE_CACHE_SIZE)
+def render_status(locale, homework_name, status) -> str:
+    """Текст уведомления о новом статусе домашки на языке чата.
+
+    Один и тот же текст рассылается всем подписчикам домашки,
+    поэтому готовые строки хранятся в LRU кэше.
+    """
+    template = TEMPLATES.get((locale, status))
+    if template is None:
+        template = TEMPLATES[(DEFAULT_LOCALE, status)]
+    return template.render(homework_name)
+
+
+def render_verdict(locale, status) -> str:
+    """Вердикт по статусу на языке чата."""
+    verdicts = MESSAGE_LOCALES.get(locale, {}).get('verdicts', {})
+    if status not in verdicts:
+        verdicts = MESSAGE_LOCALES[DEFAULT_LOCALE]['verdicts']
+    return verdicts[status]
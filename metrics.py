@@ -0,0 +1,291 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from settings import METRICS_HOST, METRICS_LATENCY_BUCKETS
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_labels(labelnames, labelvalues) -> str:
+    """Метки в формате Prometheus: {a="1",b="2"}."""
+    if not labelnames:
+        return ''
+    pairs = ','.join(
+        f'{name}="{value}"' for name, value in zip(labelnames, labelvalues)
+    )
+    return '{' + pairs + '}'
+
+
+class Metric:
+    """Метрика с метками, дочерние значения создаются один раз.
+
+    labels() стоит вызывать при импорте модуля и держать результат
+    в константе, тогда на горячем пути нет поиска по словарю.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *labelvalues):
+        """Дочерняя метрика для значений меток."""
+        labelvalues = tuple(str(value) for value in labelvalues)
+        child = self._children.get(labelvalues)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(
+                    labelvalues, self._new_child()
+                )
+        return child
+
+    def samples(self):
+        """Строки (суффикс, метки, значение) для выдачи."""
+        for labelvalues, child in list(self._children.items()):
+            labels = format_labels(self.labelnames, labelvalues)
+            for suffix, extra, value in child.samples():
+                if extra:
+                    labels_with_extra = (
+                        labels[:-1] + ',' + extra if labels else '{' + extra
+                    ) + '}'
+                else:
+                    labels_with_extra = labels
+                yield suffix, labels_with_extra, value
+
+    def render(self) -> str:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f'{self.name}{suffix}{labels} {value}')
+        return '\n'.join(lines)
+
+
+class CounterValue:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        yield '_total', '', self.value
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик."""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return CounterValue()
+
+    def inc(self, amount=1) -> None:
+        self._default.inc(amount)
+
+
+class GaugeValue:
+    __slots__ = ('value', 'function')
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value) -> None:
+        self.value = value
+
+    def set_function(self, function) -> None:
+        """Значение вычисляется только при выдаче метрик."""
+        self.function = function
+
+    def samples(self):
+        yield '', '', self.function() if self.function else self.value
+
+
+class Gauge(Metric):
+    """Текущее значение: глубина очереди, число подписок."""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return GaugeValue()
+
+    def set(self, value) -> None:
+        self._default.set(value)
+
+    def set_function(self, function) -> None:
+        self._default.set_function(function)
+
+
+class HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """Замеряет длительность блока."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            yield '_bucket', f'le="{bound}"', cumulative
+        cumulative += counts[-1]
+        yield '_bucket', 'le="+Inf"', cumulative
+        yield '_sum', '', total
+        yield '_count', '', cumulative
+
+
+class Histogram(Metric):
+    """Распределение длительностей по корзинам."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=METRICS_LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return HistogramValue(self.buckets)
+
+    def observe(self, value) -> None:
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+class MetricsRegistry:
+    """Все метрики процесса."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric) -> None:
+        self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Метрики в текстовом формате Prometheus."""
+        return '\n'.join(
+            metric.render() for metric in self._metrics.values()
+        ) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдаёт REGISTRY по GET /metrics."""
+
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port, host=METRICS_HOST) -> ThreadingHTTPServer:
+    """Поднимает /metrics в фоновом потоке."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    ).start()
+    return server
+
+
+PRACTICUM_REQUESTS = Counter(
+    'homework_practicum_requests', 'Запросы к API Практикума',
+    ('outcome',)
+)
+PRACTICUM_REQUESTS_OK = PRACTICUM_REQUESTS.labels('ok')
+PRACTICUM_REQUESTS_FAILED = PRACTICUM_REQUESTS.labels('failed')
+PRACTICUM_LATENCY = Histogram(
+    'homework_practicum_request_seconds',
+    'Длительность запроса к API Практикума'
+)
+COALESCED_REQUESTS = Counter(
+    'homework_practicum_coalesced',
+    'Запросы, присоединённые к уже идущему запросу с тем же токеном'
+)
+TELEGRAM_SENDS = Counter(
+    'homework_telegram_sends', 'Отправки сообщений в Telegram',
+    ('outcome',)
+)
+TELEGRAM_SENDS_OK = TELEGRAM_SENDS.labels('ok')
+TELEGRAM_SENDS_FAILED = TELEGRAM_SENDS.labels('failed')
+TELEGRAM_LATENCY = Histogram(
+    'homework_telegram_send_seconds', 'Длительность отправки в Telegram'
+)
+DUPLICATES_SUPPRESSED = Counter(
+    'homework_duplicates_suppressed',
+    'Уведомления, не отправленные повторно по журналу доставок'
+)
+POLL_ERRORS = Counter(
+    'homework_poll_errors', 'Сбои опроса подписок'
+)
+SEND_QUEUE_DEPTH = Gauge(
+    'homework_send_queue_depth', 'Сообщений в очереди отправки'
+)
+HISTORY_HOMEWORKS = Gauge(
+    'homework_history_homeworks', 'Домашек в истории статусов в памяти'
+)
+SUBSCRIPTIONS = Gauge(
+    'homework_subscriptions', 'Подписок в реестре'
+)
+CIRCUIT_STATE = Gauge(
+    'homework_circuit_state',
+    'Автомат по сбоям: 0 - замкнут, 1 - полуоткрыт, 2 - разомкнут',
+    ('upstream',)
+)
@@ -0,0 +1,104 @@
+import json
+
+from settings import (
+    ABSENCE_HOMEWORK_KEY, ABSENCE_HOMEWORKS_KEY, HOMEWORK_VERDICTS,
+    TYPE_ERROR, UNKNOW_HOMEWORK_STATUS
+)
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    try:
+        import msgspec
+        loads = msgspec.json.decode
+    except ImportError:
+        loads = json.loads
+
+# Статусы хранятся ссылками на ключи HOMEWORK_VERDICTS.
+STATUSES = {status: status for status in HOMEWORK_VERDICTS}
+
+
+class HomeworkRecord:
+    """Проверенная домашка из ответа API.
+
+    Поддерживает чтение как словарь, поэтому годится для
+    parse_status и homework_key.
+    """
+
+    __slots__ = ('id', 'homework_name', 'status', 'date_updated')
+
+    def __init__(self, id, homework_name, status, date_updated=None):
+        self.id = id
+        self.homework_name = homework_name
+        self.status = status
+        self.date_updated = date_updated
+
+    @classmethod
+    def from_dict(cls, homework) -> 'HomeworkRecord':
+        """Проверяет домашку и собирает запись."""
+        if not isinstance(homework, dict):
+            raise TypeError(TYPE_ERROR.format(type(homework)))
+        for key in ('homework_name', 'status'):
+            if key not in homework:
+                raise KeyError(ABSENCE_HOMEWORK_KEY.format(key))
+        status = STATUSES.get(homework['status'])
+        if status is None:
+            raise ValueError(UNKNOW_HOMEWORK_STATUS.format(homework['status']))
+        return cls(
+            homework.get('id'), homework['homework_name'], status,
+            homework.get('date_updated')
+        )
+
+    def __getitem__(self, key):
+        try:
+            value = getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, HomeworkRecord):
+            return NotImplemented
+        return all(
+            getattr(self, key) == getattr(other, key)
+            for key in self.__slots__
+        )
+
+    def get(self, key, default=None):
+        """Значение поля или default, как у словаря."""
+        if key not in self:
+            return default
+        return getattr(self, key)
+
+
+def homework_key(homework) -> str:
+    """Ключ домашки для хранения её последнего статуса."""
+    return str(homework.get('id', homework.get('homework_name')))
+
+
+def decode_api_answer(content) -> dict:
+    """Разбирает тело ответа API и за один проход проверяет домашки.
+
+    Ошибки те же, что у check_response и parse_status. Ответ
+    с ключами error/code возвращается как есть.
+    """
+    response = loads(content)
+    if not isinstance(response, dict):
+        raise TypeError(TYPE_ERROR.format(type(response)))
+    if 'error' in response or 'code' in response:
+        return response
+    if 'homeworks' not in response:
+        raise KeyError(ABSENCE_HOMEWORKS_KEY)
+    homeworks = response['homeworks']
+    if not isinstance(homeworks, list):
+        raise TypeError(TYPE_ERROR.format(type(homeworks)))
+    response['homeworks'] = [
+        HomeworkRecord.from_dict(homework) for homework in homeworks
+    ]
+    return response
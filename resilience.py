@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from exceptions import CircuitOpenError, UpstreamUnavailable
+from metrics import CIRCUIT_STATE
+from settings import (
+    BREAKER_FAILURE_THRESHOLD, BREAKER_HALF_OPEN_CALLS,
+    BREAKER_RESET_TIMEOUT, CIRCUIT_CLOSED, CIRCUIT_OPEN_ERROR,
+    CIRCUIT_OPENED
+)
+
+CLOSED = 'closed'
+HALF_OPEN = 'half-open'
+OPEN = 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """Автомат по сбоям для одного внешнего API.
+
+    После failure_threshold сбоев подряд размыкается и
+    reset_timeout секунд отклоняет запросы с CircuitOpenError.
+    Затем пропускает half_open_calls пробных запросов: успех
+    замыкает автомат, сбой снова размыкает его.
+    Сбоями считаются только ошибки из failures, остальные
+    исключения (неверный токен, битый ответ) - успешный ответ API.
+    """
+
+    def __init__(self, name='practicum',
+                 failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=BREAKER_RESET_TIMEOUT,
+                 half_open_calls=BREAKER_HALF_OPEN_CALLS,
+                 failures=(ConnectionError, UpstreamUnavailable)):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.failures = failures
+        self.state = CLOSED
+        self.failure_count = 0
+        self.opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self._gauge = CIRCUIT_STATE.labels(name)
+        self._gauge.set(STATE_VALUES[CLOSED])
+
+    def _set_state(self, state) -> None:
+        self.state = state
+        self._gauge.set(STATE_VALUES[state])
+
+    def retry_after(self) -> float:
+        """Сколько секунд ещё разомкнут автомат."""
+        return max(
+            0.0, self.opened_at + self.reset_timeout - time.monotonic()
+        )
+
+    def before_call(self) -> None:
+        """Пропускает запрос или бросает CircuitOpenError."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.retry_after() > 0:
+                    raise CircuitOpenError(
+                        CIRCUIT_OPEN_ERROR.format(
+                            self.name, self.retry_after()
+                        )
+                    )
+                self._set_state(HALF_OPEN)
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    raise CircuitOpenError(
+                        CIRCUIT_OPEN_ERROR.format(self.name, 0)
+                    )
+                self._probes += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logging.info(CIRCUIT_CLOSED, self.name)
+                self._set_state(CLOSED)
+            self.failure_count = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failure_count += 1
+            if self.state == HALF_OPEN or (
+                self.failure_count >= self.failure_threshold
+            ):
+                self.opened_at = time.monotonic()
+                if self.state != OPEN:
+                    logging.error(
+                        CIRCUIT_OPENED, self.name, self.reset_timeout,
+                        self.failure_count
+                    )
+                self._set_state(OPEN)
+
+    @contextmanager
+    def guard(self):
+        """Оборачивает запрос к API и учитывает его исход."""
+        self.before_call()
+        try:
+            yield
+        except self.failures:
+            self.record_failure()
+            raise
+        except Exception:
+            self.record_success()
+            raise
+        self.record_success()
+
+
+def fingerprint(error) -> tuple:
+    """Отпечаток ошибки: тип исключения и текст."""
+    return type(error).__qualname__, str(error)
+
+
+class ErrorDeduplicator:
+    """Одно оповещение на каждый вид ошибки за инцидент.
+
+    Инцидент длится от первой ошибки до первого успешного
+    опроса, после clear() те же ошибки снова считаются новыми.
+    Ключ разделяет инциденты разных подписок.
+    """
+
+    def __init__(self):
+        self._incidents = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._incidents)
+
+    def is_new(self, error, key=None) -> bool:
+        """Об этой ошибке ещё не сообщали в текущем инциденте."""
+        return fingerprint(error) not in self._incidents.get(key, ())
+
+    def remember(self, error, key=None) -> None:
+        """Отмечает, что об ошибке сообщили."""
+        with self._lock:
+            self._incidents.setdefault(key, set()).add(fingerprint(error))
+
+    def clear(self, key=None) -> None:
+        """Завершает инцидент после успешного опроса."""
+        if key in self._incidents:
+            with self._lock:
+                self._incidents.pop(key, None)
@@ -0,0 +1,82 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from settings import RESPONSE_CACHE_SIZE
+
+
+class CachedResponse:
+    """Последний ответ API для токена и from_date."""
+
+    __slots__ = ('etag', 'last_modified', 'digest', 'data')
+
+    def __init__(self, etag, last_modified, digest, data):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.data = data
+
+
+class ResponseCache:
+    """Кэш ответов API Практикума с условными запросами.
+
+    Ответы хранятся по паре (токен, from_date): подписки с одним
+    токеном, но разным from_date не вытесняют ответы друг друга.
+    Сверх maxsize ответов удаляются давно не использованные.
+    """
+
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token, from_date):
+        """Закэшированный ответ или None."""
+        key = token, from_date
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def conditional_headers(self, entry) -> dict:
+        """Заголовки If-None-Match/If-Modified-Since для ответа."""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def decode(self, token, from_date, entry, response,
+               decode=None) -> tuple:
+        """Разбирает ответ, если тело не совпало с закэшированным.
+
+        Возвращает данные и признак того, что они взяты из кэша.
+        """
+        digest = hashlib.blake2b(response.content, digest_size=16).digest()
+        if entry is not None and entry.digest == digest:
+            return entry.data, True
+        data = response.json() if decode is None else decode(
+            response.content
+        )
+        self.put(token, from_date, CachedResponse(
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            digest,
+            data
+        ))
+        return data, False
+
+    def put(self, token, from_date, entry) -> None:
+        """Запоминает ответ для токена и from_date."""
+        key = token, from_date
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
@@ -0,0 +1,143 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from settings import (
+    POLL_BACKOFF, POLL_JITTER, POLL_PERIOD_MAX, POLL_PERIOD_REVIEWING,
+    RETRY_PERIOD
+)
+
+
+def dominant_status(changed):
+    """Статус, по которому планировать опрос после изменений.
+
+    `reviewing` важнее вердиктов: после него опрос учащается.
+    """
+    if not changed:
+        return None
+    if 'reviewing' in changed.values():
+        return 'reviewing'
+    return next(reversed(changed.values()))
+
+
+def token_random(subscription) -> random.Random:
+    """Генератор, одинаковый для подписок с тем же токеном и timestamp.
+
+    Такие подписки получают одинаковый jitter и опрашиваются
+    одновременно, поэтому их запросы объединяет SingleFlight.
+    """
+    return random.Random(hash((subscription.token, subscription.timestamp)))
+
+
+class FixedPolicy:
+    """Опрос с постоянным интервалом RETRY_PERIOD."""
+
+    def __init__(self, period=RETRY_PERIOD):
+        self.period = period
+
+    def next_delay(self, subscription, status=None) -> float:
+        """Задержка до следующего опроса подписки."""
+        return self.period
+
+
+class AdaptivePolicy:
+    """Интервал опроса по истории статусов подписки.
+
+    После `reviewing` опрашиваем чаще, после вердикта возвращаемся
+    к базовому интервалу, пока ничего не меняется - интервал растёт
+    в backoff раз до max_period. К задержке добавляется jitter.
+    """
+
+    def __init__(self, base=RETRY_PERIOD, reviewing=POLL_PERIOD_REVIEWING,
+                 max_period=POLL_PERIOD_MAX, backoff=POLL_BACKOFF,
+                 jitter=POLL_JITTER):
+        self.base = base
+        self.reviewing = reviewing
+        self.max_period = max_period
+        self.backoff = backoff
+        self.jitter = jitter
+
+    def next_interval(self, subscription, status=None) -> float:
+        """Интервал без jitter; status - новый статус или None."""
+        if status == 'reviewing':
+            return self.reviewing
+        if status is not None:
+            return self.base
+        interval = (subscription.interval or self.base) * self.backoff
+        if subscription.last_status == 'reviewing':
+            return min(interval, self.base)
+        return min(interval, self.max_period)
+
+    def next_delay(self, subscription, status=None) -> float:
+        """Задержка до следующего опроса, запоминает интервал подписки."""
+        interval = self.next_interval(subscription, status)
+        subscription.interval = interval
+        if status is not None:
+            subscription.last_status = status
+        return interval * token_random(subscription).uniform(
+            1 - self.jitter, 1 + self.jitter
+        )
+
+
+POLICIES = {
+    'fixed': FixedPolicy,
+    'adaptive': AdaptivePolicy,
+}
+
+
+class PollScheduler:
+    """Очередь опросов на куче: ближайший опрос за O(log n)."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, subscription, delay) -> None:
+        """Планирует опрос подписки через delay секунд."""
+        due = self.clock() + delay
+        with self._lock:
+            heapq.heappush(
+                self._heap, (due, next(self._counter), subscription)
+            )
+            self._changed.notify()
+
+    def pop_due(self) -> list:
+        """Забирает все подписки, чей опрос уже наступил."""
+        now = self.clock()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def time_until_next(self, default) -> float:
+        """Секунд до ближайшего опроса, default если очередь пуста."""
+        with self._lock:
+            return self._time_until_next(default)
+
+    def _time_until_next(self, default) -> float:
+        if not self._heap:
+            return default
+        return max(0, self._heap[0][0] - self.clock())
+
+    def wait(self, timeout) -> None:
+        """Ждёт ближайшего опроса или новой подписки, не дольше timeout.
+
+        Цикл опроса между ожиданиями сбрасывает чекпоинты, поэтому
+        далёкий опрос не должен задерживать его дольше timeout.
+        """
+        with self._lock:
+            self._changed.wait(min(timeout, self._time_until_next(timeout)))
+
+    def wake(self) -> None:
+        """Прерывает текущее ожидание."""
+        with self._lock:
+            self._changed.notify_all()
@@ -0,0 +1,237 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+
+from deliveries import confirm_delivery, pending_delivery
+from metrics import TELEGRAM_LATENCY, TELEGRAM_SENDS_FAILED, TELEGRAM_SENDS_OK
+from settings import (
+    FILED_SEND_MESSAGE, SEND_MAX_RETRIES, SEND_QUEUE_FULL, SEND_QUEUE_SIZE,
+    SEND_RETRY_BACKOFF, SEND_WORKERS, SUCCESSFUL_TELEGRAM_MESSAGE,
+    TELEGRAM_CHAT_BURST, TELEGRAM_CHAT_RATE, TELEGRAM_GLOBAL_BURST,
+    TELEGRAM_GLOBAL_RATE, TELEGRAM_GROUP_BURST, TELEGRAM_GROUP_RATE
+)
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', '_lock')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Берёт токен и возвращает 0 либо секунды до появления токена."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds) -> None:
+        """Опустошает ведро на seconds секунд (ответ RetryAfter)."""
+        with self._lock:
+            self.tokens = -seconds * self.rate
+            self.updated = time.monotonic()
+
+
+class SendQueue:
+    """Очередь исходящих сообщений Telegram с пулом отправителей.
+
+    Сообщения копятся в очередях чатов, чаты ждут своей очереди в
+    куче по времени, когда их ведро токенов даст отправить. Чат,
+    упёршийся в лимит, откладывается в куче, и отправитель сразу
+    берёт следующий: занятый чат не задерживает остальные.
+    У групп (отрицательный chat_id) свой лимит. Скорость всех
+    отправок ограничена общим ведром, RetryAfter и сетевые
+    ошибки повторяются с паузой.
+    """
+
+    def __init__(self, bot, workers=SEND_WORKERS, maxsize=SEND_QUEUE_SIZE,
+                 global_rate=TELEGRAM_GLOBAL_RATE,
+                 global_burst=TELEGRAM_GLOBAL_BURST,
+                 chat_rate=TELEGRAM_CHAT_RATE, chat_burst=TELEGRAM_CHAT_BURST,
+                 group_rate=TELEGRAM_GROUP_RATE,
+                 group_burst=TELEGRAM_GROUP_BURST,
+                 max_retries=SEND_MAX_RETRIES):
+        self.bot = bot
+        self.workers = workers
+        self.maxsize = maxsize
+        self.max_retries = max_retries
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self._chat_buckets = {}
+        self._chat_lock = threading.Lock()
+        # chat_id -> deque (сообщение, ключи доставки, номер попытки).
+        # Чат с сообщениями либо в куче _ready, либо у отправителя.
+        self._messages = {}
+        self._ready = []
+        self._counter = itertools.count()
+        self._size = 0
+        self._busy = 0
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._threads = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put(self, chat_id, message) -> bool:
+        """Ставит сообщение в очередь, False если очередь переполнена.
+
+        Ключи текущей отправки из delivering едут вместе с
+        сообщением и записываются, когда отправитель его отправит.
+        """
+        with self._lock:
+            full = self._size >= self.maxsize
+            if not full:
+                messages = self._messages.get(chat_id)
+                if messages is None:
+                    messages = self._messages[chat_id] = deque()
+                    self._park(chat_id, 0)
+                messages.append((message, pending_delivery(), 0))
+                self._size += 1
+        if full:
+            logging.error(SEND_QUEUE_FULL, message)
+        return not full
+
+    def _park(self, chat_id, delay) -> None:
+        heapq.heappush(
+            self._ready,
+            (time.monotonic() + delay, next(self._counter), chat_id)
+        )
+        self._changed.notify()
+
+    def start(self) -> 'SendQueue':
+        """Запускает потоки-отправители."""
+        for number in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f'sender-{number}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self) -> None:
+        """Дожидается отправки очереди и останавливает потоки."""
+        with self._lock:
+            self._stopping = True
+            self._changed.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def join(self) -> None:
+        """Ждёт, пока очередь опустеет."""
+        with self._lock:
+            while self._size or self._busy:
+                self._changed.wait()
+
+    def chat_bucket(self, chat_id) -> TokenBucket:
+        """Ведро токенов чата, создаётся при первом сообщении."""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            rate, burst = (
+                (self.group_rate, self.group_burst) if chat_id < 0
+                else (self.chat_rate, self.chat_burst)
+            )
+            with self._chat_lock:
+                bucket = self._chat_buckets.setdefault(
+                    chat_id, TokenBucket(rate, burst)
+                )
+        return bucket
+
+    @staticmethod
+    def _wait_for(bucket) -> None:
+        wait = bucket.reserve()
+        while wait:
+            time.sleep(wait)
+            wait = bucket.reserve()
+
+    def _send(self, chat_id, message, pending, attempt) -> tuple:
+        """Одна попытка: (отправлено, секунд до повтора или None)."""
+        try:
+            with TELEGRAM_LATENCY.time():
+                self.bot.send_message(chat_id=chat_id, text=message)
+            TELEGRAM_SENDS_OK.inc()
+            confirm_delivery(pending)
+            logging.debug(SUCCESSFUL_TELEGRAM_MESSAGE, message)
+            return True, None
+        except RetryAfter as error:
+            # Паузу выдержит ведро чата.
+            self.chat_bucket(chat_id).pause(error.retry_after)
+            retry, error_to_log = 0, error
+        except BadRequest as error:
+            retry, error_to_log = None, error
+        except NetworkError as error:
+            retry, error_to_log = SEND_RETRY_BACKOFF * 2 ** attempt, error
+            if pending is not None and isinstance(error, TimedOut):
+                confirm_delivery(pending)
+                retry = None
+        except Exception as error:
+            retry, error_to_log = None, error
+        if retry is not None and attempt < self.max_retries:
+            return False, retry
+        TELEGRAM_SENDS_FAILED.inc()
+        logging.error(FILED_SEND_MESSAGE, message, error_to_log)
+        return False, None
+
+    def _take(self):
+        """Сообщение чата, которому лимит даёт отправку, None - стоп."""
+        with self._lock:
+            while True:
+                delay = None
+                if self._ready:
+                    due, _, chat_id = self._ready[0]
+                    delay = due - time.monotonic()
+                    if delay <= 0:
+                        heapq.heappop(self._ready)
+                        wait = self.chat_bucket(chat_id).reserve()
+                        if wait:
+                            self._park(chat_id, wait)
+                            continue
+                        self._size -= 1
+                        self._busy += 1
+                        return chat_id, self._messages[chat_id].popleft()
+                elif self._stopping and not self._busy:
+                    return None
+                self._changed.wait(delay)
+
+    def _work(self) -> None:
+        while True:
+            task = self._take()
+            if task is None:
+                return
+            chat_id, (message, pending, attempt) = task
+            self._wait_for(self.global_bucket)
+            _, retry = self._send(chat_id, message, pending, attempt)
+            with self._lock:
+                self._busy -= 1
+                messages = self._messages[chat_id]
+                if retry is not None:
+                    messages.appendleft((message, pending, attempt + 1))
+                    self._size += 1
+                    self._park(chat_id, retry)
+                elif messages:
+                    self._park(chat_id, 0)
+                else:
+                    del self._messages[chat_id]
+                self._changed.notify_all()
@@ -9,7 +9,26 @@ PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
+TELEGRAM_API_URL = os.getenv(
+    'TELEGRAM_API_URL', 'https://api.telegram.org/bot'
+)
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE')
+ENGINE_MAX_WORKERS = int(os.getenv('ENGINE_MAX_WORKERS', 32))
+ASYNC_MAX_IN_FLIGHT = int(os.getenv('ASYNC_MAX_IN_FLIGHT', 256))
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', 1))
+SHARD_VNODES = int(os.getenv('SHARD_VNODES', 64))
+SHARD_CHECK_INTERVAL = float(os.getenv('SHARD_CHECK_INTERVAL', 5))
+SHARD_RESTART_DELAY = float(os.getenv('SHARD_RESTART_DELAY', 10))
+DYNO = os.getenv('DYNO')
+HTTP_KEEP_ALIVE = os.getenv('HTTP_KEEP_ALIVE', 'False') == 'True'
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 4))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', ASYNC_MAX_IN_FLIGHT))
+HTTP_POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'True') == 'True'
+HTTP_TIMEOUT = (
+    float(os.getenv('HTTP_CONNECT_TIMEOUT', 5)),
+    float(os.getenv('HTTP_READ_TIMEOUT', 30)),
+)
 ALL_TOKENS_WAS_RECEIVED = 'Все токены успешно получены'
 ABSENCE_ENVIRONMENT_VARIABLES = '''
     'Пропущенные токены {}'
@@ -17,7 +36,82 @@ ABSENCE_ENVIRONMENT_VARIABLES = '''
 
 ERROR_ENVIRONMENT_VARIABLES = 'Ошибка переменных окружения {}'
 RETRY_PERIOD = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+SCHEDULER_POLICY = os.getenv('SCHEDULER_POLICY', 'adaptive')
+POLL_PERIOD_REVIEWING = int(os.getenv('POLL_PERIOD_REVIEWING', 120))
+POLL_PERIOD_MAX = int(os.getenv('POLL_PERIOD_MAX', 6 * 60 * 60))
+POLL_BACKOFF = float(os.getenv('POLL_BACKOFF', 1.5))
+POLL_JITTER = float(os.getenv('POLL_JITTER', 0.1))
+STARTUP_SPREAD = RETRY_PERIOD * POLL_JITTER
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 3))
+BREAKER_RESET_TIMEOUT = float(
+    os.getenv('BREAKER_RESET_TIMEOUT', RETRY_PERIOD * 3)
+)
+BREAKER_HALF_OPEN_CALLS = int(os.getenv('BREAKER_HALF_OPEN_CALLS', 1))
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 100_000))
+SEND_WORKERS = int(os.getenv('SEND_WORKERS', 8))
+SEND_QUEUE_SIZE = int(os.getenv('SEND_QUEUE_SIZE', 100_000))
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', 5))
+SEND_RETRY_BACKOFF = float(os.getenv('SEND_RETRY_BACKOFF', 1))
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+TELEGRAM_GLOBAL_BURST = float(os.getenv('TELEGRAM_GLOBAL_BURST', 30))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+TELEGRAM_CHAT_BURST = float(os.getenv('TELEGRAM_CHAT_BURST', 1))
+# Группы: 20 сообщений в минуту.
+TELEGRAM_GROUP_RATE = float(os.getenv('TELEGRAM_GROUP_RATE', 20 / 60))
+TELEGRAM_GROUP_BURST = float(os.getenv('TELEGRAM_GROUP_BURST', 20))
+TELEGRAM_MESSAGE_LIMIT = 4096
+# Секунд копить уведомления чата в один дайджест, 0 - сразу.
+DIGEST_WINDOW = float(os.getenv('DIGEST_WINDOW', 0))
+COMMANDS_ENABLED = os.getenv('COMMANDS_ENABLED', 'False') == 'True'
+COMMAND_WORKERS = int(os.getenv('COMMAND_WORKERS', 4))
+COMMAND_POLL_TIMEOUT = int(os.getenv('COMMAND_POLL_TIMEOUT', 30))
+COMMAND_RETRY_PERIOD = float(os.getenv('COMMAND_RETRY_PERIOD', 5))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0))
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', 100))
+PROFILE_DIR = os.getenv('PROFILE_DIR', '.')
+PROFILE_SECONDS = float(os.getenv('PROFILE_SECONDS', 30))
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.005))
+CHECKPOINT_BACKEND = os.getenv('CHECKPOINT_BACKEND', 'sqlite')
+CHECKPOINT_PATH = os.getenv('CHECKPOINT_PATH', 'checkpoints.sqlite3')
+CHECKPOINT_LOG_PATH = os.getenv('CHECKPOINT_LOG_PATH', 'checkpoints.jsonl')
+# Журнал переписывается, когда строк больше, чем ключей, в столько раз.
+CHECKPOINT_LOG_COMPACT_RATIO = float(
+    os.getenv('CHECKPOINT_LOG_COMPACT_RATIO', 4)
+)
+CHECKPOINT_BATCH_SIZE = int(os.getenv('CHECKPOINT_BATCH_SIZE', 500))
+CHECKPOINT_FLUSH_INTERVAL = float(os.getenv('CHECKPOINT_FLUSH_INTERVAL', 5))
+CATCH_UP_PAGE_SIZE = int(os.getenv('CATCH_UP_PAGE_SIZE', 20))
+DELIVERY_LOG_PATH = os.getenv('DELIVERY_LOG_PATH', 'deliveries.sqlite3')
+DELIVERY_LOG_CAPACITY = int(os.getenv('DELIVERY_LOG_CAPACITY', 1_000_000))
+DELIVERY_LOG_ERROR_RATE = float(os.getenv('DELIVERY_LOG_ERROR_RATE', 0.001))
+DELIVERY_LOG_RETENTION = float(
+    os.getenv('DELIVERY_LOG_RETENTION', 90 * 24 * 60 * 60)
+)
+HISTORY_PATH = os.getenv('HISTORY_PATH', 'history.sqlite3')
+HISTORY_MAX_HOMEWORKS = int(os.getenv('HISTORY_MAX_HOMEWORKS', 100_000))
+HISTORY_TTL = float(os.getenv('HISTORY_TTL', 30 * 24 * 60 * 60))
+HISTORY_SPILL_INTERVAL = float(os.getenv('HISTORY_SPILL_INTERVAL', 300))
+LEASE_BACKEND = os.getenv('LEASE_BACKEND', '')
+LEASE_PATH = os.getenv('LEASE_PATH', 'leases.sqlite3')
+LEASE_NAME = os.getenv('LEASE_NAME', 'homework_bot')
+LEASE_TTL = float(os.getenv('LEASE_TTL', 15))
+LOG_FILE = os.getenv('LOG_FILE')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_JSON = os.getenv('LOG_JSON', 'False') == 'True'
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_FORMAT = (
+    '%(asctime)s [%(levelname)s] | %(funcName)s:%(lineno)d | %(message)s'
+)
+ENDPOINT = os.getenv(
+    'PRACTICUM_ENDPOINT',
+    'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+)
 HOMEWORK_VERDICTS = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
@@ -31,14 +125,31 @@ REQUEST_ERROR_MESSAGE = '''
     Код статуса: {error}
     '''.strip()
 WORK_STATUS_CHANGED = 'Изменился статус проверки работы "{}". {}'
+DEFAULT_LOCALE = os.getenv('DEFAULT_LOCALE', 'ru')
+MESSAGE_CACHE_SIZE = int(os.getenv('MESSAGE_CACHE_SIZE', 10_000))
+MESSAGE_LOCALES = {
+    'ru': {
+        'status_changed': WORK_STATUS_CHANGED,
+        'verdicts': HOMEWORK_VERDICTS,
+    },
+    'en': {
+        'status_changed': 'Review status of "{}" has changed. {}',
+        'verdicts': {
+            'approved': 'The reviewer accepted the work. Hooray!',
+            'reviewing': 'The reviewer has started checking the work.',
+            'rejected': 'The reviewer left some comments on the work.'
+        },
+    },
+}
+MESSAGES_SEPARATOR = '\n\n'
 TYPE_ERROR = 'Неверный формат данных,функ.вернула {}'
-SUCCESSFUL_TELEGRAM_MESSAGE = 'Успешная отправка сообщения: "{}"'
+SUCCESSFUL_TELEGRAM_MESSAGE = 'Успешная отправка сообщения: "%s"'
 FAILED_DECODE_IN_JSON = 'Не удалось раскодировать {} в json. Ошибка: {}'
 ABSENCE_HOMEWORK_KEY = 'В домашней работе нет ключа {}'
 ABSENCE_HOMEWORKS_KEY = "Отсутсвутет ключ 'homeworks'"
 UNKNOW_HOMEWORK_STATUS = 'Неизвестный статус домашки {}'
 INVALIDJSON = 'Произошла ошибка JSON: {}'
-NEW_CHECK_HOMEWORK = 'Проверено новых домашек: {}'
+NEW_CHECK_HOMEWORK = 'Проверено новых домашек: %s'
 LAST_FRONTIER_ERROR_MESSAGE = 'Сбой в работе программы: {}'
 TOKENS = {
     'PRACTICUM_TOKEN': PRACTICUM_TOKEN,
@@ -52,4 +163,52 @@ JSON_ERROR = '''
     Заголовок запроса: {headers}
     Параметры запроса: {params}'
     '''
-FILED_SEND_MESSAGE = 'Не удалось отправить сообщение"{}" ошибка "{}"'
+FILED_SEND_MESSAGE = 'Не удалось отправить сообщение"%s" ошибка "%s"'
+SEND_QUEUE_FULL = 'Очередь отправки переполнена, сообщение "%s" отброшено'
+
+SUBSCRIPTIONS_LOADED = 'Загружено подписок: {}'
+SUBSCRIPTION_ERROR = 'Сбой при опросе подписки чата %s: %s'
+POLL_CYCLE_FINISHED = 'Цикл опроса %s подписок завершён за %.2f с'
+CHECKPOINTS_RESTORED = 'Восстановлено чекпоинтов: {}'
+TRACE_FINISHED = 'Трасса %s'
+PROFILE_STARTED = 'Профилирование {} запущено, секунд: {}'
+PROFILE_WRITTEN = 'Профиль записан в {}'
+CIRCUIT_OPENED = 'Запросы к %s приостановлены на %.0f с после %s сбоев'
+CIRCUIT_CLOSED = 'Запросы к %s возобновлены'
+CIRCUIT_OPEN_ERROR = 'Запросы к {} приостановлены ещё на {:.0f} с'
+SHARD_FORMAT_ERROR = 'Шард задаётся как i/N, 0 <= i < N: {}'
+SHARD_ASSIGNED = 'Шард %s/%s: подписок %s из %s'
+SHARD_REBALANCED = 'Шард %s: живые шарды %s, добавлено %s, отдано %s'
+SHARD_STARTED = 'Запущен процесс шарда %s/%s, pid %s'
+SHARD_DIED = 'Процесс шарда %s завершился с кодом %s'
+SHARD_BACKEND_NOT_SHARED = (
+    'Чекпоинты {} не делятся между процессами шардов, '
+    'задайте CHECKPOINT_BACKEND=sqlite'
+)
+SHARD_NO_SUBSCRIPTIONS = (
+    'Шардам нужен список подписок: задайте SUBSCRIPTIONS_FILE'
+)
+LEASE_ACQUIRED = 'Аренда %s получена, владелец %s'
+LEASE_STANDBY = 'Аренда %s занята, процесс ждёт в резерве'
+LEASE_LOST = 'Аренда %s потеряна, опрос останавливается'
+LEASE_RENEW_FAILED = 'Не удалось продлить аренду %s: %s'
+LEASE_FILE_UNAVAILABLE = 'Файловые аренды требуют fcntl (Unix)'
+COMMAND_HELP = (
+    'Бот присылает изменения статусов проверки домашек.\n'
+    '/subscribe <токен> - подписать чат на домашки по токену Практикума\n'
+    '/unsubscribe [токен] - отписать чат\n'
+    '/status - последние известные статусы домашек\n'
+    '/language <код> - язык уведомлений о статусах'
+)
+COMMAND_SUBSCRIBE_USAGE = 'Укажите токен Практикума: /subscribe <токен>'
+COMMAND_SUBSCRIBED = 'Чат подписан на статусы домашек'
+COMMAND_ALREADY_SUBSCRIBED = 'Чат уже подписан на этот токен'
+COMMAND_UNSUBSCRIBED = 'Отменено подписок: {}'
+COMMAND_NO_SUBSCRIPTIONS = 'Чат не подписан на статусы домашек'
+COMMAND_NO_STATUSES = 'Статусов домашек пока нет'
+COMMAND_STATUS_LINE = '{}: {}'
+COMMAND_LANGUAGE_SET = 'Язык уведомлений: {}'
+COMMAND_LANGUAGE_USAGE = 'Укажите язык: /language <код>. Доступны: {}'
+COMMAND_UNKNOWN = 'Неизвестная команда. /help - список команд'
+COMMAND_FAILED = 'Сбой при обработке команды %s из чата %s: %s'
+UPDATES_FAILED = 'Не удалось получить обновления Telegram: %s'
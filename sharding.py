@@ -0,0 +1,297 @@
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import threading
+import time
+
+from settings import (
+    CHECKPOINT_BACKEND, DYNO, LOG_FILE, SHARD_ASSIGNED,
+    SHARD_BACKEND_NOT_SHARED, SHARD_CHECK_INTERVAL, SHARD_COUNT, SHARD_DIED,
+    SHARD_FORMAT_ERROR, SHARD_NO_SUBSCRIPTIONS, SHARD_REBALANCED,
+    SHARD_RESTART_DELAY, SHARD_STARTED, SHARD_VNODES, STARTUP_SPREAD,
+    SUBSCRIPTIONS_FILE
+)
+from scheduler import token_random
+from storage import CHECKPOINT_BACKENDS, Checkpoint
+from subscriptions import Subscription, SubscriptionRegistry
+
+
+def ring_hash(value) -> int:
+    """Положение значения на кольце, одинаковое во всех процессах."""
+    return int.from_bytes(
+        hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big'
+    )
+
+
+class HashRing:
+    """Консистентное хэширование с виртуальными узлами.
+
+    При добавлении или удалении узла переезжают только ключи
+    его участков кольца, остальные остаются на месте.
+    """
+
+    def __init__(self, nodes=(), replicas=SHARD_VNODES):
+        self.replicas = replicas
+        self._hashes = []
+        self._nodes = {}
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self) -> int:
+        return len(set(self._nodes.values()))
+
+    @property
+    def nodes(self) -> set:
+        return set(self._nodes.values())
+
+    def add(self, node) -> None:
+        for replica in range(self.replicas):
+            point = ring_hash(f'{node}#{replica}')
+            if point not in self._nodes:
+                bisect.insort(self._hashes, point)
+            self._nodes[point] = node
+
+    def remove(self, node) -> None:
+        for replica in range(self.replicas):
+            point = ring_hash(f'{node}#{replica}')
+            if self._nodes.get(point) == node:
+                del self._nodes[point]
+                self._hashes.pop(bisect.bisect_left(self._hashes, point))
+
+    def node_for(self, key):
+        """Узел, которому принадлежит ключ, None для пустого кольца."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, ring_hash(key))
+        return self._nodes[self._hashes[index % len(self._hashes)]]
+
+
+def parse_shard(value) -> tuple:
+    """'i/N' -> (i, N)."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(SHARD_FORMAT_ERROR.format(value))
+    if not 0 <= index < count:
+        raise ValueError(SHARD_FORMAT_ERROR.format(value))
+    return index, count
+
+
+def shard_from_env(dyno=DYNO, count=SHARD_COUNT):
+    """Шард по имени дайно Heroku: worker.3 из SHARD_COUNT -> (2, N).
+
+    None для других процессов и если шардирование не настроено.
+    """
+    process, _, number = (dyno or '').rpartition('.')
+    if process != 'worker' or count <= 1:
+        return None
+    return parse_shard(f'{int(number) - 1}/{count}')
+
+
+class ShardAssignment:
+    """Какие подписки принадлежат шарду index из count.
+
+    Подписка закрепляется за шардом по токену, поэтому подписки
+    с одним токеном попадают в один процесс и делят запросы.
+    """
+
+    def __init__(self, index, count, replicas=SHARD_VNODES):
+        self.index = index
+        self.count = count
+        self.alive = tuple(range(count))
+        self.ring = HashRing(self.alive, replicas)
+
+    def owns(self, subscription) -> bool:
+        return self.ring.node_for(subscription.token) == self.index
+
+    def set_alive(self, alive) -> bool:
+        """Обновляет кольцо по живым шардам, True если оно изменилось."""
+        alive = tuple(alive)
+        if alive == self.alive:
+            return False
+        for node in set(self.alive) - set(alive):
+            self.ring.remove(node)
+        for node in set(alive) - set(self.alive):
+            self.ring.add(node)
+        self.alive = alive
+        return True
+
+    def select(self, subscriptions) -> SubscriptionRegistry:
+        """Реестр только из подписок шарда."""
+        registry = SubscriptionRegistry()
+        for subscription in subscriptions:
+            if self.owns(subscription):
+                registry.put(subscription)
+        logging.info(
+            SHARD_ASSIGNED, self.index, self.count, len(registry),
+            len(subscriptions)
+        )
+        return registry
+
+
+class Rebalancer:
+    """Перераспределяет подписки, когда шард умирает или возвращается.
+
+    membership - общий массив флагов живых шардов супервизора.
+    Подписки, перешедшие к шарду, продолжают с последнего
+    чекпоинта, отданные - сохраняются перед передачей. Доставки
+    чатов перешедших подписок сверяются с диском: их записывал
+    другой процесс, и фильтр Блума этого процесса о них не знает.
+    """
+
+    def __init__(self, engine, subscriptions, assignment, membership,
+                 interval=SHARD_CHECK_INTERVAL):
+        self.engine = engine
+        self.subscriptions = subscriptions
+        self.assignment = assignment
+        self.membership = membership
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def alive(self) -> tuple:
+        return tuple(
+            index for index, flag in enumerate(self.membership) if flag
+        )
+
+    def start(self) -> 'Rebalancer':
+        threading.Thread(
+            target=self._run, name='rebalancer', daemon=True
+        ).start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def check(self) -> tuple:
+        """Сверяет кольцо с живыми шардами, возвращает (взято, отдано)."""
+        if not self.assignment.set_alive(self.alive()):
+            return 0, 0
+        added = removed = 0
+        registry = self.engine.registry
+        for subscription in self.subscriptions:
+            owned = self.assignment.owns(subscription)
+            present = subscription.key in registry
+            if owned and not present:
+                self.take(subscription)
+                added += 1
+            elif present and not owned:
+                self.give(subscription)
+                removed += 1
+        logging.info(
+            SHARD_REBALANCED, self.assignment.index, self.assignment.alive,
+            added, removed
+        )
+        return added, removed
+
+    def take(self, subscription) -> None:
+        """Ставит подписку на опрос новым объектом.
+
+        Опрос, запланированный до прошлой передачи подписки, найдёт
+        в реестре другой объект и не продолжится.
+        """
+        store = self.engine.store
+        checkpoint = store.load(subscription.checkpoint_key) if store else None
+        taken = Subscription(
+            subscription.token, subscription.chat_id, subscription.timestamp,
+            subscription.locale
+        )
+        (checkpoint or Checkpoint.snapshot(subscription)).restore(taken)
+        if self.engine.deliveries is not None:
+            self.engine.deliveries.adopt(taken.chat_id)
+        self.engine.registry.put(taken)
+        self.engine.schedule(
+            taken, token_random(taken).uniform(0, STARTUP_SPREAD)
+        )
+
+    def give(self, subscription) -> None:
+        owned = self.engine.registry.get(*subscription.key)
+        self.engine.registry.remove(subscription.token, subscription.chat_id)
+        if owned is not subscription:
+            Checkpoint.snapshot(owned).restore(subscription)
+        if self.engine.store is not None:
+            self.engine.save_checkpoint(owned)
+            self.engine.store.flush()
+
+
+def run_shard(index, count, membership) -> None:
+    """Точка входа процесса шарда под супервизором."""
+    from engine import engine_main
+    from log_config import setup_logging
+
+    setup_logging(f'{LOG_FILE or "homework.py.log"}.shard-{index}')
+    engine_main(shard=(index, count), membership=membership)
+
+
+class Supervisor:
+    """Запускает count процессов шардов и следит за ними.
+
+    Упавший шард помечается мёртвым, его подписки забирают
+    остальные; через restart_delay он перезапускается и
+    получает свои подписки обратно. Шарды передают подписки
+    через чекпоинты на диске, поэтому бэкенд чекпоинтов должен
+    быть общим для процессов, а подписки - браться из файла.
+    """
+
+    def __init__(self, count, restart_delay=SHARD_RESTART_DELAY,
+                 interval=SHARD_CHECK_INTERVAL, target=run_shard,
+                 backend=CHECKPOINT_BACKEND,
+                 subscriptions_file=SUBSCRIPTIONS_FILE):
+        if not CHECKPOINT_BACKENDS[backend].shared:
+            raise ValueError(SHARD_BACKEND_NOT_SHARED.format(backend))
+        if not subscriptions_file:
+            raise ValueError(SHARD_NO_SUBSCRIPTIONS)
+        self.count = count
+        self.restart_delay = restart_delay
+        self.interval = interval
+        self.target = target
+        self.context = multiprocessing.get_context('spawn')
+        self.membership = self.context.Array('b', count, lock=False)
+        self.processes = [None] * count
+        self._restart_at = {}
+
+    def spawn(self, index) -> None:
+        process = self.context.Process(
+            target=self.target, args=(index, self.count, self.membership),
+            name=f'shard-{index}'
+        )
+        process.start()
+        self.processes[index] = process
+        self.membership[index] = 1
+        logging.info(SHARD_STARTED, index, self.count, process.pid)
+
+    def check(self) -> None:
+        """Помечает упавшие шарды и перезапускает их в срок."""
+        now = time.monotonic()
+        for index, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                logging.error(SHARD_DIED, index, process.exitcode)
+                self.membership[index] = 0
+                self.processes[index] = None
+                self._restart_at[index] = now + self.restart_delay
+        for index, due in list(self._restart_at.items()):
+            if due <= now:
+                del self._restart_at[index]
+                self.spawn(index)
+
+    def run_forever(self) -> None:
+        for index in range(self.count):
+            self.spawn(index)
+        try:
+            while True:
+                time.sleep(self.interval)
+                self.check()
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            if process is not None:
+                process.join()
@@ -0,0 +1,373 @@
+import asyncio
+import json
+import multiprocessing
+import random
+import threading
+import time
+from collections import Counter
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+STATS_PATH = '/__stats__'
+RETRY_STATUSES = (HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE)
+
+
+class Request:
+    """Разобранный HTTP запрос."""
+
+    __slots__ = ('method', 'path', 'query', 'headers', 'body')
+
+    def __init__(self, method, target, headers, body=b''):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = dict(parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body or b'{}')
+
+
+class Response:
+    """Ответ заглушки: статус, тело и заголовки."""
+
+    __slots__ = ('status', 'body', 'headers')
+
+    def __init__(self, status=HTTPStatus.OK, body=b'', headers=None):
+        self.status = HTTPStatus(status)
+        self.body = body
+        self.headers = headers or {}
+
+    @classmethod
+    def json(cls, data, status=HTTPStatus.OK, headers=None) -> 'Response':
+        return cls(status, json.dumps(data).encode(), {
+            'Content-Type': 'application/json', **(headers or {})
+        })
+
+    def encode(self, keep_alive=True) -> bytes:
+        """Ответ целиком в байтах HTTP/1.1."""
+        lines = [
+            f'HTTP/1.1 {self.status.value} {self.status.phrase}',
+            f'Content-Length: {len(self.body)}',
+            'Connection: ' + ('keep-alive' if keep_alive else 'close'),
+        ]
+        lines.extend(
+            f'{name}: {value}' for name, value in self.headers.items()
+        )
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + self.body
+
+
+class Faults:
+    """Сбои, которые заглушка вносит в ответы.
+
+    latency и jitter - задержка ответа в секундах; error_rate -
+    доля ответов error_status; каждые burst_every секунд первые
+    burst_length секунд все запросы получают burst_status;
+    malformed_rate - доля ответов 200 с обрезанным телом.
+    """
+
+    def __init__(self, latency=0, jitter=0, error_rate=0,
+                 error_status=HTTPStatus.INTERNAL_SERVER_ERROR,
+                 burst_every=0, burst_length=0,
+                 burst_status=HTTPStatus.SERVICE_UNAVAILABLE, retry_after=1,
+                 malformed_rate=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = HTTPStatus(error_status)
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.burst_status = HTTPStatus(burst_status)
+        self.retry_after = retry_after
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+
+    def delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        return max(0, self.random.gauss(self.latency, self.jitter))
+
+    def failure(self, now):
+        """Статус сбоя вместо настоящего ответа или None."""
+        if self.burst_every and now % self.burst_every < self.burst_length:
+            return self.burst_status
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self.error_status
+        return None
+
+    def corrupt(self, response) -> Response:
+        """С вероятностью malformed_rate обрезает тело ответа."""
+        if self.malformed_rate and self.random.random() < self.malformed_rate:
+            response.body = response.body[:len(response.body) // 2]
+        return response
+
+
+def parse_head(head) -> tuple:
+    """Метод, цель и заголовки из заголовка запроса."""
+    request_line, *lines = head.decode('latin-1').split('\r\n')
+    method, target, _ = request_line.split(' ', 2)
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+
+def error_response(status, retry_after) -> Response:
+    """Ответ-сбой по умолчанию, приложение может задать свой."""
+    headers = {}
+    if status in RETRY_STATUSES:
+        headers['Retry-After'] = str(retry_after)
+    return Response.json(
+        {'code': status.name, 'message': status.phrase}, status, headers
+    )
+
+
+class StubProtocol(asyncio.Protocol):
+    """Соединение с keep-alive и конвейерными запросами.
+
+    Запросы разбираются прямо из буфера без потоков asyncio;
+    ответы уходят в порядке запросов, задержанный ответ
+    приостанавливает разбор следующих.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.buffer = bytearray()
+        self.transport = None
+        self.pending = None
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        self.server.connections.add(transport)
+
+    def connection_lost(self, error) -> None:
+        self.server.connections.discard(self.transport)
+        if self.pending is not None:
+            self.pending.cancel()
+
+    def data_received(self, data) -> None:
+        self.buffer += data
+        try:
+            self.process()
+        except ValueError:
+            self.transport.close()
+
+    def process(self) -> None:
+        while self.pending is None:
+            end = self.buffer.find(b'\r\n\r\n')
+            if end < 0:
+                return
+            method, target, headers = parse_head(bytes(self.buffer[:end]))
+            total = end + 4 + int(headers.get('content-length', 0))
+            if len(self.buffer) < total:
+                return
+            body = bytes(self.buffer[end + 4:total])
+            del self.buffer[:total]
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            response = self.server.respond(
+                Request(method, target, headers, body)
+            )
+            if isinstance(response, Response):
+                self.send(response, keep_alive)
+                continue
+            self.pending = asyncio.ensure_future(response)
+            self.pending.add_done_callback(
+                lambda task: self.send_later(task, keep_alive)
+            )
+
+    def send(self, response, keep_alive) -> None:
+        self.transport.write(response.encode(keep_alive))
+        if not keep_alive:
+            self.transport.close()
+
+    def send_later(self, task, keep_alive) -> None:
+        self.pending = None
+        if task.cancelled() or self.transport.is_closing():
+            return
+        self.send(task.result(), keep_alive)
+        self.process()
+
+
+class StubServer:
+    """HTTP/1.1 сервер заглушки на asyncio.
+
+    app(request) возвращает Response или корутину с ним. У app
+    могут быть error_response(status, retry_after) для ответов-сбоев
+    в формате эмулируемого API и report() с его счётчиками: они
+    отдаются на STATS_PATH вместе с числом ответов по статусам.
+    """
+
+    def __init__(self, app, host='127.0.0.1', port=0, faults=None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.faults = faults or Faults()
+        self.stats = Counter()
+        self.error_response = getattr(app, 'error_response', error_response)
+        self.report = getattr(app, 'report', dict)
+        self.connections = set()
+        self.server = None
+        self._loop = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def respond(self, request):
+        """Response или корутина с ним, если ответ задерживается."""
+        if request.path == STATS_PATH:
+            return Response.json(
+                {'responses': dict(self.stats), **self.report()}
+            )
+        delay = self.faults.delay()
+        if delay:
+            return self.respond_later(request, delay)
+        return self.answer(request)
+
+    def answer(self, request):
+        status = self.faults.failure(time.time())
+        if status is not None:
+            response = self.error_response(status, self.faults.retry_after)
+        else:
+            response = self.app(request)
+            if asyncio.iscoroutine(response):
+                return self.finish(response)
+            response = self.faults.corrupt(response)
+        self.stats[response.status.value] += 1
+        return response
+
+    async def finish(self, coroutine) -> Response:
+        response = self.faults.corrupt(await coroutine)
+        self.stats[response.status.value] += 1
+        return response
+
+    async def respond_later(self, request, delay) -> Response:
+        await asyncio.sleep(delay)
+        response = self.answer(request)
+        if asyncio.iscoroutine(response):
+            response = await response
+        return response
+
+    async def serve(self, reuse_port=False) -> None:
+        """Открывает порт; с reuse_port его делят несколько процессов."""
+        self._loop = asyncio.get_running_loop()
+        self.server = await self._loop.create_server(
+            lambda: StubProtocol(self), self.host, self.port,
+            reuse_port=reuse_port, backlog=4096
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self, reuse_port=False) -> None:
+        await self.serve(reuse_port)
+        async with self.server:
+            await self.server.serve_forever()
+
+    def start(self) -> 'StubServer':
+        """Запускает сервер в фоновом потоке со своим event loop."""
+        started = threading.Event()
+        loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.serve())
+            started.set()
+            loop.run_forever()
+
+        self._thread = threading.Thread(
+            target=run, name='stub-server', daemon=True
+        )
+        self._thread.start()
+        started.wait()
+        return self
+
+    async def shutdown(self) -> None:
+        """Закрывает порт и открытые соединения."""
+        self.server.close()
+        for transport in list(self.connections):
+            transport.close()
+        await self.server.wait_closed()
+
+    def stop(self) -> None:
+        """Останавливает сервер, запущенный start()."""
+        asyncio.run_coroutine_threadsafe(
+            self.shutdown(), self._loop
+        ).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def add_fault_arguments(parser) -> None:
+    """Общие для заглушек аргументы командной строки."""
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument(
+        '--processes', type=int, default=1,
+        help='процессов на одном порту (SO_REUSEPORT)'
+    )
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--jitter', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--burst-every', type=float, default=0)
+    parser.add_argument('--burst-length', type=float, default=0)
+    parser.add_argument('--burst-status', type=int, default=503)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--malformed-rate', type=float, default=0)
+
+
+def faults_from_args(args) -> Faults:
+    return Faults(
+        args.latency, args.jitter, args.error_rate, args.error_status,
+        args.burst_every, args.burst_length, args.burst_status,
+        args.retry_after, args.malformed_rate
+    )
+
+
+def serve_process(app, host, port, faults, reuse_port) -> None:
+    """Точка входа процесса заглушки."""
+    if uvloop is not None:
+        uvloop.install()
+    # Копии faults в процессах не должны сбоить синхронно.
+    faults.random.seed()
+    server = StubServer(app, host, port, faults)
+    try:
+        asyncio.run(server.serve_forever(reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+def run(app, args) -> None:
+    """Запускает заглушку из командной строки на args.processes процессах.
+
+    Состояние app должно одинаково воспроизводиться в каждом
+    процессе: запросы одного клиента попадают в разные процессы.
+    """
+    faults = faults_from_args(args)
+    if args.processes <= 1:
+        serve_process(app, args.host, args.port, faults, False)
+        return
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(
+            target=serve_process,
+            args=(app, args.host, args.port, faults, True)
+        )
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
@@ -0,0 +1,129 @@
+"""Эмулятор API Практикума homework_statuses для нагрузочных тестов.
+
+    python -m simulators.practicum --port 8000 --processes 4 \\
+        --latency 0.05 --error-rate 0.01 --burst-every 600 \\
+        --burst-length 30 --malformed-rate 0.001
+    PRACTICUM_ENDPOINT=http://127.0.0.1:8000/api/user_api/homework_statuses/ \\
+        python homework.py
+"""
+import argparse
+import functools
+import hashlib
+import time
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+from simulators.http_stub import Response, add_fault_arguments, run
+
+PATH = '/api/user_api/homework_statuses/'
+# Путь домашки по статусам: смена статуса раз в period секунд.
+TIMELINE = ('reviewing', 'rejected', 'reviewing', 'approved')
+NOT_AUTHENTICATED = {
+    'code': 'not_authenticated',
+    'message': 'Учетные данные не были предоставлены.',
+    'source': '__response__',
+}
+WRONG_FROM_DATE = {
+    'error': {'error': 'Wrong from_date format'},
+    'code': 'UnknownError',
+}
+
+
+def token_seed(token) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(token.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+def format_date(timestamp) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(
+        '%Y-%m-%dT%H:%M:%SZ'
+    )
+
+
+@functools.lru_cache(maxsize=1_000_000)
+def token_schedule(token, homeworks, period, started) -> tuple:
+    """(id, название, время первой сдачи) домашек токена."""
+    seed = token_seed(token)
+    return tuple(
+        (
+            seed % 1_000_000 * 100 + number,
+            f'student{seed % 10_000}__homework_{number}.zip',
+            started + (seed >> number) % period,
+        )
+        for number in range(homeworks)
+    )
+
+
+class PracticumSimulator:
+    """Домашки каждого токена и их статусы во времени.
+
+    Расписание выводится из хэша токена, поэтому состояние не
+    хранится, одинаково во всех процессах и после перезапуска
+    с тем же started. tokens ограничивает допустимые токены.
+    """
+
+    def __init__(self, homeworks=3, period=600, started=None, tokens=None):
+        self.homeworks = homeworks
+        self.period = period
+        self.started = int(time.time() if started is None else started)
+        self.tokens = set(tokens) if tokens else None
+
+    def homework(self, id, name, submitted, now):
+        """Домашка на момент now или None, если её ещё не сдали."""
+        if now < submitted:
+            return None
+        step = min(int((now - submitted) // self.period), len(TIMELINE) - 1)
+        updated = submitted + step * self.period
+        return updated, {
+            'id': id,
+            'status': TIMELINE[step],
+            'homework_name': name,
+            'reviewer_comment': '',
+            'date_updated': format_date(updated),
+            'lesson_name': name.rpartition('__')[2],
+        }
+
+    def __call__(self, request) -> Response:
+        if request.path != PATH:
+            return Response.json({'detail': 'Not found'}, HTTPStatus.NOT_FOUND)
+        scheme, _, token = request.headers.get('authorization', '').partition(
+            ' '
+        )
+        if scheme != 'OAuth' or not token or (
+            self.tokens is not None and token not in self.tokens
+        ):
+            return Response.json(NOT_AUTHENTICATED, HTTPStatus.UNAUTHORIZED)
+        try:
+            from_date = int(request.query.get('from_date', 0))
+        except ValueError:
+            return Response.json(WRONG_FROM_DATE, HTTPStatus.BAD_REQUEST)
+        now = int(time.time())
+        homeworks = []
+        for item in token_schedule(
+            token, self.homeworks, self.period, self.started
+        ):
+            homework = self.homework(*item, now)
+            if homework is not None and homework[0] >= from_date:
+                homeworks.append(homework[1])
+        return Response.json({'homeworks': homeworks, 'current_date': now})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_fault_arguments(parser)
+    parser.add_argument('--homeworks', type=int, default=3)
+    parser.add_argument(
+        '--period', type=int, default=600,
+        help='секунд между сменами статуса домашки'
+    )
+    parser.add_argument(
+        '--tokens', nargs='*', help='допустимые токены, по умолчанию любые'
+    )
+    args = parser.parse_args()
+    run(PracticumSimulator(args.homeworks, args.period, tokens=args.tokens),
+        args)
+
+
+if __name__ == '__main__':
+    main()
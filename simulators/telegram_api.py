@@ -0,0 +1,238 @@
+"""Заглушка Telegram Bot API с лимитами и учётом доставок.
+
+    python -m simulators.telegram_api --port 8081 --chat-rate 1 \\
+        --global-rate 30
+    TELEGRAM_API_URL=http://127.0.0.1:8081/bot python homework.py
+
+Счётчики доставок, отказов 429, пропускная способность и
+задержки доставки отдаются на /__stats__.
+"""
+import argparse
+import asyncio
+import itertools
+import math
+import re
+import time
+from collections import Counter, deque
+from http import HTTPStatus
+from urllib.parse import parse_qsl
+
+from simulators.http_stub import Response, add_fault_arguments, run
+
+BOT_PATH = re.compile(r'^/bot(?P<token>\d+:[\w-]+)/(?P<method>\w+)$')
+LATENCY_SAMPLES = 100_000
+
+
+def api_error(status, description, retry_after=None) -> Response:
+    """Ответ-ошибка в формате Bot API."""
+    data = {
+        'ok': False, 'error_code': status.value, 'description': description
+    }
+    if retry_after is not None:
+        data['parameters'] = {'retry_after': retry_after}
+    return Response.json(data, status)
+
+
+def percentile(values, share) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class RateLimit:
+    """Ведро токенов без ожидания; rate 0 снимает лимит."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = self.burst
+        self.updated = now
+
+    def take(self, now) -> float:
+        """0, если токен взят, иначе секунды до появления токена."""
+        if not self.rate:
+            return 0
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self) -> None:
+        self.tokens += 1
+
+
+class TelegramSimulator:
+    """Методы sendMessage, getMe и getUpdates с лимитами Telegram.
+
+    Лимиты - ведро на каждый чат (у групп, отрицательных chat_id,
+    свои rate и burst) и общее ведро. Сообщение сверх лимита
+    получает 429 с retry_after, python-telegram-bot поднимает
+    RetryAfter. Задержка доставки - время от первой попытки
+    отправить текст в чат до успешной.
+    """
+
+    def __init__(self, chat_rate=1, chat_burst=1, group_rate=20 / 60,
+                 group_burst=20, global_rate=30, global_burst=30,
+                 updates_timeout=1):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.updates_timeout = updates_timeout
+        self.global_limit = RateLimit(global_rate, global_burst, time.time())
+        self.chat_limits = {}
+        self.message_ids = itertools.count(1)
+        self.methods = Counter()
+        self.delivered = Counter()
+        self.rejected = 0
+        self.first_attempts = {}
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.first_delivery = self.last_delivery = None
+
+    def chat_limit(self, chat_id, now) -> RateLimit:
+        limit = self.chat_limits.get(chat_id)
+        if limit is None:
+            rate, burst = (
+                (self.group_rate, self.group_burst) if chat_id < 0
+                else (self.chat_rate, self.chat_burst)
+            )
+            limit = self.chat_limits[chat_id] = RateLimit(rate, burst, now)
+        return limit
+
+    def throttle(self, chat_id, now) -> float:
+        """Берёт токены чата и общий, 0 или секунды ожидания."""
+        chat = self.chat_limit(chat_id, now)
+        wait = chat.take(now)
+        if wait:
+            return wait
+        wait = self.global_limit.take(now)
+        if wait:
+            chat.refund()
+        return wait
+
+    def __call__(self, request) -> Response:
+        match = BOT_PATH.match(request.path)
+        if match is None:
+            return api_error(HTTPStatus.NOT_FOUND, 'Not Found')
+        method = match['method']
+        self.methods[method] += 1
+        handler = getattr(self, 'method_' + method.lower(), None)
+        if handler is None:
+            return api_error(HTTPStatus.NOT_FOUND, 'Not Found')
+        return handler(self.params(request))
+
+    @staticmethod
+    def params(request) -> dict:
+        """Параметры метода из query, JSON или формы."""
+        params = dict(request.query)
+        content_type = request.headers.get('content-type', '')
+        if request.body and content_type.startswith('application/json'):
+            params.update(request.json())
+        elif request.body:
+            params.update(parse_qsl(request.body.decode()))
+        return params
+
+    def method_getme(self, params) -> Response:
+        return Response.json({'ok': True, 'result': {
+            'id': 1, 'is_bot': True, 'first_name': 'Stand-in',
+            'username': 'stand_in_bot',
+        }})
+
+    async def method_getupdates(self, params) -> Response:
+        await asyncio.sleep(
+            min(float(params.get('timeout', 0)), self.updates_timeout)
+        )
+        return Response.json({'ok': True, 'result': []})
+
+    def method_sendmessage(self, params) -> Response:
+        try:
+            chat_id = int(params['chat_id'])
+            text = str(params['text'])
+        except (KeyError, ValueError):
+            return api_error(
+                HTTPStatus.BAD_REQUEST,
+                'Bad Request: chat_id and text are required'
+            )
+        if not text.strip() or len(text) > 4096:
+            return api_error(
+                HTTPStatus.BAD_REQUEST, 'Bad Request: message text is invalid'
+            )
+        now = time.time()
+        key = (chat_id, text)
+        first_attempt = self.first_attempts.pop(key, now)
+        wait = self.throttle(chat_id, now)
+        if wait:
+            self.rejected += 1
+            self.first_attempts[key] = first_attempt
+            retry_after = math.ceil(wait)
+            return api_error(
+                HTTPStatus.TOO_MANY_REQUESTS,
+                f'Too Many Requests: retry after {retry_after}', retry_after
+            )
+        self.delivered[chat_id] += 1
+        self.latencies.append(now - first_attempt)
+        if self.first_delivery is None:
+            self.first_delivery = now
+        self.last_delivery = now
+        return Response.json({'ok': True, 'result': {
+            'message_id': next(self.message_ids),
+            'date': int(now),
+            'chat': {
+                'id': chat_id, 'type': 'group' if chat_id < 0 else 'private'
+            },
+            'text': text,
+        }})
+
+    def error_response(self, status, retry_after) -> Response:
+        return api_error(
+            status, status.phrase,
+            retry_after if status == HTTPStatus.TOO_MANY_REQUESTS else None
+        )
+
+    def report(self) -> dict:
+        """Доставки, отказы по лимитам, пропускная способность, задержки."""
+        delivered = sum(self.delivered.values())
+        elapsed = (
+            self.last_delivery - self.first_delivery
+            if delivered > 1 else 0
+        )
+        latencies = sorted(self.latencies)
+        return {
+            'methods': dict(self.methods),
+            'delivered': delivered,
+            'chats': len(self.delivered),
+            'rejected': self.rejected,
+            'throughput': delivered / elapsed if elapsed else 0,
+            'latency_p50_ms': percentile(latencies, 0.5) * 1000,
+            'latency_p99_ms': percentile(latencies, 0.99) * 1000,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_fault_arguments(parser)
+    parser.add_argument('--chat-rate', type=float, default=1)
+    parser.add_argument('--chat-burst', type=float, default=1)
+    parser.add_argument('--group-rate', type=float, default=20 / 60)
+    parser.add_argument('--group-burst', type=float, default=20)
+    parser.add_argument(
+        '--global-rate', type=float, default=30, help='0 - без лимита'
+    )
+    parser.add_argument('--global-burst', type=float, default=30)
+    args = parser.parse_args()
+    if args.processes > 1:
+        parser.error('лимиты и счётчики живут в одном процессе')
+    run(TelegramSimulator(
+        args.chat_rate, args.chat_burst, args.group_rate, args.group_burst,
+        args.global_rate, args.global_burst
+    ), args)
+
+
+if __name__ == '__main__':
+    main()
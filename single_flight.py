@@ -0,0 +1,89 @@
+import asyncio
+import threading
+
+from metrics import COALESCED_REQUESTS
+
+
+class Flight:
+    """Выполняющийся запрос и его итог."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Один вызов на ключ для всех потоков, пришедших одновременно.
+
+    Первый поток выполняет func, остальные с тем же ключом ждут
+    и получают тот же результат или то же исключение.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def do(self, key, func, *args):
+        """Результат func(*args), общий для одновременных вызовов."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+        if not leader:
+            COALESCED_REQUESTS.inc()
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = func(*args)
+            return flight.result
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class AsyncSingleFlight:
+    """SingleFlight для корутин одного event loop."""
+
+    def __init__(self):
+        self._flights = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key, func, *args):
+        """Результат await func(*args), общий для одновременных вызовов."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            COALESCED_REQUESTS.inc()
+            return await asyncio.shield(flight)
+        flight = self._flights[key] = (
+            asyncio.get_running_loop().create_future()
+        )
+        try:
+            result = await func(*args)
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as error:
+            flight.set_exception(error)
+            # Ждущих может не быть: помечаем исключение прочитанным.
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
@@ -0,0 +1,319 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from settings import (
+    CHECKPOINT_BACKEND, CHECKPOINT_BATCH_SIZE, CHECKPOINT_FLUSH_INTERVAL,
+    CHECKPOINT_LOG_COMPACT_RATIO, CHECKPOINT_LOG_PATH, CHECKPOINT_PATH
+)
+
+
+def dump_checkpoint(key, checkpoint) -> str:
+    """Строка журнала для чекпоинта."""
+    return json.dumps({
+        'key': key,
+        'timestamp': checkpoint.timestamp,
+        'statuses': checkpoint.statuses,
+        'watermarks': checkpoint.watermarks,
+        'names': checkpoint.names,
+    }, ensure_ascii=False) + '\n'
+
+
+def checkpoint_key(token, chat_id) -> str:
+    """Ключ чекпоинта подписки, токен в хранилище не попадает."""
+    digest = hashlib.sha256(str(token).encode()).hexdigest()[:16]
+    return f'{digest}:{chat_id}'
+
+
+class Checkpoint:
+    """Сохранённое состояние подписки."""
+
+    __slots__ = ('timestamp', 'statuses', 'watermarks', 'names')
+
+    def __init__(self, timestamp, statuses=None, watermarks=None,
+                 names=None):
+        self.timestamp = timestamp
+        self.statuses = statuses or {}
+        self.watermarks = watermarks or {}
+        self.names = names or {}
+
+    @classmethod
+    def snapshot(cls, state) -> 'Checkpoint':
+        """Копия состояния подписки, которую она дальше не изменит."""
+        return cls(
+            state.timestamp, dict(state.statuses), dict(state.watermarks),
+            dict(state.names)
+        )
+
+    def restore(self, subscription) -> None:
+        """Переносит состояние в подписку."""
+        subscription.timestamp = self.timestamp
+        subscription.statuses = self.statuses
+        subscription.watermarks = self.watermarks
+        subscription.names = self.names
+
+
+class CheckpointStore:
+    """Хранилище чекпоинтов с групповой записью.
+
+    save() копит изменения в памяти, на диск они уходят одной
+    транзакцией, когда накопилось batch_size записей или прошло
+    flush_interval секунд с прошлой записи. Запись идёт под
+    отдельной блокировкой: stage() не ждёт диск, пока пишется
+    предыдущий пакет. shared - могут ли несколько процессов
+    работать с одним хранилищем.
+    """
+
+    shared = False
+
+    def __init__(self, batch_size=CHECKPOINT_BATCH_SIZE,
+                 flush_interval=CHECKPOINT_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._last_flush = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def load(self, key):
+        """Чекпоинт по ключу или None."""
+        raise NotImplementedError
+
+    def load_all(self) -> dict:
+        """Все чекпоинты одним чтением: ключ -> Checkpoint."""
+        raise NotImplementedError
+
+    def _write(self, items) -> None:
+        raise NotImplementedError
+
+    def save(self, key, timestamp, statuses, watermarks=None,
+             names=None) -> None:
+        """Запоминает состояние подписки до следующей групповой записи."""
+        self.stage(key, timestamp, statuses, watermarks, names)
+        self.flush_if_due()
+
+    def stage(self, key, timestamp, statuses, watermarks=None,
+              names=None) -> None:
+        """Как save(), но без записи на диск: её делает flush_if_due().
+
+        Для event loop, где запись на диск блокировала бы опрос.
+        """
+        with self._lock:
+            self._pending[key] = Checkpoint(
+                timestamp, dict(statuses), dict(watermarks or {}),
+                dict(names or {})
+            )
+
+    def flush_if_due(self) -> None:
+        """Пишет накопленное, если пора."""
+        if (
+            len(self._pending) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Пишет все накопленные изменения одной операцией."""
+        with self._write_lock:
+            with self._lock:
+                self._last_flush = time.monotonic()
+                if not self._pending:
+                    return
+                items, self._pending = self._pending, {}
+            self._write(items)
+
+    def close(self) -> None:
+        """Пишет накопленное и освобождает ресурсы."""
+        self.flush()
+
+
+def load_row(timestamp, statuses, watermarks, names) -> Checkpoint:
+    """Чекпоинт из строки SQLite, у старых строк нет watermarks и names."""
+    return Checkpoint(
+        timestamp, json.loads(statuses), json.loads(watermarks or '{}'),
+        json.loads(names or '{}')
+    )
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """Чекпоинты в SQLite, одна транзакция на пакет."""
+
+    shared = True
+
+    def __init__(self, path=CHECKPOINT_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS checkpoints ('
+            'key TEXT PRIMARY KEY, timestamp INTEGER, statuses TEXT, '
+            'watermarks TEXT, names TEXT)'
+        )
+        columns = {
+            row[1] for row in self._connection.execute(
+                'PRAGMA table_info(checkpoints)'
+            )
+        }
+        for column in ('watermarks', 'names'):
+            if column not in columns:
+                self._connection.execute(
+                    f'ALTER TABLE checkpoints ADD COLUMN {column} TEXT'
+                )
+        self._connection.commit()
+
+    def load(self, key):
+        """Чекпоинт по ключу или None."""
+        with self._write_lock:
+            row = self._connection.execute(
+                'SELECT timestamp, statuses, watermarks, names '
+                'FROM checkpoints WHERE key = ?',
+                (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return load_row(*row)
+
+    def load_all(self) -> dict:
+        """Все чекпоинты одним запросом."""
+        with self._write_lock:
+            rows = self._connection.execute(
+                'SELECT key, timestamp, statuses, watermarks, names '
+                'FROM checkpoints'
+            ).fetchall()
+        return {key: load_row(*row) for key, *row in rows}
+
+    def _write(self, items) -> None:
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?)',
+                [
+                    (
+                        key, item.timestamp, json.dumps(item.statuses),
+                        json.dumps(item.watermarks), json.dumps(item.names)
+                    )
+                    for key, item in items.items()
+                ]
+            )
+
+    def close(self) -> None:
+        """Пишет накопленное и закрывает соединение."""
+        super().close()
+        self._connection.close()
+
+
+class LogCheckpointStore(CheckpointStore):
+    """Чекпоинты в append-only журнале JSON строк.
+
+    Пакет дописывается в конец файла с одним fsync, при чтении
+    побеждает последняя запись ключа. Когда строк становится в
+    compact_ratio раз больше ключей, журнал переписывается.
+    """
+
+    def __init__(self, path=CHECKPOINT_LOG_PATH,
+                 compact_ratio=CHECKPOINT_LOG_COMPACT_RATIO, **kwargs):
+        super().__init__(**kwargs)
+        self.path = str(path)
+        self.compact_ratio = compact_ratio
+        self._lines = 0
+        self._state = self._read()
+        self._file = open(self.path, 'a', encoding='UTF-8')
+        if self._needs_compaction():
+            self._rewrite()
+
+    def _read(self) -> dict:
+        state = {}
+        if not os.path.exists(self.path):
+            return state
+        with open(self.path, encoding='UTF-8') as file:
+            for line in file:
+                self._lines += 1
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    # Недописанная строка после аварийной остановки.
+                    continue
+                state[item['key']] = Checkpoint(
+                    item['timestamp'], item['statuses'],
+                    item.get('watermarks'), item.get('names')
+                )
+        return state
+
+    def load(self, key):
+        """Чекпоинт по ключу или None."""
+        return self._state.get(key)
+
+    def load_all(self) -> dict:
+        """Все чекпоинты, прочитанные при открытии журнала."""
+        return dict(self._state)
+
+    def _write(self, items) -> None:
+        self._file.writelines(
+            dump_checkpoint(key, item) for key, item in items.items()
+        )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._state.update(items)
+        self._lines += len(items)
+        if self._needs_compaction():
+            self._rewrite()
+
+    def _needs_compaction(self) -> bool:
+        return self._lines > self.compact_ratio * max(len(self._state), 1)
+
+    def compact(self) -> None:
+        """Переписывает журнал, оставляя по одной записи на ключ."""
+        self.flush()
+        with self._write_lock:
+            self._rewrite()
+
+    def _rewrite(self) -> None:
+        self._file.close()
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='UTF-8') as file:
+            file.writelines(
+                dump_checkpoint(key, item)
+                for key, item in self._state.items()
+            )
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        self._lines = len(self._state)
+        self._file = open(self.path, 'a', encoding='UTF-8')
+
+    def close(self) -> None:
+        """Пишет накопленное и закрывает журнал."""
+        super().close()
+        self._file.close()
+
+
+def restore_checkpoints(registry, store) -> int:
+    """Восстанавливает состояние подписок реестра, возвращает их число."""
+    checkpoints = store.load_all()
+    restored = 0
+    for subscription in registry:
+        checkpoint = checkpoints.get(subscription.checkpoint_key)
+        if checkpoint is not None:
+            checkpoint.restore(subscription)
+            restored += 1
+    return restored
+
+
+CHECKPOINT_BACKENDS = {
+    'sqlite': SQLiteCheckpointStore,
+    'log': LogCheckpointStore,
+}
+
+
+def create_checkpoint_store(backend=CHECKPOINT_BACKEND,
+                            path=None) -> CheckpointStore:
+    """Хранилище чекпоинтов выбранного бэкенда.
+
+    Без path - файл по умолчанию бэкенда: CHECKPOINT_PATH для
+    SQLite, CHECKPOINT_LOG_PATH для журнала.
+    """
+    store_class = CHECKPOINT_BACKENDS[backend]
+    return store_class() if path is None else store_class(path)
@@ -0,0 +1,161 @@
+import json
+import threading
+import time
+
+from messages import normalize_locale
+from settings import DEFAULT_LOCALE
+from storage import checkpoint_key
+
+
+def make_headers(token) -> dict:
+    """Заголовки запроса к API Практикума для токена."""
+    return {'Authorization': f'OAuth {token}'}
+
+
+class Subscription:
+    """Подписка Telegram чата на статусы домашек по токену Практикума."""
+
+    __slots__ = (
+        'token', 'chat_id', 'headers', 'timestamp', 'interval',
+        'last_status', 'statuses', 'watermarks', 'names', 'locale'
+    )
+
+    def __init__(self, token, chat_id, timestamp=None,
+                 locale=DEFAULT_LOCALE):
+        self.token = token
+        self.chat_id = chat_id
+        self.locale = locale
+        self.headers = make_headers(token)
+        self.timestamp = int(time.time()) if timestamp is None else timestamp
+        self.interval = None
+        self.last_status = None
+        self.statuses = {}
+        self.watermarks = {}
+        # Ключ домашки -> название для /status: ключ обычно id.
+        self.names = {}
+
+    @property
+    def key(self) -> tuple:
+        """Ключ подписки в реестре."""
+        return self.token, self.chat_id
+
+    @property
+    def checkpoint_key(self) -> str:
+        """Ключ подписки в хранилище чекпоинтов."""
+        return checkpoint_key(self.token, self.chat_id)
+
+    def to_dict(self) -> dict:
+        """Представление подписки для сохранения в файл."""
+        return {
+            'token': self.token,
+            'chat_id': self.chat_id,
+            'timestamp': self.timestamp,
+            'locale': self.locale,
+        }
+
+
+class SubscriptionRegistry:
+    """Реестр подписок: токен и чат -> подписка."""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._by_chat = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._subscriptions.values()))
+
+    def __contains__(self, key) -> bool:
+        return key in self._subscriptions
+
+    def holds(self, subscription) -> bool:
+        """Эта ли подписка сейчас в реестре.
+
+        После отписки и новой подписки ключ тот же, а объект
+        новый: опросы старого объекта должны прекратиться.
+        """
+        return self._subscriptions.get(subscription.key) is subscription
+
+    def add(self, token, chat_id, timestamp=None,
+            locale=DEFAULT_LOCALE) -> Subscription:
+        """Добавляет подписку или возвращает уже существующую.
+
+        chat_id приводится к int: из env и JSON он может прийти
+        строкой, а очередь отправки отличает группы по знаку.
+        """
+        return self._add(token, int(chat_id), timestamp, locale)[0]
+
+    def add_new(self, token, chat_id, timestamp=None,
+                locale=DEFAULT_LOCALE):
+        """Добавляет подписку, None если она уже есть.
+
+        Проверка и добавление идут под одной блокировкой, поэтому
+        из одновременных вызовов подписку создаст только один.
+        """
+        subscription, created = self._add(
+            token, int(chat_id), timestamp, locale
+        )
+        return subscription if created else None
+
+    def _add(self, token, chat_id, timestamp, locale) -> tuple:
+        with self._lock:
+            subscription = self._subscriptions.get((token, chat_id))
+            if subscription is not None:
+                return subscription, False
+            subscription = Subscription(token, chat_id, timestamp, locale)
+            self._subscriptions[subscription.key] = subscription
+            self._by_chat.setdefault(chat_id, set()).add(token)
+            return subscription, True
+
+    def put(self, subscription) -> None:
+        """Добавляет готовую подписку вместе с её состоянием."""
+        with self._lock:
+            self._subscriptions[subscription.key] = subscription
+            self._by_chat.setdefault(
+                subscription.chat_id, set()
+            ).add(subscription.token)
+
+    def remove(self, token, chat_id) -> bool:
+        """Удаляет подписку, возвращает True если она была."""
+        with self._lock:
+            if self._subscriptions.pop((token, chat_id), None) is None:
+                return False
+            tokens = self._by_chat[chat_id]
+            tokens.discard(token)
+            if not tokens:
+                del self._by_chat[chat_id]
+            return True
+
+    def get(self, token, chat_id):
+        """Подписка по токену и чату или None."""
+        return self._subscriptions.get((token, chat_id))
+
+    def for_chat(self, chat_id) -> list:
+        """Подписки чата."""
+        with self._lock:
+            return [
+                self._subscriptions[(token, chat_id)]
+                for token in self._by_chat.get(chat_id, ())
+            ]
+
+    @classmethod
+    def from_file(cls, path) -> 'SubscriptionRegistry':
+        """Загружает реестр из JSON файла со списком подписок."""
+        registry = cls()
+        with open(path, encoding='UTF-8') as file:
+            for item in json.load(file):
+                registry.add(
+                    item['token'], item['chat_id'], item.get('timestamp'),
+                    normalize_locale(item.get('locale'))
+                )
+        return registry
+
+    def save(self, path) -> None:
+        """Сохраняет реестр в JSON файл."""
+        data = [subscription.to_dict() for subscription in self]
+        with open(path, 'w', encoding='UTF-8') as file:
+            json.dump(data, file, ensure_ascii=False)
@@ -1,5 +1,7 @@
-import sys
 import os
+import sys
+
+import pytest
 
 
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -21,3 +23,15 @@ if (
 pytest_plugins = [
     'tests.fixtures.fixture_data'
 ]
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """Файлы состояния бота создаются во временной папке теста.
+
+    Пути CHECKPOINT_PATH, DELIVERY_LOG_PATH, HISTORY_PATH и другие
+    по умолчанию относительные и подставляются в аргументы при
+    импорте, поэтому main() и движки в тестах пишут в текущую
+    папку: её и подменяем.
+    """
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,75 @@
+import asyncio
+
+import requests
+
+import utils
+from async_bot import AsyncPollingEngine, async_get_api_answer
+from storage import SQLiteCheckpointStore
+from subscriptions import SubscriptionRegistry
+from test_engine import RecordingBot, mock_homeworks_get
+
+
+class TestAsyncBot:
+
+    def test_async_get_api_answer(self, monkeypatch, random_timestamp,
+                                  current_timestamp):
+        def mock_response_get(*args, **kwargs):
+            return utils.MockResponseGET(
+                *args, random_timestamp=random_timestamp, **kwargs
+            )
+
+        monkeypatch.setattr(requests, 'get', mock_response_get)
+        result = asyncio.run(async_get_api_answer(current_timestamp))
+        assert result['current_date'] == random_timestamp, (
+            'Убедитесь, что `async_get_api_answer` возвращает ответ API.'
+        )
+
+    def test_async_engine_polls_all(self, monkeypatch, random_timestamp):
+        data = {
+            'homeworks': [{'homework_name': 'hw123', 'status': 'reviewing'}],
+            'current_date': random_timestamp
+        }
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        for chat_id in range(20):
+            registry.add(f'token{chat_id}', chat_id, timestamp=0)
+        bot = RecordingBot()
+        asyncio.run(AsyncPollingEngine(bot, registry, 4).poll_all())
+        assert len(bot.sent) == 20, (
+            'Убедитесь, что асинхронный движок опрашивает все подписки.'
+        )
+
+    def test_checkpoints_not_written_on_event_loop(self, monkeypatch,
+                                                   tmp_path):
+        data = {
+            'homeworks': [{'homework_name': 'hw123', 'status': 'approved'}],
+            'current_date': 100
+        }
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        registry.add('token', 1, timestamp=0)
+        store = SQLiteCheckpointStore(
+            tmp_path / 'state.sqlite3', batch_size=1, flush_interval=0
+        )
+        writes = []
+        monkeypatch.setattr(store, '_write', writes.append)
+        engine = AsyncPollingEngine(RecordingBot(), registry, 1, store=store)
+        asyncio.run(engine.poll_all())
+        assert writes == [], (
+            'Убедитесь, что чекпоинты не пишутся на диск в event loop.'
+        )
+        store.close()
+        assert len(writes) == 1
+
+    def test_stop_ends_run_forever(self, tmp_path):
+        store = SQLiteCheckpointStore(tmp_path / 'state.sqlite3')
+        engine = AsyncPollingEngine(
+            RecordingBot(), SubscriptionRegistry(), 1, store=store
+        )
+
+        async def run():
+            asyncio.get_running_loop().call_later(0.05, engine.stop)
+            await asyncio.wait_for(engine.run_forever(), 2)
+
+        asyncio.run(run())
+        store.close()
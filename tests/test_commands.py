@@ -0,0 +1,114 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from commands import CommandHandler, parse_command
+from settings import (
+    COMMAND_HELP, COMMAND_NO_STATUSES, COMMAND_NO_SUBSCRIPTIONS,
+    COMMAND_SUBSCRIBED, HOMEWORK_VERDICTS, MESSAGE_LOCALES
+)
+from subscriptions import SubscriptionRegistry
+from test_engine import RecordingBot
+from watermarks import commit_page
+
+HOMEWORK = {'id': 123, 'homework_name': 'hw123', 'status': 'approved'}
+
+
+def make_update(update_id, chat_id, text):
+    message = SimpleNamespace(chat_id=chat_id, text=text)
+    return SimpleNamespace(update_id=update_id, effective_message=message)
+
+
+class UpdatesBot(RecordingBot):
+    def __init__(self, updates, **kwargs):
+        super().__init__(**kwargs)
+        self.updates = updates
+        self.offsets = []
+
+    def get_updates(self, offset=None, **kwargs):
+        self.offsets.append(offset)
+        updates, self.updates = self.updates, []
+        return updates
+
+
+class TestCommands:
+
+    def test_parse_command(self):
+        assert parse_command('/status@homework_bot') == ('status', [])
+        assert parse_command('/subscribe token') == ('subscribe', ['token'])
+        assert parse_command('привет') is None
+
+    def test_subscribe_status_unsubscribe(self, tmp_path):
+        registry = SubscriptionRegistry()
+        subscribed = []
+        path = tmp_path / 'subscriptions.json'
+        bot = UpdatesBot([])
+        handler = CommandHandler(
+            bot, registry, workers=1, on_subscribe=subscribed.append,
+            subscriptions_file=str(path)
+        )
+        assert handler.status(1, []) == COMMAND_NO_SUBSCRIPTIONS
+        assert handler.subscribe(1, ['token']) == COMMAND_SUBSCRIBED
+        assert [item.key for item in subscribed] == [('token', 1)], (
+            'Новая подписка должна сразу попадать в расписание опросов'
+        )
+        assert path.exists(), 'Реестр нужно сохранить после подписки'
+        assert handler.status(1, []) == COMMAND_NO_STATUSES
+        commit_page(registry.get('token', 1), [HOMEWORK], {'123': 'approved'})
+        assert handler.status(1, []) == (
+            'hw123: ' + HOMEWORK_VERDICTS['approved']
+        ), 'Статус берётся из состояния подписки, с названием домашки'
+        handler.language(1, ['en'])
+        assert handler.status(1, []) == (
+            'hw123: ' + MESSAGE_LOCALES['en']['verdicts']['approved']
+        ), 'Статус выводится на языке чата'
+        handler.unsubscribe(1, [])
+        assert ('token', 1) not in registry
+        assert not registry.for_chat(1)
+        handler.stop()
+
+    def test_concurrent_subscribe_schedules_once(self):
+        subscribed = []
+        handler = CommandHandler(
+            RecordingBot(), SubscriptionRegistry(), workers=1,
+            on_subscribe=subscribed.append, subscriptions_file=None
+        )
+        threads = [
+            threading.Thread(target=handler.subscribe, args=(1, ['token']))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(subscribed) == 1, (
+            'Одновременные /subscribe должны запускать один цикл опросов'
+        )
+        handler.stop()
+
+    def test_stop_waits_for_updates_thread(self):
+        bot = UpdatesBot([make_update(1, 1, '/help')])
+        handler = CommandHandler(bot, SubscriptionRegistry(), workers=1)
+        handler.start()
+        while not bot.offsets:
+            time.sleep(0.01)
+        handler.stop()
+        assert not handler._thread.is_alive(), (
+            'stop() должен дожидаться потока getUpdates'
+        )
+        assert bot.sent == [(1, COMMAND_HELP)]
+
+    def test_updates_are_answered_by_workers(self):
+        bot = UpdatesBot([
+            make_update(10, 1, '/help'),
+            make_update(11, 2, 'не команда'),
+            make_update(12, 3, '/status'),
+        ])
+        handler = CommandHandler(bot, SubscriptionRegistry(), workers=2)
+        assert handler.poll_updates() == 3
+        handler.poll_updates()
+        handler.stop()
+        assert bot.offsets == [None, 13], (
+            'Следующий getUpdates должен подтверждать прочитанные обновления'
+        )
+        assert sorted(chat_id for chat_id, _ in bot.sent) == [1, 3]
@@ -0,0 +1,110 @@
+import requests
+from telegram.error import BadRequest, TimedOut
+
+from deliveries import (
+    BloomFilter, DeliveryLog, delivering, delivery_key, delivery_keys
+)
+from engine import PollingEngine
+from homework import send_message_to
+from subscriptions import SubscriptionRegistry
+from test_engine import RecordingBot, mock_homeworks_get
+
+HOMEWORK = {
+    'id': 1, 'homework_name': 'hw1', 'status': 'approved',
+    'date_updated': '2024-01-01T00:00:00Z'
+}
+
+
+class TimingOutBot(RecordingBot):
+    """Доставляет сообщение, но отвечает тайм-аутом."""
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        super().send_message(chat_id=chat_id, text=text, **kwargs)
+        raise TimedOut()
+
+
+class TestBloomFilter:
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = [delivery_key(chat_id, HOMEWORK) for chat_id in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        assert all(key in bloom for key in keys)
+        false_positives = sum(
+            delivery_key(chat_id, HOMEWORK) in bloom
+            for chat_id in range(1000, 11000)
+        )
+        assert false_positives < 300, (
+            'Доля ложных срабатываний должна быть близка к error_rate'
+        )
+
+
+class TestDeliveryLog:
+
+    def test_recorded_keys_survive_reopen(self, tmp_path):
+        path = str(tmp_path / 'deliveries.sqlite3')
+        log = DeliveryLog(path, capacity=100)
+        key = delivery_key(1, HOMEWORK)
+        assert key not in log
+        log.record([key])
+        log.close()
+        log = DeliveryLog(path, capacity=100)
+        assert key in log, 'Журнал доставок должен пережить перезапуск'
+        assert log.seen(1)(HOMEWORK)
+        assert not log.seen(2)(HOMEWORK)
+        assert not log.seen(1)({**HOMEWORK, 'date_updated': 'later'}), (
+            'Повторный переход в тот же статус - новое уведомление'
+        )
+
+    def test_old_keys_are_pruned(self, tmp_path):
+        path = str(tmp_path / 'deliveries.sqlite3')
+        DeliveryLog(path).record([delivery_key(1, HOMEWORK)])
+        assert delivery_key(1, HOMEWORK) not in DeliveryLog(
+            path, retention=-1
+        )
+
+    def test_timeout_is_recorded_other_errors_are_not(self, tmp_path):
+        log = DeliveryLog(str(tmp_path / 'deliveries.sqlite3'))
+        timeout_key = delivery_key(1, HOMEWORK)
+        error_key = delivery_key(2, HOMEWORK)
+        with delivering(log, [timeout_key]):
+            assert not send_message_to(TimingOutBot(), 1, 'text')
+
+        class RejectingBot(RecordingBot):
+            def send_message(self, **kwargs):
+                raise BadRequest('chat not found')
+
+        with delivering(log, [error_key]):
+            assert not send_message_to(RejectingBot(), 2, 'text')
+        assert timeout_key in log, (
+            'После тайм-аута сообщение могло дойти, ключ записывается'
+        )
+        assert error_key not in log
+
+
+class TestDeliveryLogInEngine:
+
+    def test_timeout_does_not_resend(self, monkeypatch, tmp_path):
+        data = {'homeworks': [HOMEWORK], 'current_date': 100}
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 1, timestamp=0)
+        bot = TimingOutBot()
+        log = DeliveryLog(str(tmp_path / 'deliveries.sqlite3'))
+        engine = PollingEngine(bot, registry, max_workers=1, deliveries=log)
+        engine.poll_all()
+        assert subscription.timestamp == 0
+        engine.poll_all()
+        engine.shutdown()
+        assert len(bot.sent) == 1, (
+            'Уведомление, ушедшее с тайм-аутом, не отправляется повторно'
+        )
+        assert subscription.timestamp == 100
+        assert subscription.statuses == {'1': 'approved'}
+
+    def test_keys_only_for_changed_homeworks(self):
+        other = {**HOMEWORK, 'id': 2}
+        assert delivery_keys(1, [HOMEWORK, other], {'2': 'approved'}) == [
+            delivery_key(1, other)
+        ]
@@ -0,0 +1,198 @@
+import os
+import signal
+import threading
+
+import requests
+
+from deliveries import DeliveryLog, delivering, delivery_key
+from digest import DigestBuffer, split_message
+from engine import PollingEngine, stop_on_sigterm
+from settings import MESSAGES_SEPARATOR, TELEGRAM_MESSAGE_LIMIT
+from storage import SQLiteCheckpointStore
+from subscriptions import SubscriptionRegistry
+from test_engine import (
+    RecordingBot, engine_with_fake_clock, mock_homeworks_get, run_until
+)
+
+
+class TestSplitMessage:
+
+    def test_parts_fit_limit_and_keep_notifications(self):
+        notifications = [f'{number} ' + 'x' * 300 for number in range(40)]
+        parts = split_message(MESSAGES_SEPARATOR.join(notifications))
+        assert all(len(part) <= TELEGRAM_MESSAGE_LIMIT for part in parts), (
+            'Убедитесь, что части не длиннее лимита Telegram.'
+        )
+        assert [
+            item for part in parts for item in part.split(MESSAGES_SEPARATOR)
+        ] == notifications, (
+            'Убедитесь, что текст режется по границам уведомлений.'
+        )
+
+    def test_long_line_is_cut(self):
+        parts = split_message('x' * 10, limit=4)
+        assert parts == ['xxxx', 'xxxx', 'xx']
+
+
+class TestDigestBuffer:
+
+    def test_window(self):
+        buffer = DigestBuffer(window=60)
+        buffer.add(1, 'first', now=0)
+        buffer.add(1, 'second', now=30)
+        assert buffer.pop_due(now=59) == []
+        (digest,) = buffer.pop_due(now=60)
+        assert [part for part, _ in digest.deliveries()] == [
+            'first' + MESSAGES_SEPARATOR + 'second'
+        ], 'Убедитесь, что уведомления окна уходят одним сообщением.'
+        assert len(buffer) == 0
+
+    def test_keys_go_with_last_part(self, tmp_path):
+        log = DeliveryLog(tmp_path / 'deliveries.sqlite3')
+        buffer = DigestBuffer(window=0)
+        key = delivery_key(1, {'id': 1, 'status': 'approved'})
+        with delivering(log, [key]):
+            buffer.add(1, 'x' * TELEGRAM_MESSAGE_LIMIT + '\nend')
+        (digest,) = buffer.pop_due()
+        assert [pending for _, pending in digest.deliveries()] == [
+            None, (log, [key])
+        ]
+        log.close()
+
+
+class FailingBot(RecordingBot):
+    def __init__(self, fail_at, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_at = fail_at
+        self.calls = 0
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise RuntimeError('telegram is down')
+        super().send_message(chat_id=chat_id, text=text, **kwargs)
+
+
+class TestDigestInEngine:
+
+    def test_failed_part_keeps_order(self):
+        notifications = [f'{number} ' + 'x' * 3000 for number in range(3)]
+        bot = FailingBot(fail_at=2)
+        engine = PollingEngine(
+            bot, SubscriptionRegistry(), digest=DigestBuffer(window=0)
+        )
+        for notification in notifications:
+            engine.digest.add(1, notification)
+        engine.flush_digests()
+        assert [text for _, text in bot.sent] == notifications[:1], (
+            'Убедитесь, что после неудачной части отправка чата '
+            'останавливается.'
+        )
+        engine.digest.add(1, 'later')
+        engine.flush_digests()
+        assert MESSAGES_SEPARATOR.join(
+            text for _, text in bot.sent
+        ) == MESSAGES_SEPARATOR.join(notifications + ['later']), (
+            'Убедитесь, что неотправленные части уходят по порядку '
+            'перед новыми уведомлениями.'
+        )
+        engine.shutdown()
+
+    def test_busy_chat_gets_few_messages(self, monkeypatch):
+        data = {
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 0
+        }
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        for token in range(50):
+            registry.add(f'token{token}', -1, timestamp=0)
+        bot = RecordingBot()
+        engine = PollingEngine(
+            bot, registry, max_workers=4, digest=DigestBuffer(window=60)
+        )
+        engine.poll_all()
+        assert bot.sent == [], (
+            'Убедитесь, что уведомления копятся до конца окна.'
+        )
+        engine.shutdown()
+        assert len(bot.sent) == 2, (
+            'Убедитесь, что 50 уведомлений чата уходят двумя сообщениями '
+            'по лимиту длины.'
+        )
+        assert sum(text.count('"hw"') for _, text in bot.sent) == 50
+
+    def test_window_closes_before_next_poll(self, monkeypatch):
+        data = {
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 0
+        }
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        registry.add('token', 1, timestamp=0)
+        bot = RecordingBot()
+        engine = PollingEngine(
+            bot, registry, digest=DigestBuffer(window=0.1)
+        )
+        sent = run_until(engine_with_fake_clock(engine), lambda: bot.sent)
+        engine.shutdown()
+        assert sent, (
+            'Убедитесь, что дайджест уходит по закрытии окна, '
+            'не дожидаясь следующего опроса.'
+        )
+
+    def test_checkpoint_waits_for_digest(self, monkeypatch, tmp_path):
+        data = {
+            'homeworks': [{'id': 1, 'homework_name': 'hw',
+                           'status': 'approved'}],
+            'current_date': 100
+        }
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 1, timestamp=0)
+        store = SQLiteCheckpointStore(tmp_path / 'state.sqlite3')
+        engine = PollingEngine(
+            RecordingBot(), registry, store=store,
+            digest=DigestBuffer(window=60)
+        )
+        engine.poll_all()
+        store.flush()
+        assert store.load(subscription.checkpoint_key) is None, (
+            'Убедитесь, что статусы из неотправленного дайджеста '
+            'не попадают в чекпоинт.'
+        )
+        engine.flush_digests(force=True)
+        store.flush()
+        checkpoint = store.load(subscription.checkpoint_key)
+        assert checkpoint.statuses == {'1': 'approved'}
+        assert checkpoint.timestamp == 100
+        engine.shutdown()
+
+    def test_sigterm_sends_open_digest(self, monkeypatch):
+        data = {
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 0
+        }
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        registry.add('token', 1, timestamp=0)
+        bot = RecordingBot()
+        engine = engine_with_fake_clock(PollingEngine(
+            bot, registry, digest=DigestBuffer(window=60)
+        ))
+        previous = signal.getsignal(signal.SIGTERM)
+        stop_on_sigterm(engine)
+        thread = threading.Thread(target=engine.run_forever)
+        try:
+            thread.start()
+            while not len(engine.digest):
+                thread.join(0.01)
+            os.kill(os.getpid(), signal.SIGTERM)
+            thread.join(2)
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+        assert not thread.is_alive(), 'SIGTERM должен завершать опрос'
+        engine.shutdown()
+        assert len(bot.sent) == 1, (
+            'Убедитесь, что при остановке открытый дайджест отправляется.'
+        )
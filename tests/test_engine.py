@@ -0,0 +1,196 @@
+import threading
+import time
+
+import requests
+
+import engine as engine_module
+import utils
+from engine import PollingEngine
+from scheduler import PollScheduler
+from settings import STARTUP_SPREAD
+from storage import SQLiteCheckpointStore
+from subscriptions import SubscriptionRegistry
+from test_scheduler import FakeClock
+
+
+class RecordingBot(utils.MockTelegramBot):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        super().send_message(chat_id=chat_id, text=text, **kwargs)
+        self.sent.append((chat_id, text))
+
+
+def mock_homeworks_get(data):
+    def mocked_response(*args, **kwargs):
+        response = utils.MockResponseGET(*args, **kwargs)
+        response.json = lambda: data
+        return response
+    return mocked_response
+
+
+class TestPollingEngine:
+
+    def test_poll_all_notifies_every_subscription(self, monkeypatch,
+                                                  random_timestamp):
+        data = {
+            'homeworks': [{'homework_name': 'hw123', 'status': 'approved'}],
+            'current_date': random_timestamp
+        }
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        for chat_id in range(50):
+            registry.add(f'token{chat_id}', chat_id, timestamp=0)
+        bot = RecordingBot()
+        engine = PollingEngine(bot, registry, max_workers=8)
+        engine.poll_all()
+        engine.shutdown()
+        assert sorted(chat_id for chat_id, _ in bot.sent) == list(range(50)), (
+            'Убедитесь, что уведомление получает каждая подписка.'
+        )
+        assert all(
+            subscription.timestamp == random_timestamp
+            for subscription in registry
+        ), (
+            'Убедитесь, что timestamp подписки сдвигается после отправки.'
+        )
+
+    def test_resubscribed_chain_stops(self, monkeypatch):
+        data = {'homeworks': [], 'current_date': 0}
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        old = registry.add('token', 1, timestamp=0)
+        registry.remove('token', 1)
+        new = registry.add('token', 1, timestamp=0)
+        engine = PollingEngine(RecordingBot(), registry, max_workers=1)
+        engine.poll_and_reschedule(old)
+        assert len(engine.scheduler) == 0, (
+            'Опросы подписки, заменённой после переподписки, '
+            'должны прекратиться'
+        )
+        engine.poll_and_reschedule(new)
+        assert len(engine.scheduler) == 1
+        engine.shutdown()
+
+    def test_error_is_reported_once(self, monkeypatch):
+        def mock_request_get_with_exception(*args, **kwargs):
+            raise requests.RequestException('Something wrong')
+
+        monkeypatch.setattr(requests, 'get', mock_request_get_with_exception)
+        registry = SubscriptionRegistry()
+        registry.add('token', 1, timestamp=0)
+        bot = RecordingBot()
+        engine = PollingEngine(bot, registry, max_workers=1)
+        engine.poll_all()
+        engine.poll_all()
+        engine.shutdown()
+        assert len(bot.sent) == 1, (
+            'Убедитесь, что одинаковая ошибка отправляется в чат один раз.'
+        )
+
+    def test_all_changed_homeworks_in_one_message(self, monkeypatch,
+                                                  random_timestamp):
+        data = {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+                {'id': 2, 'homework_name': 'hw2', 'status': 'rejected'},
+                {'id': 3, 'homework_name': 'hw3', 'status': 'reviewing'},
+            ],
+            'current_date': random_timestamp
+        }
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 1, timestamp=0)
+        subscription.statuses['3'] = 'reviewing'
+        bot = RecordingBot()
+        engine = PollingEngine(bot, registry, max_workers=1)
+        assert engine.poll(subscription) == 'rejected'
+        engine.poll(subscription)
+        engine.shutdown()
+        assert len(bot.sent) == 1, (
+            'Убедитесь, что изменения отправляются одним сообщением '
+            'и повторно не отправляются.'
+        )
+        text = bot.sent[0][1]
+        assert '"hw1"' in text and '"hw2"' in text and '"hw3"' not in text
+        assert subscription.statuses == {
+            '1': 'approved', '2': 'rejected', '3': 'reviewing'
+        }
+
+    def test_error_after_fetch_is_reported_once(self, monkeypatch):
+        monkeypatch.setattr(
+            requests, 'get', mock_homeworks_get({'current_date': 0})
+        )
+        registry = SubscriptionRegistry()
+        registry.add('token', 1, timestamp=0)
+        bot = RecordingBot()
+        engine = PollingEngine(bot, registry, max_workers=1)
+        for _ in range(3):
+            engine.poll_all()
+        engine.shutdown()
+        assert len(bot.sent) == 1, (
+            'Убедитесь, что сбой разбора ответа, повторяющийся при '
+            'каждом опросе, отправляется в чат один раз.'
+        )
+
+
+def run_until(engine, condition, timeout=2):
+    """Крутит run_forever в потоке, пока не выполнится condition."""
+    thread = threading.Thread(target=engine.run_forever)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    try:
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+    finally:
+        engine.stop()
+        thread.join()
+
+
+def engine_with_fake_clock(engine):
+    """Первые опросы наступают сразу, следующие - никогда.
+
+    Часы планировщика стоят на месте после стартового разброса,
+    так что run_forever всё время ждёт далёкого опроса.
+    """
+    clock = FakeClock()
+    engine.scheduler = PollScheduler(clock=clock)
+    schedule = engine.schedule
+
+    def first_due(subscription, delay=0):
+        schedule(subscription, delay)
+        clock.now = STARTUP_SPREAD
+
+    engine.schedule = first_due
+    return engine
+
+
+class TestRunForever:
+
+    def test_checkpoints_flushed_between_distant_polls(self, monkeypatch,
+                                                       tmp_path):
+        data = {
+            'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+            'current_date': 100
+        }
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        monkeypatch.setattr(engine_module, 'CHECKPOINT_FLUSH_INTERVAL', 0.01)
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 1, timestamp=0)
+        store = SQLiteCheckpointStore(
+            tmp_path / 'state.sqlite3', flush_interval=0.05
+        )
+        store.flush()
+        engine = PollingEngine(RecordingBot(), registry, store=store)
+        flushed = run_until(
+            engine_with_fake_clock(engine),
+            lambda: store.load(subscription.checkpoint_key)
+        )
+        engine.shutdown()
+        assert flushed, (
+            'Убедитесь, что чекпоинты сбрасываются, пока следующий '
+            'опрос ещё далеко.'
+        )
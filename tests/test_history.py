@@ -0,0 +1,82 @@
+import requests
+
+from engine import PollingEngine
+from history import (
+    StatusHistory, rejections_before_approval, time_in_status
+)
+from subscriptions import SubscriptionRegistry
+from test_engine import RecordingBot, mock_homeworks_get
+from watermarks import parse_date
+
+
+def homework(number, status, updated):
+    return {
+        'id': number, 'homework_name': f'hw{number}', 'status': status,
+        'date_updated': updated
+    }
+
+
+class TestStatusHistory:
+
+    def test_transitions_and_analytics(self, tmp_path):
+        history = StatusHistory(tmp_path / 'history.sqlite3')
+        timeline = [
+            ('reviewing', '2024-01-01T00:00:00Z'),
+            ('rejected', '2024-01-01T01:00:00Z'),
+            ('reviewing', '2024-01-02T00:00:00Z'),
+            ('approved', '2024-01-02T02:00:00Z'),
+        ]
+        for status, updated in timeline:
+            item = homework(1, status, updated)
+            history.record([item], {'1': status})
+            history.record([item], {'1': status})
+        transitions = history.transitions('1')
+        assert [status for _, status in transitions] == [
+            status for status, _ in timeline
+        ], 'Убедитесь, что повтор смены статуса не записывается дважды.'
+        assert time_in_status(transitions, 'reviewing') == 3 * 60 * 60
+        assert rejections_before_approval(transitions) == 1
+        history.close()
+
+    def test_evicted_history_is_kept_on_disk(self, tmp_path):
+        path = tmp_path / 'history.sqlite3'
+        history = StatusHistory(path, maxsize=2, ttl=60)
+        for number in range(5):
+            history.record(
+                [homework(number, 'reviewing', '2024-01-01T00:00:00Z')],
+                {str(number): 'reviewing'}, now=number
+            )
+        assert len(history) == 2, (
+            'Убедитесь, что в памяти не больше maxsize домашек.'
+        )
+        history.record(
+            [homework(5, 'approved', '2024-01-01T00:00:00Z')],
+            {'5': 'approved'}, now=1000
+        )
+        assert len(history) == 1, (
+            'Убедитесь, что домашки старше ttl вытесняются.'
+        )
+        history.close()
+        history = StatusHistory(path)
+        assert history.transitions('0') == [
+            (parse_date('2024-01-01T00:00:00Z'), 'reviewing')
+        ], 'Убедитесь, что вытесненная история сохраняется на диск.'
+        history.close()
+
+    def test_engine_records_delivered_changes(self, monkeypatch, tmp_path):
+        data = {
+            'homeworks': [homework(1, 'approved', '2024-01-01T00:00:00Z')],
+            'current_date': 0
+        }
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        registry.add('token', 1, timestamp=0)
+        history = StatusHistory(tmp_path / 'history.sqlite3')
+        engine = PollingEngine(
+            RecordingBot(), registry, max_workers=1, history=history
+        )
+        engine.poll_all()
+        assert [status for _, status in history.transitions('1')] == [
+            'approved'
+        ]
+        engine.shutdown()
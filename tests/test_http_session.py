@@ -0,0 +1,46 @@
+from http import HTTPStatus
+
+import http_session
+from homework import get_api_answer_for
+from settings import ENDPOINT, HTTP_POOL_MAXSIZE, HTTP_TIMEOUT
+from test_response_cache import FakeResponse
+
+
+class RecordingSession:
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        return FakeResponse(HTTPStatus.OK, self.data)
+
+
+class TestHttpSession:
+    HEADERS = {'Authorization': 'OAuth token'}
+    DATA = {'homeworks': [], 'current_date': 100}
+
+    def test_request_goes_through_session(self):
+        session = RecordingSession(self.DATA)
+        assert get_api_answer_for(self.HEADERS, 5, session) == self.DATA
+        assert len(session.calls) == 1, 'Запрос должен идти через сессию'
+        url, kwargs = session.calls[0]
+        assert url == ENDPOINT
+        assert kwargs['params'] == {'from_date': 5}
+        assert kwargs['timeout'] == HTTP_TIMEOUT, (
+            'Запрос через сессию должен ограничиваться HTTP_TIMEOUT'
+        )
+
+    def test_session_is_shared(self, monkeypatch):
+        monkeypatch.setattr(http_session, '_session', None)
+        session = http_session.get_session()
+        assert http_session.get_session() is session, (
+            'get_session() должен возвращать одну сессию на процесс'
+        )
+        adapter = session.get_adapter(ENDPOINT)
+        assert adapter._pool_maxsize == HTTP_POOL_MAXSIZE
+        http_session.close_session()
+        assert http_session.get_session() is not session, (
+            'После close_session() создаётся новая сессия'
+        )
+        http_session.close_session()
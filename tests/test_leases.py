@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from leases import FileLeaseStore, Lease, SQLiteLeaseStore, lease_name
+
+
+@pytest.fixture(params=['sqlite', 'file'])
+def stores(request, tmp_path):
+    path = str(tmp_path / 'leases.sqlite3')
+    backend = {'sqlite': SQLiteLeaseStore, 'file': FileLeaseStore}
+    return backend[request.param](path), backend[request.param](path)
+
+
+class TestLeaseStores:
+
+    def test_lease_is_exclusive(self, stores):
+        first, second = stores
+        assert first.acquire('bot', 'a', 10)
+        assert not second.acquire('bot', 'b', 10), (
+            'Занятую аренду не должен получить другой владелец'
+        )
+        assert first.renew('bot', 'a', 10)
+        first.release('bot', 'a')
+        assert second.acquire('bot', 'b', 10), (
+            'Освобождённую аренду резервный процесс получает сразу'
+        )
+
+    def test_expired_lease_is_taken_over(self, tmp_path):
+        path = str(tmp_path / 'leases.sqlite3')
+        first, second = SQLiteLeaseStore(path), SQLiteLeaseStore(path)
+        assert first.acquire('bot', 'a', 0.01)
+        time.sleep(0.02)
+        assert second.acquire('bot', 'b', 10), (
+            'Истёкшую аренду должен забрать резервный процесс'
+        )
+        assert not first.renew('bot', 'a', 10)
+
+
+class TestLease:
+
+    def test_lost_lease_calls_on_lost(self, tmp_path):
+        path = str(tmp_path / 'leases.sqlite3')
+        lost = threading.Event()
+        lease = Lease(
+            SQLiteLeaseStore(path), 'bot', owner='a', ttl=0.06,
+            on_lost=lambda lease: lost.set()
+        )
+        assert lease.acquire(block=False)
+        SQLiteLeaseStore(path).release('bot', 'a')
+        SQLiteLeaseStore(path).acquire('bot', 'b', 10)
+        assert lost.wait(1), 'Потерю аренды нужно обнаружить при продлении'
+        assert not lease.held
+
+    def test_standby_waits_for_release(self, tmp_path):
+        path = str(tmp_path / 'leases.sqlite3')
+        leader = Lease(SQLiteLeaseStore(path), 'bot', owner='a', ttl=0.06)
+        standby = Lease(SQLiteLeaseStore(path), 'bot', owner='b', ttl=0.06)
+        assert leader.acquire(block=False)
+        assert not standby.acquire(block=False)
+        timer = threading.Timer(0.05, leader.release)
+        timer.start()
+        assert standby.acquire()
+        standby.release()
+        timer.join()
+
+    def test_lease_name_per_shard(self):
+        assert lease_name(None, 'bot') == 'bot'
+        assert lease_name((1, 4), 'bot') == 'bot-shard-1-of-4'
@@ -0,0 +1,62 @@
+import json
+import logging
+import threading
+
+import pytest
+
+from log_config import JsonFormatter, setup_logging
+
+
+class ThreadName:
+    """Запоминает поток, в котором сообщение превращают в строку."""
+
+    def __init__(self):
+        self.thread = None
+
+    def __str__(self):
+        self.thread = threading.current_thread().name
+        return 'argument'
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    for handler in root.handlers:
+        handler.close()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+class TestLogConfig:
+
+    def test_records_are_formatted_in_listener(self, tmp_path, root_logger):
+        path = tmp_path / 'bot.log'
+        listener = setup_logging(str(path), level='DEBUG')
+        argument = ThreadName()
+        logging.debug('Сообщение %s', argument)
+        listener.stop()
+        text = path.read_text(encoding='UTF-8')
+        assert 'Сообщение argument' in text, (
+            'Запись с аргументами не попала в файл лога'
+        )
+        assert argument.thread != threading.current_thread().name, (
+            'Сообщение должно форматироваться в потоке QueueListener'
+        )
+
+    def test_log_file_is_appended(self, tmp_path, root_logger):
+        path = tmp_path / 'bot.log'
+        path.write_text('старая запись\n', encoding='UTF-8')
+        setup_logging(str(path), level='INFO').stop()
+        assert 'старая запись' in path.read_text(encoding='UTF-8'), (
+            'Перезапуск не должен обрезать лог'
+        )
+
+    def test_json_formatter(self):
+        record = logging.LogRecord(
+            'bot', logging.ERROR, __file__, 1, 'Сбой %s', ('сети',), None
+        )
+        data = json.loads(JsonFormatter().format(record))
+        assert data['message'] == 'Сбой сети'
+        assert data['level'] == 'ERROR'
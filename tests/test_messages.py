@@ -0,0 +1,42 @@
+from homework import parse_status, parse_statuses
+from messages import StatusTemplate, normalize_locale, render_status
+from settings import HOMEWORK_VERDICTS, MESSAGE_LOCALES, WORK_STATUS_CHANGED
+
+
+class TestMessages:
+
+    def test_template_matches_format(self):
+        for status, verdict in HOMEWORK_VERDICTS.items():
+            template = StatusTemplate(WORK_STATUS_CHANGED, verdict)
+            assert template.render('hw123') == WORK_STATUS_CHANGED.format(
+                'hw123', verdict
+            ), 'Скомпилированный шаблон должен совпадать с str.format'
+
+    def test_parse_status_stays_russian(self):
+        homework = {'homework_name': 'hw123', 'status': 'approved'}
+        assert parse_status(homework) == WORK_STATUS_CHANGED.format(
+            'hw123', HOMEWORK_VERDICTS['approved']
+        )
+
+    def test_parse_statuses_in_chat_locale(self):
+        homeworks = [{'homework_name': 'hw123', 'status': 'rejected'}]
+        messages, _ = parse_statuses(homeworks, {}, 'en')
+        assert messages == [
+            MESSAGE_LOCALES['en']['status_changed'].format(
+                'hw123', MESSAGE_LOCALES['en']['verdicts']['rejected']
+            )
+        ]
+
+    def test_render_is_cached(self):
+        render_status.cache_clear()
+        first = render_status('en', 'hw123', 'approved')
+        assert render_status('en', 'hw123', 'approved') is first
+        assert render_status.cache_info().hits == 1
+
+    def test_normalize_locale(self):
+        assert normalize_locale('en-US') == 'en'
+        assert normalize_locale('de') == 'ru'
+        assert normalize_locale(None) == 'ru'
+        assert render_status('de', 'hw', 'approved') == render_status(
+            'ru', 'hw', 'approved'
+        ), 'Неизвестный язык - текст на языке по умолчанию'
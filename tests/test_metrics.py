@@ -0,0 +1,75 @@
+import urllib.request
+from http import HTTPStatus
+
+from homework import request_api
+from metrics import (
+    PRACTICUM_REQUESTS_FAILED, PRACTICUM_REQUESTS_OK, Counter, Gauge,
+    Histogram, MetricsHandler, MetricsRegistry, start_metrics_server
+)
+from test_response_cache import FakeResponse, FakeSession
+
+
+class TestMetrics:
+
+    def test_render_prometheus_text(self):
+        registry = MetricsRegistry()
+        requests_total = Counter(
+            'test_requests', 'Запросы', ('outcome',), registry=registry
+        )
+        ok = requests_total.labels('ok')
+        ok.inc()
+        ok.inc(2)
+        latency = Histogram(
+            'test_seconds', 'Длительность', buckets=(0.1, 1),
+            registry=registry
+        )
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(5)
+        depth = Gauge('test_depth', 'Очередь', registry=registry)
+        depth.set_function(lambda: 7)
+        text = registry.render()
+        assert 'test_requests_total{outcome="ok"} 3' in text
+        assert 'test_seconds_bucket{le="0.1"} 1' in text
+        assert 'test_seconds_bucket{le="1"} 2' in text
+        assert 'test_seconds_bucket{le="+Inf"} 3' in text
+        assert 'test_seconds_count 3' in text
+        assert 'test_depth 7' in text
+        assert '# TYPE test_seconds histogram' in text
+
+    def test_labels_are_bound_once(self):
+        counter = Counter(
+            'test_bound', 'Счётчик', ('outcome',), registry=MetricsRegistry()
+        )
+        assert counter.labels('ok') is counter.labels('ok')
+
+    def test_metrics_endpoint(self, monkeypatch):
+        registry = MetricsRegistry()
+        Counter('test_endpoint', 'Счётчик', registry=registry).inc()
+        monkeypatch.setattr(MetricsHandler, 'registry', registry)
+        server = start_metrics_server(0)
+        host, port = server.server_address
+        try:
+            with urllib.request.urlopen(
+                f'http://{host}:{port}/metrics'
+            ) as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+        assert 'test_endpoint_total 1' in body
+
+    def test_error_responses_counted_as_failed(self):
+        session = FakeSession([
+            FakeResponse(HTTPStatus.OK, {}),
+            FakeResponse(HTTPStatus.NOT_MODIFIED),
+            FakeResponse(HTTPStatus.UNAUTHORIZED),
+            FakeResponse(HTTPStatus.INTERNAL_SERVER_ERROR),
+        ])
+        ok = PRACTICUM_REQUESTS_OK.value
+        failed = PRACTICUM_REQUESTS_FAILED.value
+        for _ in range(4):
+            request_api({'url': 'https://example.com'}, session)
+        assert PRACTICUM_REQUESTS_OK.value - ok == 2
+        assert PRACTICUM_REQUESTS_FAILED.value - failed == 2, (
+            'Ответы 4xx и 5xx - неудачные запросы'
+        )
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import records
+from homework import homework_key, parse_status, parse_statuses
+from records import HomeworkRecord, decode_api_answer
+
+
+@pytest.fixture(params=['default', 'stdlib'])
+def loads(request, monkeypatch):
+    if request.param == 'stdlib':
+        monkeypatch.setattr(records, 'loads', json.loads)
+    return request.param
+
+
+class TestDecodeApiAnswer:
+
+    def test_records_work_with_parse_status(self, loads):
+        content = json.dumps({
+            'homeworks': [{
+                'id': 7, 'homework_name': 'hw7', 'status': 'approved',
+                'date_updated': '2020-02-13T14:40:57Z',
+                'reviewer_comment': 'Всё нравится'
+            }],
+            'current_date': 100
+        }).encode()
+        response = decode_api_answer(content)
+        record = response['homeworks'][0]
+        assert isinstance(record, HomeworkRecord)
+        assert homework_key(record) == '7'
+        assert parse_status(record) == parse_status(
+            {'homework_name': 'hw7', 'status': 'approved'}
+        )
+        messages, changed = parse_statuses(response['homeworks'], {})
+        assert changed == {'7': 'approved'} and len(messages) == 1
+
+    @pytest.mark.parametrize('data, error', [
+        ([], TypeError),
+        ({'current_date': 1}, KeyError),
+        ({'homeworks': {}}, TypeError),
+        ({'homeworks': [{'status': 'approved'}]}, KeyError),
+        ({'homeworks': [{'homework_name': 'hw'}]}, KeyError),
+        ({'homeworks': [{'homework_name': 'hw', 'status': 'x'}]}, ValueError),
+    ])
+    def test_same_errors_as_check_response(self, loads, data, error):
+        with pytest.raises(error):
+            decode_api_answer(json.dumps(data).encode())
+
+    def test_error_response_is_returned_as_is(self, loads):
+        data = {'code': 'not_authenticated', 'message': 'Нет токена'}
+        assert decode_api_answer(json.dumps(data).encode()) == data
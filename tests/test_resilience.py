@@ -0,0 +1,124 @@
+import pytest
+import requests
+
+from engine import PollingEngine
+from exceptions import CircuitOpenError, InvalidResponseCode
+from resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ErrorDeduplicator
+)
+from subscriptions import SubscriptionRegistry
+from test_engine import RecordingBot, mock_homeworks_get
+
+
+def fail(breaker, error=ConnectionError('down')):
+    with pytest.raises(type(error)):
+        with breaker.guard():
+            raise error
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker('test', failure_threshold=2,
+                                 reset_timeout=60)
+        fail(breaker)
+        assert breaker.state == CLOSED
+        fail(breaker)
+        assert breaker.state == OPEN, (
+            'Автомат должен размыкаться после failure_threshold сбоев'
+        )
+        with pytest.raises(CircuitOpenError):
+            with breaker.guard():
+                raise AssertionError('Запрос не должен отправляться')
+
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker('test', failure_threshold=1,
+                                 reset_timeout=0, half_open_calls=1)
+        fail(breaker)
+        breaker.before_call()
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == CLOSED, (
+            'Успешный пробный запрос должен замыкать автомат'
+        )
+        fail(breaker)
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+
+    def test_client_errors_are_not_failures(self):
+        breaker = CircuitBreaker('test', failure_threshold=1)
+        fail(breaker, InvalidResponseCode('401'))
+        assert breaker.state == CLOSED, (
+            'Ошибки клиента не должны размыкать автомат'
+        )
+
+
+class TestErrorDeduplicator:
+
+    def test_one_alert_per_incident(self):
+        errors = ErrorDeduplicator()
+        first, second = ConnectionError('timeout'), ValueError('timeout')
+        assert errors.is_new(first)
+        errors.remember(first)
+        assert not errors.is_new(ConnectionError('timeout'))
+        assert errors.is_new(second), (
+            'Ошибка другого типа - новое оповещение'
+        )
+        errors.remember(second)
+        assert not errors.is_new(first), (
+            'Чередование ошибок не должно повторять оповещения'
+        )
+        errors.clear()
+        assert errors.is_new(first)
+        assert not len(errors)
+
+
+class TestEngineResilience:
+
+    def test_open_circuit_stops_requests(self, monkeypatch):
+        calls = []
+
+        def mock_request_get_with_exception(*args, **kwargs):
+            calls.append(kwargs)
+            raise requests.RequestException('Something wrong')
+
+        monkeypatch.setattr(requests, 'get', mock_request_get_with_exception)
+        registry = SubscriptionRegistry()
+        registry.add('token', 1, timestamp=0)
+        bot = RecordingBot()
+        engine = PollingEngine(
+            bot, registry, max_workers=1,
+            breaker=CircuitBreaker('test', failure_threshold=2)
+        )
+        for _ in range(5):
+            engine.poll_all()
+        engine.shutdown()
+        assert len(calls) == 2, (
+            'Разомкнутый автомат не должен пропускать запросы к API'
+        )
+        assert len(bot.sent) == 1
+
+    def test_error_reported_again_after_recovery(self, monkeypatch,
+                                                 random_timestamp):
+        def mock_request_get_with_exception(*args, **kwargs):
+            raise requests.RequestException('Something wrong')
+
+        registry = SubscriptionRegistry()
+        registry.add('token', 1, timestamp=0)
+        bot = RecordingBot()
+        engine = PollingEngine(bot, registry, max_workers=1)
+        monkeypatch.setattr(requests, 'get', mock_request_get_with_exception)
+        engine.poll_all()
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(
+            {'homeworks': [], 'current_date': random_timestamp}
+        ))
+        engine.poll_all()
+        monkeypatch.setattr(requests, 'get', mock_request_get_with_exception)
+        engine.poll_all()
+        engine.shutdown()
+        assert len(bot.sent) == 2, (
+            'После успешного опроса о новом сбое нужно сообщить снова'
+        )
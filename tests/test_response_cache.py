@@ -0,0 +1,89 @@
+import json
+from http import HTTPStatus
+
+from homework import get_api_answer_for
+from response_cache import ResponseCache
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, etag=None):
+        self.status_code = status_code
+        self.content = json.dumps(data).encode() if data is not None else b''
+        self.headers = {'ETag': etag} if etag else {}
+        self.json_calls = 0
+
+    def json(self):
+        self.json_calls += 1
+        return json.loads(self.content)
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent_headers = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.sent_headers.append(headers)
+        return self.responses.pop(0)
+
+
+class TestResponseCache:
+    HEADERS = {'Authorization': 'OAuth token'}
+    DATA = {'homeworks': [], 'current_date': 100}
+
+    def test_not_modified_returns_cached(self):
+        session = FakeSession([
+            FakeResponse(HTTPStatus.OK, self.DATA, etag='"v1"'),
+            FakeResponse(HTTPStatus.NOT_MODIFIED),
+        ])
+        cache = ResponseCache()
+        first = get_api_answer_for(self.HEADERS, 0, session, cache)
+        second = get_api_answer_for(self.HEADERS, 0, session, cache)
+        assert first == second == self.DATA
+        assert session.sent_headers[1]['If-None-Match'] == '"v1"', (
+            'Повторный запрос должен быть условным.'
+        )
+
+    def test_same_body_is_not_parsed_twice(self):
+        repeated = FakeResponse(HTTPStatus.OK, self.DATA)
+        session = FakeSession([
+            FakeResponse(HTTPStatus.OK, self.DATA), repeated
+        ])
+        cache = ResponseCache()
+        get_api_answer_for(self.HEADERS, 0, session, cache)
+        assert get_api_answer_for(
+            self.HEADERS, 0, session, cache
+        ) == self.DATA
+        assert repeated.json_calls == 0, (
+            'Тело, совпавшее с кэшем, не должно разбираться повторно.'
+        )
+
+    def test_new_from_date_replaces_entry(self):
+        cache = ResponseCache(maxsize=1)
+        session = FakeSession([
+            FakeResponse(HTTPStatus.OK, self.DATA, etag='"v1"'),
+            FakeResponse(HTTPStatus.OK, self.DATA, etag='"v2"'),
+        ])
+        get_api_answer_for(self.HEADERS, 0, session, cache)
+        get_api_answer_for(self.HEADERS, 100, session, cache)
+        assert 'If-None-Match' not in session.sent_headers[1]
+        assert cache.get('OAuth token', 0) is None
+        assert cache.get('OAuth token', 100).etag == '"v2"'
+        assert len(cache) == 1
+
+    def test_same_token_different_from_date(self):
+        session = FakeSession([
+            FakeResponse(HTTPStatus.OK, self.DATA, etag='"a"'),
+            FakeResponse(HTTPStatus.OK, self.DATA, etag='"b"'),
+            FakeResponse(HTTPStatus.NOT_MODIFIED),
+            FakeResponse(HTTPStatus.NOT_MODIFIED),
+        ])
+        cache = ResponseCache()
+        for from_date in (0, 100, 0, 100):
+            get_api_answer_for(self.HEADERS, from_date, session, cache)
+        assert [
+            headers.get('If-None-Match') for headers in session.sent_headers
+        ] == [None, None, '"a"', '"b"'], (
+            'Подписки с одним токеном и разным from_date не должны '
+            'вытеснять ответы друг друга.'
+        )
@@ -0,0 +1,71 @@
+import time
+
+from scheduler import AdaptivePolicy, PollScheduler
+from subscriptions import Subscription
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAdaptivePolicy:
+
+    def test_intervals_follow_status_history(self):
+        policy = AdaptivePolicy(
+            base=600, reviewing=120, max_period=3600, backoff=2, jitter=0
+        )
+        subscription = Subscription('token', 1, timestamp=0)
+        assert policy.next_delay(subscription, 'reviewing') == 120, (
+            'После `reviewing` опрос должен учащаться.'
+        )
+        assert policy.next_delay(subscription) == 240
+        assert policy.next_delay(subscription) == 480
+        assert policy.next_delay(subscription) == 600, (
+            'После `reviewing` интервал не должен превышать базовый.'
+        )
+        assert policy.next_delay(subscription, 'approved') == 600
+        delays = [policy.next_delay(subscription) for _ in range(5)]
+        assert delays == [1200, 2400, 3600, 3600, 3600], (
+            'Без изменений интервал растёт до `max_period`.'
+        )
+
+    def test_jitter_bounds(self):
+        policy = AdaptivePolicy(base=600, jitter=0.1)
+        delays = {
+            policy.next_delay(
+                Subscription('token', 1, timestamp=timestamp), 'approved'
+            )
+            for timestamp in range(100)
+        }
+        assert all(540 <= delay <= 660 for delay in delays)
+        assert len(delays) > 1, 'Jitter должен различаться между подписками'
+
+
+class TestPollScheduler:
+
+    def test_pop_due_in_order(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(clock=clock)
+        subscriptions = [Subscription('t', i, timestamp=0) for i in range(3)]
+        for delay, subscription in zip((30, 10, 20), subscriptions):
+            scheduler.schedule(subscription, delay)
+        clock.now = 5
+        assert scheduler.pop_due() == []
+        assert scheduler.time_until_next(600) == 5
+        clock.now = 25
+        assert scheduler.pop_due() == [subscriptions[1], subscriptions[2]]
+        assert len(scheduler) == 1
+
+    def test_wait_is_bounded_by_timeout(self):
+        scheduler = PollScheduler(clock=FakeClock())
+        scheduler.schedule(Subscription('t', 1, timestamp=0), 3600)
+        started = time.monotonic()
+        scheduler.wait(0.05)
+        assert time.monotonic() - started < 1, (
+            'Убедитесь, что далёкий опрос не задерживает цикл '
+            'дольше timeout.'
+        )
@@ -0,0 +1,115 @@
+import time
+
+from telegram.error import BadRequest, RetryAfter, TimedOut
+
+from send_queue import SendQueue, TokenBucket
+from subscriptions import SubscriptionRegistry
+from test_engine import RecordingBot
+
+
+class FlakyBot(RecordingBot):
+    def __init__(self, errors, **kwargs):
+        super().__init__(**kwargs)
+        self.errors = list(errors)
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        super().send_message(chat_id=chat_id, text=text, **kwargs)
+
+
+class TestTokenBucket:
+
+    def test_reserve_waits_when_empty(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert 0 < bucket.reserve() <= 0.1, (
+            'Пустое ведро должно возвращать время до следующего токена.'
+        )
+
+
+class TestSendQueue:
+
+    def test_queue_delivers_all_messages(self):
+        bot = RecordingBot()
+        send_queue = SendQueue(
+            bot, workers=4, global_rate=1000, global_burst=1000,
+            chat_rate=1000, chat_burst=1000
+        ).start()
+        for number in range(100):
+            assert send_queue.put(number % 10, f'message {number}')
+        send_queue.stop()
+        assert len(bot.sent) == 100
+
+    def test_string_chat_id_is_sent(self):
+        bot = RecordingBot()
+        send_queue = SendQueue(bot, workers=1).start()
+        subscription = SubscriptionRegistry().add('token', '-100')
+        assert send_queue.put(subscription.chat_id, 'text')
+        send_queue.stop()
+        assert bot.sent == [(-100, 'text')], (
+            'chat_id из env строкой должен доходить до отправки'
+        )
+
+    def test_put_returns_false_when_full(self):
+        send_queue = SendQueue(RecordingBot(), maxsize=1)
+        assert send_queue.put(1, 'first')
+        assert not send_queue.put(1, 'second'), (
+            'Переполненная очередь должна возвращать False.'
+        )
+
+    def test_retry_after_and_network_errors_are_retried(self, monkeypatch):
+        monkeypatch.setattr('send_queue.SEND_RETRY_BACKOFF', 0)
+        bot = FlakyBot([RetryAfter(0.01), TimedOut()])
+        send_queue = SendQueue(bot, chat_rate=1000, chat_burst=1).start()
+        started = time.monotonic()
+        assert send_queue.put(1, 'text')
+        send_queue.stop()
+        assert time.monotonic() - started >= 0.01, (
+            'После RetryAfter отправка в чат должна ждать.'
+        )
+        assert bot.sent == [(1, 'text')]
+
+    def test_bad_request_is_not_retried(self):
+        bot = FlakyBot([BadRequest('chat not found')])
+        send_queue = SendQueue(bot).start()
+        send_queue.put(1, 'text')
+        send_queue.stop()
+        assert bot.errors == [] and bot.sent == []
+
+    def test_throttled_chat_does_not_block_others(self):
+        bot = RecordingBot()
+        send_queue = SendQueue(
+            bot, workers=4, global_rate=1000, global_burst=1000,
+            group_rate=10, group_burst=1
+        ).start()
+        for number in range(12):
+            send_queue.put(-100, f'group {number}')
+        started = time.monotonic()
+        send_queue.put(2, 'private')
+        while (2, 'private') not in bot.sent:
+            time.sleep(0.01)
+        assert time.monotonic() - started < 0.3, (
+            'Чат, упёршийся в лимит, не должен задерживать другие чаты.'
+        )
+        assert [chat_id for chat_id, _ in bot.sent].count(-100) < 4, (
+            'У групп должен действовать свой лимит.'
+        )
+        send_queue.stop()
+        assert [text for chat_id, text in bot.sent if chat_id == -100] == [
+            f'group {number}' for number in range(12)
+        ], 'Сообщения чата должны уходить по порядку.'
+
+    def test_worker_requeues_retry_after(self):
+        bot = FlakyBot([RetryAfter(0.05)])
+        send_queue = SendQueue(
+            bot, workers=2, chat_rate=1000, chat_burst=1
+        ).start()
+        send_queue.put(1, 'first')
+        send_queue.put(1, 'second')
+        send_queue.join()
+        send_queue.stop()
+        assert bot.sent == [(1, 'first'), (1, 'second')], (
+            'После RetryAfter сообщение должно повториться первым.'
+        )
@@ -0,0 +1,172 @@
+import pytest
+
+from deliveries import DeliveryLog, delivery_key
+from engine import PollingEngine
+from sharding import (
+    HashRing, Rebalancer, ShardAssignment, Supervisor, parse_shard,
+    shard_from_env
+)
+from storage import SQLiteCheckpointStore
+from subscriptions import SubscriptionRegistry
+
+
+def make_subscriptions(count=300):
+    registry = SubscriptionRegistry()
+    for number in range(count):
+        registry.add(f'token-{number}', number, timestamp=0)
+    return registry
+
+
+class TestHashRing:
+
+    def test_removing_node_moves_only_its_keys(self):
+        ring = HashRing(range(4))
+        keys = [f'token-{number}' for number in range(1000)]
+        before = {key: ring.node_for(key) for key in keys}
+        assert len(set(before.values())) == 4
+        ring.remove(2)
+        moved = [key for key in keys if ring.node_for(key) != before[key]]
+        assert moved and all(before[key] == 2 for key in moved), (
+            'Переезжать должны только ключи удалённого узла'
+        )
+        ring.add(2)
+        assert {key: ring.node_for(key) for key in keys} == before
+
+    def test_parse_shard(self):
+        assert parse_shard('1/4') == (1, 4)
+        for value in ('4/4', 'x', '1/'):
+            with pytest.raises(ValueError):
+                parse_shard(value)
+
+    def test_shard_from_env(self):
+        assert shard_from_env('worker.3', 4) == (2, 4)
+        assert shard_from_env('run.1234', 4) is None
+        assert shard_from_env('worker.1', 1) is None
+
+
+class TestShardAssignment:
+
+    def test_shards_partition_subscriptions(self):
+        subscriptions = make_subscriptions()
+        selected = [
+            {item.key for item in ShardAssignment(index, 3).select(
+                subscriptions
+            )}
+            for index in range(3)
+        ]
+        assert sum(len(keys) for keys in selected) == len(subscriptions)
+        assert set().union(*selected) == {
+            item.key for item in subscriptions
+        }, 'Каждая подписка принадлежит ровно одному шарду'
+
+    def test_same_token_same_shard(self):
+        registry = SubscriptionRegistry()
+        first = registry.add('shared', 1)
+        second = registry.add('shared', 2)
+        assignment = ShardAssignment(0, 8)
+        assert assignment.owns(first) == assignment.owns(second)
+
+    def test_rebalance_on_shard_death(self):
+        subscriptions = make_subscriptions()
+        membership = [1, 1, 1]
+        assignment = ShardAssignment(0, 3)
+        engine = PollingEngine(
+            None, assignment.select(subscriptions), max_workers=1
+        )
+        owned = len(engine.registry)
+        rebalancer = Rebalancer(engine, subscriptions, assignment, membership)
+        assert rebalancer.check() == (0, 0)
+        membership[1] = 0
+        added, removed = rebalancer.check()
+        assert added and not removed, (
+            'Подписки умершего шарда должны перейти к живым'
+        )
+        assert len(engine.scheduler) == added
+        membership[1] = 1
+        assert rebalancer.check() == (0, added)
+        assert len(engine.registry) == owned
+        engine.shutdown()
+
+    def test_taken_subscription_sees_other_shard_state(self, tmp_path):
+        subscriptions = make_subscriptions()
+        checkpoints = tmp_path / 'checkpoints.sqlite3'
+        path = tmp_path / 'deliveries.sqlite3'
+        membership = [1, 1]
+        assignment = ShardAssignment(0, 2)
+        engine = PollingEngine(
+            None, assignment.select(subscriptions), max_workers=1,
+            store=SQLiteCheckpointStore(checkpoints),
+            deliveries=DeliveryLog(path)
+        )
+        rebalancer = Rebalancer(engine, subscriptions, assignment, membership)
+        subscription = next(
+            item for item in subscriptions if not assignment.owns(item)
+        )
+        homework = {'id': 1, 'status': 'approved', 'date_updated': 'now'}
+        other_store = SQLiteCheckpointStore(checkpoints)
+        other_store.save(
+            subscription.checkpoint_key, 100, {'1': 'reviewing'}
+        )
+        other_store.flush()
+        other = DeliveryLog(path)
+        other.record([delivery_key(subscription.chat_id, homework)])
+        membership[1] = 0
+        rebalancer.check()
+        taken = engine.registry.get(*subscription.key)
+        assert taken.timestamp == 100, (
+            'Перешедшая подписка должна продолжить с чекпоинта, '
+            'записанного другим шардом'
+        )
+        assert engine.deliveries.seen(subscription.chat_id)(homework), (
+            'Доставку другого шарда нужно найти на диске'
+        )
+        membership[1] = 1
+        rebalancer.check()
+        membership[1] = 0
+        rebalancer.check()
+        assert not engine.registry.holds(taken), (
+            'Опросы, запланированные до передачи подписки, '
+            'не должны продолжаться после её возврата'
+        )
+        assert engine.registry.get(*subscription.key).timestamp == 100
+        other.close()
+        other_store.close()
+        engine.shutdown()
+
+
+class FakeProcess:
+    def __init__(self, alive=True, exitcode=None):
+        self.alive = alive
+        self.exitcode = exitcode
+
+    def is_alive(self):
+        return self.alive
+
+
+class TestSupervisor:
+
+    def test_log_backend_rejected(self):
+        with pytest.raises(ValueError):
+            Supervisor(2, backend='log', subscriptions_file='subs.json')
+
+    def test_subscriptions_file_required(self):
+        with pytest.raises(ValueError):
+            Supervisor(2, subscriptions_file=None)
+
+    def test_dead_shard_is_marked_and_restarted(self, monkeypatch):
+        supervisor = Supervisor(
+            2, restart_delay=0, subscriptions_file='subs.json'
+        )
+        spawned = []
+
+        def spawn(index):
+            spawned.append(index)
+            supervisor.processes[index] = FakeProcess()
+            supervisor.membership[index] = 1
+
+        monkeypatch.setattr(supervisor, 'spawn', spawn)
+        supervisor.processes = [FakeProcess(), FakeProcess(False, 1)]
+        supervisor.membership[0] = supervisor.membership[1] = 1
+        supervisor.check()
+        assert spawned == [1], 'Упавший шард нужно перезапустить'
+        assert list(supervisor.membership) == [1, 1]
@@ -0,0 +1,131 @@
+import time
+
+import pytest
+import requests
+import telegram
+from telegram.error import RetryAfter
+
+import homework
+from exceptions import InvalidResponseCode, UpstreamUnavailable
+from simulators.http_stub import Faults, StubServer
+from simulators.practicum import PATH, TIMELINE, PracticumSimulator
+from simulators.telegram_api import TelegramSimulator
+
+
+@pytest.fixture
+def practicum(monkeypatch):
+    def start(faults=None, **kwargs):
+        server = StubServer(PracticumSimulator(**kwargs), faults=faults)
+        servers.append(server.start())
+        monkeypatch.setattr(homework, 'ENDPOINT', server.url + PATH)
+        return server
+
+    servers = []
+    yield start
+    for server in servers:
+        server.stop()
+
+
+HEADERS = {'Authorization': 'OAuth token'}
+
+
+class TestPracticumSimulator:
+
+    def test_statuses_follow_timeline(self, practicum):
+        period = 100
+        practicum(
+            homeworks=5, period=period, started=time.time() - 10 * period
+        )
+        response = homework.get_api_answer_for(HEADERS, 0)
+        homeworks = homework.check_response(response)
+        assert len(homeworks) == 5
+        assert all(
+            homework.check_homework(item) == TIMELINE[-1]
+            for item in homeworks
+        ), 'После всех периодов домашки должны быть приняты'
+        assert homework.get_api_answer_for(
+            HEADERS, 0
+        )['homeworks'] == homeworks, (
+            'Состояние токена не должно меняться между запросами'
+        )
+
+    def test_from_date_filters_old_homeworks(self, practicum):
+        practicum(period=100, started=time.time() - 10_000)
+        response = homework.get_api_answer_for(HEADERS, 0)
+        assert response['homeworks']
+        assert homework.get_api_answer_for(
+            HEADERS, response['current_date']
+        )['homeworks'] == [], (
+            'Домашки, не менявшиеся после from_date, не возвращаются'
+        )
+
+    def test_unknown_token_is_rejected(self, practicum):
+        practicum(tokens=['token'])
+        with pytest.raises(InvalidResponseCode):
+            homework.get_api_answer_for({'Authorization': 'OAuth other'}, 0)
+
+    def test_faults(self, practicum):
+        server = practicum(Faults(burst_every=1000, burst_length=1000))
+        with pytest.raises(UpstreamUnavailable):
+            homework.get_api_answer_for(HEADERS, 0)
+        server.faults = Faults(malformed_rate=1)
+        with pytest.raises(ValueError):
+            homework.get_api_answer_for(HEADERS, 0)
+        assert requests.get(server.url + '/__stats__').json() == {
+            'responses': {'503': 1, '200': 1}
+        }
+
+    def test_delayed_responses_over_keep_alive(self, practicum):
+        server = practicum(Faults(latency=0.01))
+        session = requests.Session()
+        for _ in range(3):
+            assert session.get(
+                server.url + PATH, headers=HEADERS
+            ).status_code == 200
+
+
+@pytest.fixture
+def telegram_api():
+    servers = []
+
+    def start(**kwargs):
+        server = StubServer(TelegramSimulator(**kwargs)).start()
+        servers.append(server)
+        return server, telegram.Bot(
+            token='123:token', base_url=server.url + '/bot'
+        )
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+class TestTelegramSimulator:
+
+    def test_send_message_is_counted(self, telegram_api):
+        server, bot = telegram_api(chat_rate=0, global_rate=0)
+        for chat_id in (1, 2, 2):
+            assert homework.send_message_to(bot, chat_id, 'text')
+        assert bot.get_me().username == 'stand_in_bot'
+        report = requests.get(server.url + '/__stats__').json()
+        assert report['delivered'] == 3
+        assert report['chats'] == 2
+        assert report['methods'] == {'sendMessage': 3, 'getMe': 1}
+
+    def test_chat_limit_returns_retry_after(self, telegram_api):
+        server, bot = telegram_api(chat_rate=0.5, chat_burst=1)
+        bot.send_message(chat_id=1, text='first')
+        with pytest.raises(RetryAfter) as error:
+            bot.send_message(chat_id=1, text='second')
+        assert error.value.retry_after == 2, (
+            'retry_after - секунды до следующего токена чата'
+        )
+        bot.send_message(chat_id=2, text='other chat')
+        assert server.app.report()['rejected'] == 1
+
+    def test_global_limit(self, telegram_api):
+        server, bot = telegram_api(chat_rate=0, global_rate=1, global_burst=2)
+        bot.send_message(chat_id=1, text='one')
+        bot.send_message(chat_id=2, text='two')
+        with pytest.raises(RetryAfter):
+            bot.send_message(chat_id=3, text='three')
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+
+from async_bot import AsyncPollingEngine
+from engine import PollingEngine
+from single_flight import AsyncSingleFlight, SingleFlight
+from subscriptions import SubscriptionRegistry
+from test_engine import RecordingBot, mock_homeworks_get
+
+
+def run_concurrently(flights, func, count=5):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flights.do('key', func))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+class TestSingleFlight:
+
+    def test_concurrent_calls_are_coalesced(self):
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'homeworks': []}
+
+        flights = SingleFlight()
+        results, _ = run_concurrently(flights, slow)
+        assert len(calls) == 1, 'Одновременные вызовы нужно объединять'
+        assert len(results) == 5
+        assert all(result is results[0] for result in results)
+        assert not len(flights)
+
+    def test_error_is_shared(self):
+        def failing():
+            time.sleep(0.1)
+            raise ConnectionError('down')
+
+        _, errors = run_concurrently(SingleFlight(), failing)
+        assert len(errors) == 5, 'Исключение получают все ждущие'
+
+    def test_async_calls_are_coalesced(self):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'answer'
+
+        async def main():
+            flights = AsyncSingleFlight()
+            return await asyncio.gather(
+                *(flights.do('key', fetch) for _ in range(5))
+            )
+
+        assert asyncio.run(main()) == ['answer'] * 5
+        assert len(calls) == 1
+
+    def test_async_error_without_waiters(self):
+        async def failing():
+            raise ConnectionError('down')
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(AsyncSingleFlight().do('key', failing))
+
+
+def count_requests(monkeypatch, random_timestamp):
+    data = {
+        'homeworks': [{'homework_name': 'hw123', 'status': 'approved'}],
+        'current_date': random_timestamp
+    }
+    mocked = mock_homeworks_get(data)
+    calls = []
+
+    def mocked_get(*args, **kwargs):
+        calls.append(kwargs)
+        time.sleep(0.05)
+        return mocked(*args, **kwargs)
+
+    monkeypatch.setattr(requests, 'get', mocked_get)
+    registry = SubscriptionRegistry()
+    for chat_id in range(5):
+        registry.add('shared-token', chat_id, timestamp=0)
+    return registry, calls
+
+
+class TestEngineCoalescing:
+
+    def test_duplicate_token_polled_once(self, monkeypatch,
+                                         random_timestamp):
+        registry, calls = count_requests(monkeypatch, random_timestamp)
+        bot = RecordingBot()
+        engine = PollingEngine(bot, registry, max_workers=5)
+        engine.poll_all()
+        engine.shutdown()
+        assert len(calls) == 1, (
+            'Подписки с одним токеном должны делить один запрос к API'
+        )
+        assert sorted(chat_id for chat_id, _ in bot.sent) == list(range(5))
+
+    def test_async_duplicate_token_polled_once(self, monkeypatch,
+                                               random_timestamp):
+        registry, calls = count_requests(monkeypatch, random_timestamp)
+        bot = RecordingBot()
+        asyncio.run(AsyncPollingEngine(bot, registry, 5).poll_all())
+        assert len(calls) == 1
+        assert len(bot.sent) == 5
@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+from storage import (
+    LogCheckpointStore, SQLiteCheckpointStore, create_checkpoint_store,
+    restore_checkpoints
+)
+from subscriptions import SubscriptionRegistry
+
+
+@pytest.fixture(params=[SQLiteCheckpointStore, LogCheckpointStore])
+def store_class(request):
+    return request.param
+
+
+class TestCheckpointStore:
+
+    def test_batched_save_and_resume(self, store_class, tmp_path):
+        path = str(tmp_path / 'checkpoints')
+        store = store_class(path, batch_size=3, flush_interval=3600)
+        store.flush()
+        store.save('a', 10, {'1': 'reviewing'})
+        store.save('b', 20, {})
+        assert store_class(path).load('a') is None, (
+            'Чекпоинты должны писаться пакетами, а не по одному.'
+        )
+        store.save('a', 30, {'1': 'approved'}, names={'1': 'hw1'})
+        store.save('c', 40, {})
+        store.close()
+        resumed = store_class(path).load_all()
+        assert sorted(resumed) == ['a', 'b', 'c']
+        assert resumed['a'].timestamp == 30
+        assert resumed['a'].statuses == {'1': 'approved'}
+        assert resumed['a'].names == {'1': 'hw1'}
+
+    def test_restore_registry(self, store_class, tmp_path):
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 1, timestamp=0)
+        registry.add('other', 2, timestamp=0)
+        store = store_class(str(tmp_path / 'checkpoints'))
+        store.save(subscription.checkpoint_key, 123, {'7': 'rejected'})
+        store.flush()
+        assert restore_checkpoints(registry, store) == 1
+        assert subscription.timestamp == 123
+        assert subscription.statuses == {'7': 'rejected'}
+        store.close()
+
+    def test_log_is_compacted(self, tmp_path):
+        path = tmp_path / 'checkpoints.jsonl'
+        store = LogCheckpointStore(path, batch_size=1, compact_ratio=2)
+        for timestamp in range(10):
+            store.save('a', timestamp, {})
+            store.save('b', timestamp, {})
+        store.close()
+        assert len(path.read_text().splitlines()) <= 4, (
+            'Журнал должен переписываться, когда в нём много старых '
+            'записей.'
+        )
+        assert LogCheckpointStore(path).load('a').timestamp == 9
+
+    def test_backends_have_own_default_files(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        create_checkpoint_store('sqlite').close()
+        create_checkpoint_store('log').close()
+        assert sorted(item.name for item in tmp_path.iterdir()) == [
+            'checkpoints.jsonl', 'checkpoints.sqlite3'
+        ], 'Журнал не должен открывать файл SQLite.'
+
+    def test_stage_does_not_wait_for_write(self, store_class, tmp_path):
+        store = store_class(str(tmp_path / 'checkpoints'))
+        writing, release = threading.Event(), threading.Event()
+        write = store._write
+
+        def slow_write(items):
+            writing.set()
+            release.wait(5)
+            write(items)
+
+        store._write = slow_write
+        store.stage('first', 1, {})
+        flusher = threading.Thread(target=store.flush)
+        flusher.start()
+        assert writing.wait(5)
+        stager = threading.Thread(target=store.stage, args=('second', 2, {}))
+        stager.start()
+        stager.join(1)
+        blocked = stager.is_alive()
+        release.set()
+        flusher.join()
+        stager.join()
+        assert not blocked, 'stage() не должен ждать записи на диск'
+        store.close()
+        assert store_class(str(tmp_path / 'checkpoints')).load(
+            'second'
+        ).timestamp == 2
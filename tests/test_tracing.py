@@ -0,0 +1,45 @@
+import os
+
+import requests
+
+import tracing
+from engine import PollingEngine
+from subscriptions import SubscriptionRegistry
+from test_engine import RecordingBot, mock_homeworks_get
+from tracing import NULL_SPAN, SamplingProfiler, Tracer, span
+
+
+class TestTracing:
+
+    def test_unsampled_span_is_shared_null_context(self):
+        with Tracer(sample_rate=0).trace('poll') as trace:
+            assert trace is None
+            assert span('http') is NULL_SPAN
+
+    def test_poll_stages_are_traced(self, monkeypatch, random_timestamp):
+        tracer = Tracer(sample_rate=1)
+        monkeypatch.setattr('engine.TRACER', tracer)
+        data = {
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': random_timestamp
+        }
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        engine = PollingEngine(RecordingBot(), registry, max_workers=1)
+        engine.poll(registry.add('token', 1, timestamp=0))
+        engine.shutdown()
+        trace = tracer.traces[-1]
+        assert [item.name for item in trace.spans] == [
+            'http', 'json', 'parse', 'telegram'
+        ]
+        assert all(item.duration >= 0 for item in trace.spans)
+        assert trace.duration >= sum(item.duration for item in trace.spans)
+
+    def test_sampling_profiler_writes_stacks(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(tracing, 'PROFILE_DIR', str(tmp_path))
+        profiler = SamplingProfiler(seconds=0.05, interval=0.01)
+        profiler.start()
+        profiler._thread.join()
+        [path] = os.listdir(tmp_path)
+        assert path.endswith('.folded')
+        assert (tmp_path / path).read_text().strip()
@@ -0,0 +1,122 @@
+import sqlite3
+
+import requests
+from telegram.error import BadRequest
+
+from engine import PollingEngine
+from settings import CATCH_UP_PAGE_SIZE
+from storage import SQLiteCheckpointStore
+from subscriptions import SubscriptionRegistry
+from test_engine import RecordingBot, mock_homeworks_get
+from watermarks import (
+    catch_up_pages, commit_page, commit_window, parse_date,
+    pending_homeworks
+)
+
+
+def homework(number, updated):
+    return {
+        'id': number, 'homework_name': f'hw{number}', 'status': 'approved',
+        'date_updated': f'2024-01-01T00:{updated // 60:02}:{updated % 60:02}Z'
+    }
+
+
+START = parse_date('2024-01-01T00:00:00Z')
+
+
+class FailingAfterBot(RecordingBot):
+    """Отклоняет сообщения после первых limit."""
+
+    def __init__(self, limit, **kwargs):
+        super().__init__(**kwargs)
+        self.limit = limit
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if len(self.sent) >= self.limit:
+            raise BadRequest('Chat not found')
+        super().send_message(chat_id=chat_id, text=text, **kwargs)
+
+
+class TestWatermarks:
+
+    def test_pending_skips_processed_and_sorts(self):
+        homeworks = [homework(1, 30), homework(2, 10), homework(3, 20)]
+        pending = pending_homeworks(homeworks, {'1': START + 30})
+        assert [item['id'] for item in pending] == [2, 3], (
+            'Убедитесь, что обработанные домашки пропускаются, '
+            'а остальные идут от старых к новым.'
+        )
+
+    def test_page_commit_moves_timestamp(self):
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 1, timestamp=0)
+        homeworks = [homework(number, number) for number in range(5)]
+        first, second = catch_up_pages(homeworks, {}, page_size=3)
+        commit_page(subscription, first, {})
+        assert subscription.timestamp == START + 1, (
+            'Убедитесь, что from_date сдвигается к последней домашке '
+            'страницы на секунду раньше.'
+        )
+        assert list(catch_up_pages(homeworks, subscription.watermarks)) == [
+            second
+        ], 'Убедитесь, что обработанная страница не повторяется.'
+        commit_window(subscription, START + 100)
+        assert subscription.watermarks == {}, (
+            'Убедитесь, что знаки старше from_date удаляются.'
+        )
+
+    def test_failed_page_does_not_replay_delivered(self, monkeypatch):
+        count = CATCH_UP_PAGE_SIZE + 5
+        data = {
+            'homeworks': [homework(number, number) for number in range(count)],
+            'current_date': START + 100
+        }
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(data))
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 1, timestamp=0)
+        bot = FailingAfterBot(1)
+        engine = PollingEngine(bot, registry, max_workers=1)
+        engine.poll_all()
+        assert len(bot.sent) == 1
+        assert subscription.timestamp == START + CATCH_UP_PAGE_SIZE - 2, (
+            'Убедитесь, что timestamp сдвигается после доставленной страницы.'
+        )
+        bot.limit = 2
+        engine.poll_all()
+        engine.shutdown()
+        assert len(bot.sent) == 2
+        assert bot.sent[1][1].count('hw') == 5, (
+            'Убедитесь, что повторный опрос отправляет только '
+            'недоставленную страницу.'
+        )
+        assert subscription.timestamp == START + 100
+
+
+class TestWatermarkCheckpoints:
+
+    def test_round_trip(self, tmp_path):
+        store = SQLiteCheckpointStore(tmp_path / 'state.sqlite3')
+        store.save('key', 5, {'1': 'approved'}, {'1': 7})
+        store.close()
+        store = SQLiteCheckpointStore(tmp_path / 'state.sqlite3')
+        assert store.load('key').watermarks == {'1': 7}
+        store.close()
+
+    def test_old_schema_is_migrated(self, tmp_path):
+        path = tmp_path / 'state.sqlite3'
+        connection = sqlite3.connect(path)
+        connection.execute(
+            'CREATE TABLE checkpoints ('
+            'key TEXT PRIMARY KEY, timestamp INTEGER, statuses TEXT)'
+        )
+        connection.execute(
+            "INSERT INTO checkpoints VALUES ('key', 5, '{}')"
+        )
+        connection.commit()
+        connection.close()
+        store = SQLiteCheckpointStore(path)
+        checkpoint = store.load('key')
+        assert (checkpoint.timestamp, checkpoint.watermarks) == (5, {}), (
+            'Убедитесь, что чекпоинты старой схемы читаются без watermarks.'
+        )
+        store.close()
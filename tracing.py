@@ -0,0 +1,206 @@
+import collections
+import contextlib
+import contextvars
+import cProfile
+import logging
+import os
+import random
+import signal
+import sys
+import threading
+import time
+
+from settings import (
+    PROFILE_DIR, PROFILE_INTERVAL, PROFILE_SECONDS, PROFILE_STARTED,
+    PROFILE_WRITTEN, TRACE_BUFFER_SIZE, TRACE_FINISHED, TRACE_SAMPLE_RATE
+)
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+NULL_SPAN = contextlib.nullcontext()
+
+
+class Span:
+    """Этап трассы: имя, смещение от начала трассы и длительность."""
+
+    __slots__ = ('trace', 'name', 'offset', 'duration', '_started')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+        self.offset = 0.0
+        self.duration = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self.offset = self._started - self.trace.started
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self._started
+        self.trace.spans.append(self)
+        return False
+
+
+class Trace:
+    """Трасса одного опроса подписки."""
+
+    __slots__ = ('name', 'started', 'duration', 'spans')
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.spans = []
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.started
+
+    def __str__(self) -> str:
+        stages = ', '.join(
+            f'{span.name} {span.duration * 1000:.1f}ms'
+            for span in sorted(self.spans, key=lambda item: item.offset)
+        )
+        return f'{self.name} {self.duration * 1000:.1f}ms: {stages}'
+
+
+class Tracer:
+    """Трассировка с выборкой: трассируется sample_rate опросов.
+
+    Для невыбранного опроса span() возвращает общий nullcontext,
+    поэтому выключенная трассировка почти ничего не стоит.
+    """
+
+    def __init__(self, sample_rate=TRACE_SAMPLE_RATE,
+                 buffer_size=TRACE_BUFFER_SIZE):
+        self.sample_rate = sample_rate
+        self.traces = collections.deque(maxlen=buffer_size)
+
+    @contextlib.contextmanager
+    def trace(self, name):
+        """Корневая трасса, если опрос попал в выборку."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            yield None
+            return
+        trace = Trace(name)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            trace.finish()
+            self.traces.append(trace)
+            logging.debug(TRACE_FINISHED, trace)
+
+
+TRACER = Tracer()
+
+
+def span(name):
+    """Этап текущей трассы либо пустой контекст вне выборки."""
+    trace = _current_trace.get()
+    if trace is None:
+        return NULL_SPAN
+    return Span(trace, name)
+
+
+def instrument_connections() -> None:
+    """Отдельный этап connect (DNS + TCP) для новых соединений urllib3."""
+    from urllib3.util import connection
+
+    create_connection = connection.create_connection
+    if getattr(create_connection, 'traced', False):
+        return
+
+    def traced_create_connection(*args, **kwargs):
+        with span('connect'):
+            return create_connection(*args, **kwargs)
+
+    traced_create_connection.traced = True
+    connection.create_connection = traced_create_connection
+
+
+def profile_path(kind) -> str:
+    return os.path.join(
+        PROFILE_DIR, f'profile-{os.getpid()}-{int(time.time())}.{kind}'
+    )
+
+
+class SamplingProfiler:
+    """Статистический профайлер всех потоков.
+
+    Раз в interval секунд снимает стеки через sys._current_frames()
+    и пишет их в формате collapsed stacks для flamegraph.
+    """
+
+    def __init__(self, seconds=PROFILE_SECONDS, interval=PROFILE_INTERVAL):
+        self.seconds = seconds
+        self.interval = interval
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Запускает съём стеков в фоновом потоке."""
+        if self.running:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name='sampling-profiler', daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        logging.info(PROFILE_STARTED.format('sampling', self.seconds))
+        own_id = threading.get_ident()
+        stacks = collections.Counter()
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({code.co_filename})')
+                    frame = frame.f_back
+                stacks[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+        path = profile_path('folded')
+        with open(path, 'w', encoding='UTF-8') as file:
+            for stack, count in stacks.most_common():
+                file.write(f'{stack} {count}\n')
+        logging.info(PROFILE_WRITTEN.format(path))
+
+
+class ToggleProfiler:
+    """cProfile основного потока: включается и выключается сигналом."""
+
+    def __init__(self):
+        self._profile = None
+
+    def toggle(self) -> None:
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+            logging.info(PROFILE_STARTED.format('cProfile', '-'))
+            return
+        self._profile.disable()
+        path = profile_path('prof')
+        self._profile.dump_stats(path)
+        self._profile = None
+        logging.info(PROFILE_WRITTEN.format(path))
+
+
+def install_signal_handlers() -> None:
+    """SIGUSR1 - снять статистический профиль всех потоков,
+    SIGUSR2 - включить/выключить cProfile основного потока.
+    """
+    if not hasattr(signal, 'SIGUSR1'):
+        return
+    sampler = SamplingProfiler()
+    toggle = ToggleProfiler()
+    signal.signal(signal.SIGUSR1, lambda signum, frame: sampler.start())
+    signal.signal(signal.SIGUSR2, lambda signum, frame: toggle.toggle())
+    if TRACER.sample_rate > 0:
+        instrument_connections()
@@ -0,0 +1,94 @@
+import calendar
+import functools
+import time
+
+from records import homework_key
+from settings import CATCH_UP_PAGE_SIZE
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_date(value) -> int:
+    """'2020-02-13T14:40:57Z' -> unix time."""
+    return calendar.timegm(time.strptime(value, DATE_FORMAT))
+
+
+def updated_at(homework):
+    """Время изменения домашки или None без date_updated."""
+    value = homework.get('date_updated')
+    if value is None:
+        return None
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+def pending_homeworks(homeworks, watermarks) -> list:
+    """Необработанные домашки ответа от старых к новым.
+
+    Домашка обработана, если её date_updated не новее водяного
+    знака. Домашки без date_updated отсеет сравнение статусов.
+    """
+    pending = []
+    for homework in homeworks:
+        updated = updated_at(homework)
+        if updated is not None and updated <= watermarks.get(
+            homework_key(homework), -1
+        ):
+            continue
+        pending.append((updated or 0, homework))
+    pending.sort(key=lambda item: item[0])
+    return [homework for _, homework in pending]
+
+
+def catch_up_pages(homeworks, watermarks, page_size=CATCH_UP_PAGE_SIZE):
+    """Необработанные домашки страницами не больше page_size.
+
+    Большой ответ после долгого простоя уходит несколькими
+    уведомлениями, и сбой отправки не откатывает уже
+    доставленные страницы.
+    """
+    pending = pending_homeworks(homeworks, watermarks)
+    for start in range(0, len(pending), page_size):
+        yield pending[start:start + page_size]
+
+
+def commit_page(state, page, changed) -> None:
+    """Отмечает страницу обработанной.
+
+    state - подписка или чекпоинт: timestamp, statuses, names и
+    watermarks. from_date сдвигается к последней домашке
+    страницы на секунду раньше её времени, чтобы не потерять
+    домашки с тем же временем со следующей страницы. Знаки
+    остаются до конца окна: они отсеивают уже доставленные
+    страницы, если отправка следующей не удастся.
+    """
+    state.statuses.update(changed)
+    for homework in page:
+        key = homework_key(homework)
+        if key in changed:
+            state.names[key] = homework.get('homework_name', key)
+    dates = [updated_at(homework) for homework in page]
+    for homework, updated in zip(page, dates):
+        if updated is not None:
+            state.watermarks[homework_key(homework)] = updated
+    if dates and None not in dates:
+        state.timestamp = max(state.timestamp, dates[-1] - 1)
+
+
+def commit_window(state, current_date) -> None:
+    """Ответ обработан целиком: следующий запрос с current_date."""
+    state.timestamp = current_date
+    prune_watermarks(state)
+
+
+def prune_watermarks(state) -> None:
+    """Удаляет знаки домашек, которых API больше не вернёт."""
+    stale = [
+        key for key, updated in state.watermarks.items()
+        if updated < state.timestamp
+    ]
+    for key in stale:
+        del state.watermarks[key]